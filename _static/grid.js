@@ -0,0 +1,151 @@
+/*
+ * Client-side movie grid for the "client" site mode.
+ *
+ * Reads the movies from window.MOVIE_GRID_DATA, set by <username>.movies.js
+ * (see website.render_user_data_site) which the shell page loads first –
+ * a plain <script> instead of fetch(), so file:// works too – and renders
+ * only the rows of the grid near the viewport; the space of the
+ * rows above and below is kept with padding, so the scrollbar matches
+ * the full collection.
+ */
+(function () {
+  "use strict";
+
+  var OVERSCAN_ROWS = 4;
+  var MEASURE_ITEMS = 50;
+  var grid = document.querySelector(".movie-grid");
+  if (!grid) {
+    return;
+  }
+  grid.classList.add("virtual");
+
+  var ESCAPES = { "&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#x27;" };
+
+  function esc(value) {
+    return String(value).replace(/[&<>"']/g, function (c) { return ESCAPES[c]; });
+  }
+
+  function posterHtml(url, alt, posters) {
+    var local = url ? posters[url] : null;
+    if (!local) {
+      return '<img src="' + (url ? esc(url) : "") + '" alt="' + alt + '" loading="lazy" />';
+    }
+    var img = '<img src="' + esc(local[0]) + '" alt="' + alt + '" loading="lazy" />';
+    if (!local[1]) {
+      return img;
+    }
+    return '<picture><source srcset="' + esc(local[1]) + '" type="image/webp" />' +
+      img + "</picture>";
+  }
+
+  // Same markup as website.ITEM_TEMPLATE; the title attribute shows titles
+  // clamped by .movie-grid.virtual (style.css) in full
+  function itemHtml(movie, fields, posters) {
+    var title = esc(movie[fields.title]);
+    var year = movie[fields.year];
+    var rating = movie[fields.rating];
+    var note = movie[fields.note];
+    var imdbId = movie[fields.imdb_id];
+    return '<li class="movie">\n' +
+      '  <a class="poster" data-note="' + (note ? esc(note) : "") + '" href="' +
+      (imdbId ? "https://www.imdb.com/title/" + esc(imdbId) + "/" : "#") +
+      '" target="_blank" rel="noopener noreferrer">\n' +
+      '    <span class="rating-badge">' +
+      (typeof rating === "number" ? rating.toFixed(1) : "–") + "</span>\n" +
+      "    " + posterHtml(movie[fields.poster_url], title + " poster", posters) + "\n" +
+      "  </a>\n" +
+      '  <div class="title" title="' + title + '">' + title + "</div>\n" +
+      '  <div class="year">' + (year === null ? "N/A" : esc(year)) + "</div>\n" +
+      "</li>";
+  }
+
+  function start(data) {
+    var movies = data.movies;
+    var posters = data.posters || {};
+    var fields = {};
+    data.fields.forEach(function (name, i) { fields[name] = i; });
+
+    if (!movies.length) {
+      grid.innerHTML =
+        '<li class="movie empty">No movies yet. Add some and regenerate the site.</li>';
+      return;
+    }
+
+    var style = getComputedStyle(grid);
+    var rowGap = parseFloat(style.rowGap) || 0;
+    var colGap = parseFloat(style.columnGap) || 0;
+    var columns = 1;
+    var rowHeight = 0;
+    var first = -1;
+    var last = -1;
+
+    // Spaltenzahl und Zeilenhöhe messen. Titel sind per CSS auf zwei
+    // Zeilen begrenzt (gleich hohe Zeilen); zur Sicherheit zählt die
+    // höchste Karte einer Stichprobe.
+    function measure() {
+      grid.style.paddingTop = grid.style.paddingBottom = "0px";
+      var sample = movies.slice(0, MEASURE_ITEMS);
+      grid.innerHTML = sample.map(function (movie) {
+        return itemHtml(movie, fields, posters);
+      }).join("\n");
+      var width = grid.firstElementChild.getBoundingClientRect().width + colGap;
+      columns = Math.max(1, Math.floor((grid.clientWidth + colGap) / width));
+      var tallest = 0;
+      for (var item = grid.firstElementChild; item; item = item.nextElementSibling) {
+        tallest = Math.max(tallest, item.getBoundingClientRect().height);
+      }
+      rowHeight = tallest + rowGap;
+      first = last = -1;
+    }
+
+    function render() {
+      var rows = Math.ceil(movies.length / columns);
+      var top = grid.getBoundingClientRect().top + window.scrollY;
+      var from = Math.floor((window.scrollY - top) / rowHeight) - OVERSCAN_ROWS;
+      var to = Math.ceil((window.scrollY + window.innerHeight - top) / rowHeight) + OVERSCAN_ROWS;
+      from = Math.max(0, Math.min(rows - 1, from));
+      to = Math.max(from + 1, Math.min(rows, to));
+      if (from === first && to === last) {
+        return;
+      }
+      first = from;
+      last = to;
+
+      var html = [];
+      var end = Math.min(movies.length, to * columns);
+      for (var i = from * columns; i < end; i++) {
+        html.push(itemHtml(movies[i], fields, posters));
+      }
+      grid.style.paddingTop = from * rowHeight + "px";
+      grid.style.paddingBottom = (rows - to) * rowHeight + "px";
+      grid.innerHTML = html.join("\n");
+    }
+
+    var pending = false;
+    function schedule() {
+      if (!pending) {
+        pending = true;
+        requestAnimationFrame(function () {
+          pending = false;
+          render();
+        });
+      }
+    }
+
+    measure();
+    render();
+    window.addEventListener("scroll", schedule, { passive: true });
+    window.addEventListener("resize", function () {
+      measure();
+      schedule();
+    });
+  }
+
+  var data = window.MOVIE_GRID_DATA;
+  if (!data || !data.movies) {
+    grid.innerHTML =
+      '<li class="movie empty">Could not load movies (data script missing).</li>';
+    return;
+  }
+  start(data);
+})();
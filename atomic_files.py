@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+"""
+Atomic file writes: content goes to a temp file next to the target and is
+renamed over it, so readers (a web server, another render process) see
+either the old or the new file, never a partial one.
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator
+
+WRITE_BUFFER_SIZE = 64 * 1024
+
+
+@contextmanager
+def atomic_writer(path: Path, *, binary: bool = False) -> Iterator[IO]:
+    """
+    Buffered file handle on a temp file next to path; renamed over path
+    when the block completes, removed if it raises.
+    """
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        if binary:
+            fh = os.fdopen(fd, "wb", buffering=WRITE_BUFFER_SIZE)
+        else:
+            fh = os.fdopen(fd, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE)
+        with fh:
+            yield fh
+        os.chmod(tmp, 0o644)  # mkstemp creates 0600; the file gets served
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """Write to a temp file next to path, then rename over it."""
+    with atomic_writer(path, binary=True) as fh:
+        fh.write(data)
@@ -0,0 +1,167 @@
+"""
+Per-call latency of the per-user movie statements versus total row count,
+on the movies table without and with the per-user indexes created by the
+schema bootstrap (ux_movies_user_title, ix_movies_user_year,
+ix_movies_user_rating).
+
+    python bench/bench_indexes.py [--rows 10000 100000 1000000] [--calls 200]
+
+Both databases hold the same rows and run the same statements, so the
+difference is the indexes alone. Each size spreads the rows over users
+with 100 movies each; every call targets a random user. Builds temporary
+databases (1M takes a while).
+"""
+
+import argparse
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+MOVIES_PER_USER = 100
+
+SCHEMA = """
+CREATE TABLE users (
+    id   INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE NOT NULL
+);
+CREATE TABLE movies (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    title      TEXT NOT NULL,
+    year       INTEGER NOT NULL,
+    rating     REAL NOT NULL,
+    poster_url TEXT,
+    user_id    INTEGER NOT NULL,
+    note       TEXT,
+    imdb_id    TEXT,
+    FOREIGN KEY(user_id) REFERENCES users(id)
+);
+"""
+# Wie im Bootstrap von movie_storage_sql
+INDEXES = """
+CREATE UNIQUE INDEX ux_movies_user_title ON movies(user_id, title COLLATE NOCASE);
+CREATE INDEX ix_movies_user_year ON movies(user_id, year, title COLLATE NOCASE);
+CREATE INDEX ix_movies_user_rating ON movies(user_id, rating, title COLLATE NOCASE);
+"""
+
+COLUMNS = "title, year, rating, poster_url, note, imdb_id"
+LIST_BY_TITLE = (
+    f"SELECT {COLUMNS} FROM movies WHERE user_id = ? ORDER BY title COLLATE NOCASE"
+)
+LIST_BY_YEAR = (
+    f"SELECT {COLUMNS} FROM movies WHERE user_id = ? "
+    "ORDER BY year DESC, title COLLATE NOCASE DESC"
+)
+LIST_BY_RATING = (
+    f"SELECT {COLUMNS} FROM movies WHERE user_id = ? "
+    "ORDER BY rating DESC, title COLLATE NOCASE DESC"
+)
+EXISTS = "SELECT 1 FROM movies WHERE user_id = ? AND title = ? COLLATE NOCASE"
+UPDATE = "UPDATE movies SET note = ? WHERE user_id = ? AND title = ? COLLATE NOCASE"
+DELETE = "DELETE FROM movies WHERE user_id = ? AND title = ? COLLATE NOCASE"
+INSERT = (
+    "INSERT INTO movies (title, year, rating, poster_url, user_id, note, imdb_id) "
+    "VALUES (?, ?, ?, NULL, ?, NULL, NULL)"
+)
+
+
+def title_of(user_id: int, n: int) -> str:
+    return f"Movie {n:03d} of user {user_id}"
+
+
+def build(path: Path, rows: int) -> int:
+    """Unindexed DB with rows movies; returns the number of users."""
+    users = max(1, rows // MOVIES_PER_USER)
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    db.executemany(
+        "INSERT INTO users (id, name) VALUES (?, ?)",
+        ((uid, f"user{uid}") for uid in range(1, users + 1)),
+    )
+    # Zeilen verschiedener User durchmischt, wie beim echten Hinzufügen
+    db.executemany(
+        INSERT,
+        (
+            (title_of(uid, n), 1950 + n % 70, (n % 100) / 10, uid)
+            for n in range(MOVIES_PER_USER)
+            for uid in range(1, users + 1)
+        ),
+    )
+    db.commit()
+    db.close()
+    return users
+
+
+def timed(fn, calls: int, users: int, rng: random.Random) -> list:
+    times = []
+    for _ in range(calls):
+        uid = rng.randint(1, users)
+        title = title_of(uid, rng.randrange(MOVIES_PER_USER))
+        start = time.perf_counter()
+        fn(uid, title)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def bench(path: Path, users: int, calls: int, rng: random.Random) -> dict:
+    db = sqlite3.connect(path)
+
+    def lister(sql):
+        return lambda uid, _title: db.execute(sql, (uid,)).fetchall()
+
+    def exists(uid, title):
+        db.execute(EXISTS, (uid, title)).fetchone()
+
+    def update(uid, title):
+        db.execute(UPDATE, ("bench", uid, title))
+        db.commit()
+
+    def delete_add(uid, title):
+        db.execute(DELETE, (uid, title))
+        db.execute(INSERT, (title, 2000, 7.0, uid))
+        db.commit()
+
+    results = {
+        "by title": timed(lister(LIST_BY_TITLE), calls, users, rng),
+        "by year": timed(lister(LIST_BY_YEAR), calls, users, rng),
+        "by rating": timed(lister(LIST_BY_RATING), calls, users, rng),
+        "exists": timed(exists, calls, users, rng),
+        "update": timed(update, calls, users, rng),
+        "delete+add": timed(delete_add, calls, users, rng),
+    }
+    db.close()
+    return results
+
+
+def report(label: str, before: list, after: list) -> None:
+    b, a = statistics.median(before), statistics.median(after)
+    print(f"  {label:<10} without {b:9.3f} ms   with {a:9.3f} ms   x{b / a:8.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            plain = Path(tmp) / "plain.db"
+            indexed = Path(tmp) / "indexed.db"
+            users = build(plain, rows)
+            shutil.copy(plain, indexed)
+            with sqlite3.connect(indexed) as db:
+                db.executescript(INDEXES)
+            before = bench(plain, users, args.calls, random.Random(args.seed))
+            after = bench(indexed, users, args.calls, random.Random(args.seed))
+        print(f"{rows} movies, {users} users (median per call)")
+        for op in before:
+            report(op, before[op], after[op])
+
+
+if __name__ == "__main__":
+    main()
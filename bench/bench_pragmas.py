@@ -0,0 +1,90 @@
+"""
+Add/list throughput of the storage API under each PRAGMA_PROFILES preset
+(and SQLite's defaults for comparison).
+
+    python bench/bench_pragmas.py [--adds 2000] [--bulk 100000] [--lists 20]
+
+add:  one add_movie call (own transaction) per movie
+bulk: add_movies_bulk in chunks of BULK_CHUNK_SIZE
+list: list_movies for a user with --bulk movies ("readonly" only lists,
+      on the database written by "fast")
+"""
+
+import argparse
+import contextlib
+import io
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import movie_storage_sql as storage  # noqa: E402
+
+# SQLite-Standard: Rollback-Journal, synchronous=FULL, kleiner Cache
+DEFAULTS = {"journal_mode": "DELETE", "synchronous": "FULL"}
+
+
+def rate(count: int, seconds: float) -> str:
+    return f"{count / seconds:10.0f}/s"
+
+
+def bench(path: Path, profile, args) -> dict:
+    storage.init_storage(f"sqlite:///{path}", profile=profile)
+    user_id = storage.get_or_create_user("bench")[0]
+    results = {}
+
+    with contextlib.redirect_stdout(io.StringIO()):  # Erfolgsmeldungen
+        start = time.perf_counter()
+        for n in range(args.adds):
+            storage.add_movie(f"Single {n}", 2000, 7.0, None, user_id)
+        results["add"] = rate(args.adds, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    storage.add_movies_bulk(
+        user_id,
+        ({"title": f"Bulk {n}", "year": 2000, "rating": 7.0} for n in range(args.bulk)),
+    )
+    results["bulk"] = rate(args.bulk, time.perf_counter() - start)
+    results.update(bench_lists(user_id, args.lists))
+    storage.get_engine().dispose()
+    return results
+
+
+def bench_lists(user_id: int, lists: int) -> dict:
+    start = time.perf_counter()
+    for _ in range(lists):
+        storage.list_movies(user_id)
+    return {"list": rate(lists, time.perf_counter() - start)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--adds", type=int, default=2000)
+    parser.add_argument("--bulk", type=int, default=100000)
+    parser.add_argument("--lists", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'profile':<10} {'add':>12} {'bulk':>12} {'list':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        profiles = [("defaults", DEFAULTS)] + [
+            (name, name) for name in storage.PRAGMA_PROFILES if name != "readonly"
+        ]
+        for name, profile in profiles:
+            results = bench(Path(tmp) / f"{name}.db", profile, args)
+            print(f"{name:<10} {results['add']:>12} {results['bulk']:>12} {results['list']:>12}")
+
+        # readonly schreibt nicht: liest die Daten des "fast"-Laufs
+        readonly = Path(tmp) / "readonly.db"
+        shutil.copy(Path(tmp) / "fast.db", readonly)
+        storage.init_storage(f"sqlite:///{readonly}", profile="readonly")
+        user_id = storage.get_user_by_name("bench")[0]
+        results = bench_lists(user_id, args.lists)
+        storage.get_engine().dispose()
+        print(f"{'readonly':<10} {'-':>12} {'-':>12} {results['list']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Movie search: the FTS5 index (search_movies, suggest_titles on a miss)
+against the original search_movie algorithm (substring test over every
+title from list_movies, difflib.get_close_matches on a miss).
+
+    python bench/bench_search.py [--sizes 1000 10000 100000] [--queries 50]
+                                 [--others 100000]
+
+Sizes are titles of the searching user; --others titles from the same
+vocabulary belong to other users (spread over 100 users), whose rows
+search_movies must not pay for. Prints the median per query for
+keywords that hit and keywords that miss.
+"""
+
+import argparse
+import difflib
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import movie_storage_sql as storage  # noqa: E402
+
+SYLLABLES = (
+    "ka ri to na mo lu se vi da ro ne ha sa te mi ko ra li an el or "
+    "in us ar en is on star dark night king lost love war fire moon"
+).split()
+
+
+def make_words(rng: random.Random) -> list:
+    return sorted({"".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(20000)})
+
+
+def original_search(user_id: int, keyword: str) -> list:
+    movies = storage.list_movies(user_id)
+    found = [title for title in movies if keyword in title.lower()]
+    if found:
+        return found
+    return difflib.get_close_matches(keyword, movies.keys(), n=5, cutoff=0.4)
+
+
+def fts_search(user_id: int, keyword: str) -> list:
+    found = storage.search_movies(user_id, keyword)
+    if found:
+        return list(found)
+    return list(storage.suggest_titles(user_id, keyword))
+
+
+def timed(fn, user_id: int, keywords: list) -> float:
+    times = []
+    for keyword in keywords:
+        start = time.perf_counter()
+        fn(user_id, keyword)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+OTHER_USERS = 100
+
+
+def make_titles(rng: random.Random, words: list, count: int) -> set:
+    titles = set()
+    while len(titles) < count:
+        titles.add(" ".join(rng.choices(words, k=rng.randint(1, 4))).title())
+    return titles
+
+
+def bench(size: int, others: int, n_queries: int, rng: random.Random) -> None:
+    words = make_words(rng)
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.init_storage(f"sqlite:///{tmp}/bench.db")
+        for n in range(OTHER_USERS if others else 0):
+            other_id = storage.get_or_create_user(f"other {n}")[0]
+            storage.add_movies_bulk(
+                other_id,
+                (
+                    {"title": t, "year": 2000, "rating": 7.0}
+                    for t in make_titles(rng, words, others // OTHER_USERS)
+                ),
+            )
+        user_id = storage.get_or_create_user("bench")[0]
+        storage.add_movies_bulk(
+            user_id,
+            ({"title": t, "year": 2000, "rating": 7.0} for t in make_titles(rng, words, size)),
+        )
+
+        hits = [rng.choice(words) for _ in range(n_queries)]
+        # difflib braucht auf großen Sammlungen Sekunden pro Fehlschlag
+        # (über alle Titel): weniger Abfragen
+        misses = [
+            "qx" + rng.choice(words) for _ in range(max(3, n_queries * 1000 // size))
+        ]
+
+        print(f"{size} titles, {others} of other users (median per query)")
+        for label, keywords in (("hit", hits), ("miss", misses)):
+            before = timed(original_search, user_id, keywords)
+            after = timed(fts_search, user_id, keywords)
+            print(
+                f"  {label:<5} original {before:9.2f} ms   fts {after:8.2f} ms"
+                f"   x{before / after:7.1f}"
+            )
+        storage.get_engine().dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--others", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    for size in args.sizes:
+        bench(size, args.others, args.queries, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Startup cost of opening the database versus row count: the original
+bootstrap (four ALTER TABLE attempts with swallowed errors plus a
+full-table UPDATE on every start) against init_storage() with a current
+schema, and the one-time migration of an original-schema database.
+
+    python bench/bench_startup.py [--rows 10000 100000 1000000] [--starts 20]
+
+Prints the median per start and the statements it ran.
+"""
+
+import argparse
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import movie_storage_sql as storage  # noqa: E402
+
+BASELINE_SCHEMA = """
+CREATE TABLE users (
+    id   INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE NOT NULL
+);
+CREATE TABLE movies (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    title      TEXT NOT NULL,
+    year       INTEGER NOT NULL,
+    rating     REAL NOT NULL,
+    poster_url TEXT,
+    user_id    INTEGER NOT NULL,
+    note       TEXT,
+    imdb_id    TEXT,
+    FOREIGN KEY(user_id) REFERENCES users(id)
+);
+INSERT INTO users (name) VALUES ('Default');
+"""
+
+# Zählt Statements aller Engines
+statements: list = []
+event.listen(
+    Engine, "before_cursor_execute", lambda conn, cur, stmt, *args: statements.append(stmt)
+)
+
+
+def build_baseline(path: Path, rows: int) -> None:
+    db = sqlite3.connect(path)
+    db.executescript(BASELINE_SCHEMA)
+    db.executemany(
+        "INSERT INTO movies (title, year, rating, user_id) VALUES (?, ?, ?, ?)",
+        ((f"Movie {n}", 1950 + n % 70, (n % 100) / 10, 1 + n % 1000) for n in range(rows)),
+    )
+    db.executemany(
+        "INSERT OR IGNORE INTO users (id, name) VALUES (?, ?)",
+        ((uid, f"user{uid}") for uid in range(2, 1001)),
+    )
+    db.commit()
+    db.close()
+
+
+def original_start(url: str) -> None:
+    """Module bootstrap of the original storage code (echo off)."""
+    engine = create_engine(url)
+    with engine.connect() as connection:
+        for ddl in (
+            "CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "name TEXT UNIQUE NOT NULL)",
+            "CREATE TABLE IF NOT EXISTS movies (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "title TEXT NOT NULL, year INTEGER NOT NULL, rating REAL NOT NULL, "
+            "poster_url TEXT, user_id INTEGER NOT NULL, note TEXT, imdb_id TEXT)",
+        ):
+            connection.execute(text(ddl))
+        for ddl in (
+            "ALTER TABLE movies ADD COLUMN poster_url TEXT",
+            "ALTER TABLE movies ADD COLUMN user_id INTEGER",
+            "ALTER TABLE movies ADD COLUMN note TEXT",
+            "ALTER TABLE movies ADD COLUMN imdb_id TEXT",
+        ):
+            try:
+                connection.execute(text(ddl))
+            except Exception:
+                pass
+        connection.execute(
+            text("INSERT OR IGNORE INTO users(name) VALUES (:n)"), {"n": "Default"}
+        )
+        default_uid = connection.execute(
+            text("SELECT id FROM users WHERE name = :n"), {"n": "Default"}
+        ).scalar()
+        connection.execute(
+            text("UPDATE movies SET user_id = :uid WHERE user_id IS NULL"),
+            {"uid": default_uid},
+        )
+        connection.commit()
+    engine.dispose()
+
+
+def current_start(url: str) -> None:
+    engine = storage.init_storage(url)
+    with engine.connect():  # Engine verbindet erst bei Bedarf
+        pass
+    engine.dispose()
+
+
+def timed(fn, starts: int, prepare=None) -> tuple:
+    """(median ms, statements of the last start)."""
+    times = []
+    for _ in range(starts):
+        if prepare is not None:
+            prepare()
+        statements.clear()
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), list(statements)
+
+
+def report(label: str, result: tuple) -> None:
+    ms, stmts = result
+    ddl = sum(s.lstrip().split(None, 1)[0].upper() in ("CREATE", "ALTER", "DROP") for s in stmts)
+    print(f"  {label:<22} {ms:9.2f} ms   {len(stmts):4d} statements ({ddl} DDL)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--starts", type=int, default=20)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline = Path(tmp) / "baseline.db"
+            original = Path(tmp) / "original.db"
+            current = Path(tmp) / "current.db"
+            build_baseline(baseline, rows)
+            shutil.copy(baseline, original)
+            shutil.copy(baseline, current)
+            current_start(f"sqlite:///{current}")
+
+            print(f"{rows} movies (median per start)")
+            report("original bootstrap", timed(
+                lambda: original_start(f"sqlite:///{original}"), args.starts
+            ))
+            report("current schema", timed(
+                lambda: current_start(f"sqlite:///{current}"), args.starts
+            ))
+            migrating = Path(tmp) / "migrating.db"
+            report("migrate original DB", timed(
+                lambda: current_start(f"sqlite:///{migrating}"),
+                max(1, args.starts // 10),
+                prepare=lambda: shutil.copy(baseline, migrating),
+            ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+'Did you mean' suggestions (suggest_titles) against one user's collection
+of 10k/100k/1M titles, with a second user of the same size in the same DB.
+
+    python bench/bench_suggest.py [--sizes 10000 100000 1000000] [--queries 200]
+
+Prints the median and p95 per query for misspelled, short and unknown
+keywords, how often a misspelled title was among the suggestions and,
+for comparison, difflib over all of the user's titles (what the old
+fallback did on every miss). Builds a temporary database per size (1M
+takes a while).
+"""
+
+import argparse
+import difflib
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import movie_storage_sql as storage  # noqa: E402
+
+SYLLABLES = (
+    "ka ri to na mo lu se vi da ro ne ha sa te mi ko ra li an el or "
+    "in us ar en is on star dark night king lost love war fire moon"
+).split()
+
+
+def make_titles(n: int, rng: random.Random) -> list:
+    # Wortschatz aus Silben: ähnlich gestreute Trigramme wie echte Titel
+    words = list({"".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(20000)})
+    titles = set()
+    while len(titles) < n:
+        title = " ".join(rng.choices(words, k=rng.randint(1, 4))).title()
+        titles.add(title if title not in titles else f"{title} {rng.randint(2, 9)}")
+    return sorted(titles)
+
+
+def misspell(title: str, rng: random.Random) -> str:
+    chars = list(title.lower())
+    i = rng.randrange(len(chars) - 1)
+    chars[i], chars[i + 1] = chars[i + 1], chars[i]
+    return "".join(chars)
+
+
+def timed(queries, user_id: int, expected=None) -> list:
+    """Times per query; with expected titles also prints how often they were suggested."""
+    times = []
+    found = 0
+    for i, keyword in enumerate(queries):
+        start = time.perf_counter()
+        suggestions = storage.suggest_titles(user_id, keyword)
+        times.append((time.perf_counter() - start) * 1000)
+        found += expected is not None and expected[i] in suggestions
+    if expected is not None:
+        print(f"  {'suggested':<12} {found / len(queries):8.0%} of misspelled titles")
+    return times
+
+
+def timed_full_scan(queries, titles: list) -> list:
+    lowered = [t.lower() for t in titles]
+    times = []
+    for keyword in queries:
+        start = time.perf_counter()
+        difflib.get_close_matches(
+            keyword, lowered, n=storage.SUGGEST_LIMIT, cutoff=storage.SUGGEST_CUTOFF
+        )
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def report(label: str, times: list) -> None:
+    times.sort()
+    p95 = times[int(len(times) * 0.95) - 1]
+    print(f"  {label:<12} median {statistics.median(times):8.2f} ms   p95 {p95:8.2f} ms")
+
+
+def bench(size: int, n_queries: int, rng: random.Random) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = storage.init_storage(f"sqlite:///{tmp}/bench.db")
+        users = [storage.get_or_create_user(name)[0] for name in ("bench", "other")]
+        start = time.perf_counter()
+        for user_id in users:
+            storage.add_movies_bulk(
+                user_id,
+                (
+                    {"title": title, "year": 2000, "rating": 7.0}
+                    for title in make_titles(size, rng)
+                ),
+            )
+        elapsed = time.perf_counter() - start
+        print(f"{size} titles per user (2 users): loaded in {elapsed:.1f} s")
+
+        titles = list(storage.list_movies(users[0]))
+        sample = rng.sample(titles, min(n_queries, len(titles)))
+        report("misspelled", timed([misspell(t, rng) for t in sample], users[0], sample))
+        report("short", timed([t[:2] for t in sample], users[0]))
+        report("unknown", timed(["zzxq" + str(i) for i in range(n_queries)], users[0]))
+        scan = [misspell(t, rng) for t in sample[:5]]
+        report("full scan", timed_full_scan(scan, titles))
+        engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    for size in args.sizes:
+        bench(size, args.queries, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+"""
+In-process latency histograms, labelled per call-site / endpoint.
+Export as JSON or Prometheus text exposition format.
+"""
+
+import json
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+# Bucket upper bounds in milliseconds (Prometheus "le" semantics)
+DEFAULT_BUCKETS_MS: Tuple[float, ...] = (
+    0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000,
+)
+
+
+class LatencyHistogram:
+    """
+    Cumulative latency histogram plus a running row counter. The counter
+    stays None (and is left out of snapshots) until a known row count is
+    observed: a missing one is not reported as 0.
+    """
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS_MS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.rows: Optional[int] = None
+
+    def observe(self, elapsed_ms: float, rows: Optional[int] = None) -> None:
+        for i, upper in enumerate(self.buckets):
+            if elapsed_ms <= upper:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum_ms += elapsed_ms
+        if rows is not None and rows >= 0:
+            self.rows = (self.rows or 0) + rows
+
+    def add_rows(self, rows: int) -> None:
+        """Count rows known only after the observation (fetched results)."""
+        self.rows = (self.rows or 0) + rows
+
+    def snapshot(self) -> Dict[str, object]:
+        cumulative = []
+        running = 0
+        for upper, n in zip(self.buckets, self.counts):
+            running += n
+            cumulative.append([upper, running])
+        snap: Dict[str, object] = {
+            "count": self.count,
+            "sum_ms": round(self.sum_ms, 3),
+            "buckets": cumulative,
+        }
+        if self.rows is not None:
+            snap["rows"] = self.rows
+        return snap
+
+
+class HistogramRegistry:
+    """Thread-safe set of LatencyHistograms keyed by a single label value."""
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        label: str,
+        buckets: Iterable[float] = DEFAULT_BUCKETS_MS,
+    ) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._buckets = tuple(buckets)
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, key: str, elapsed_ms: float, rows: Optional[int] = None) -> None:
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = LatencyHistogram(self._buckets)
+            hist.observe(elapsed_ms, rows)
+
+    def add_rows(self, key: str, rows: int) -> None:
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = LatencyHistogram(self._buckets)
+            hist.add_rows(rows)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+    def to_dict(self) -> Dict[str, Dict[str, object]]:
+        with self._lock:
+            return {key: h.snapshot() for key, h in sorted(self._histograms.items())}
+
+    def to_json(self) -> str:
+        return json.dumps({self.name: self.to_dict()}, indent=2)
+
+    def to_prometheus(self) -> str:
+        lines = [
+            f"# HELP {self.name}_ms {self.help_text}",
+            f"# TYPE {self.name}_ms histogram",
+        ]
+        rows_lines = [
+            f"# HELP {self.name}_rows_total Rows reported per {self.label}.",
+            f"# TYPE {self.name}_rows_total counter",
+        ]
+        for key, snap in self.to_dict().items():
+            label = f'{self.label}="{_escape_label(key)}"'
+            for upper, cumulative in snap["buckets"]:  # type: ignore[union-attr]
+                lines.append(f'{self.name}_ms_bucket{{{label},le="{upper}"}} {cumulative}')
+            lines.append(f'{self.name}_ms_bucket{{{label},le="+Inf"}} {snap["count"]}')
+            lines.append(f"{self.name}_ms_sum{{{label}}} {snap['sum_ms']}")
+            lines.append(f"{self.name}_ms_count{{{label}}} {snap['count']}")
+            if "rows" in snap:
+                rows_lines.append(f"{self.name}_rows_total{{{label}}} {snap['rows']}")
+        if len(rows_lines) == 2:
+            rows_lines = []
+        return "\n".join(lines + rows_lines) + "\n"
+
+    def dump(self, fmt: str = "json") -> str:
+        if fmt == "json":
+            return self.to_json()
+        if fmt == "prometheus":
+            return self.to_prometheus()
+        raise ValueError(f"Unknown metrics format '{fmt}' (use 'json' or 'prometheus').")
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -1,19 +1,125 @@
 from __future__ import annotations
 
-from typing import Dict, List, Optional, Tuple
+import difflib
+import json
+import os
+import random
+import re
+import string
+import sys
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
 
-from sqlalchemy import create_engine, text
+from sqlalchemy import bindparam, create_engine, event, text
+from sqlalchemy.engine import Engine, Row
 
-# Database URL
-DB_URL = "sqlite:///movies.db"
+from metrics import HistogramRegistry
 
-# Engine (echo=True: SQL-Logging während Entwicklung)
-engine = create_engine(DB_URL, echo=True)
+# Database URL (per Prozess über $MOVIES_DB_URL oder init_storage() änderbar)
+DEFAULT_DB_URL = "sqlite:///movies.db"
+DB_URL_ENV = "MOVIES_DB_URL"
+
+# SQLite-Pragmas, beim Öffnen jeder Verbindung gesetzt.
+# durable:  WAL, synchronous=FULL (kein Commit geht bei Stromausfall verloren)
+# fast:     WAL, synchronous=NORMAL, großer Cache + mmap (Standard)
+# readonly: query_only, keine Schreibzugriffe, keine Migrationen
+PRAGMA_PROFILES: Dict[str, Dict[str, Union[str, int]]] = {
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -16000,  # KiB
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,  # ms
+    },
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 268435456,  # 256 MiB
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "readonly": {
+        "query_only": "ON",
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+}
+DEFAULT_PRAGMA_PROFILE = "fast"
+PRAGMA_PROFILE_ENV = "MOVIES_DB_PROFILE"
+
+# Sortierbare Spalten für query_movies (Titel ist immer Tie-Breaker) und
+# der Index (user_id, <Spalte>, title COLLATE NOCASE), über den sortiert
+# wird – die Sortierschlüssel liegen dafür als Kopie in user_movies
+SORT_COLUMNS = {
+    "title": "ux_user_movies_title",
+    "year": "ix_user_movies_year",
+    "rating": "ix_user_movies_rating",
+}
+# Seitengröße für iter_movies (Keyset-Pagination)
+PAGE_SIZE = 500
+# Spalten (in Reihenfolge) des JSON-Exports für den Client-Modus der Website
+JSON_EXPORT_FIELDS = ("title", "year", "rating", "poster_url", "note", "imdb_id")
+
+# Erlaubte Gewichtungsspalten für random_movie und Anzahl der
+# zwischengespeicherten Alias-Tabellen (eine je User und Spalte)
+WEIGHT_COLUMNS = {"rating"}
+RANDOM_ALIAS_CACHE_SIZE = 64
+
+# Volltextsuche: Standardanzahl Treffer; movies_fts-rowid ist
+# (user_id << FTS_USER_SHIFT) + movies.id (ein rowid-Bereich pro User)
+SEARCH_LIMIT = 20
+FTS_USER_SHIFT = 32
+
+# Fuzzy-Vorschläge: Anzahl, Mindest-Ähnlichkeit (wie difflib),
+# Kandidaten pro Vorschlag aus title_grams und höchstens gelesene
+# title_grams-Zeilen pro Abfrage (seltenste Trigramme zuerst)
+SUGGEST_LIMIT = 5
+SUGGEST_CUTOFF = 0.4
+SUGGEST_CANDIDATES_PER_RESULT = 10
+SUGGEST_POSTINGS_BUDGET = 20000
+
+# Bulk-Import: Datensätze pro executemany-Aufruf
+BULK_CHUNK_SIZE = 500
+
+# SQLite NOCASE faltet nur ASCII – für Duplikat-Erkennung in Python nachbilden
+_NOCASE = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+# Engine wird erst bei der ersten Nutzung erzeugt (siehe get_engine)
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+
+# Alias-Tabellen für gewichtete Zufallsauswahl:
+# (user_id, Spalte) -> (users.movies_version beim Aufbau, Tabelle oder None)
+_alias_tables: OrderedDict[Tuple[int, str], Tuple[int, Optional[_AliasTable]]] = OrderedDict()
+_alias_lock = threading.Lock()
+
+# Opt-in Query-Timing (siehe enable_query_metrics)
+query_metrics = HistogramRegistry(
+    "movies_db_query",
+    "SQL statement latency per storage call-site.",
+    label="call_site",
+)
+_query_metrics_enabled = False
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Schema setup & migrations
+#
+# Versioniert über PRAGMA user_version: jede Migration läuft genau einmal,
+# bei aktuellem Schema führt der Start keinerlei DDL aus.
 # ──────────────────────────────────────────────────────────────────────────────
-with engine.connect() as connection:
+def _table_columns(connection, table: str) -> set[str]:
+    rows = connection.exec_driver_sql(f"PRAGMA table_info({table})").fetchall()
+    return {r[1] for r in rows}
+
+
+def _migrate_base_schema(connection) -> None:
+    """v1: users/movies tables; upgrades DBs created before versioning."""
     # Users
     connection.execute(
         text(
@@ -45,17 +151,16 @@ with engine.connect() as connection:
         )
     )
 
-    # Upgrades für bestehende DBs (ignorieren, falls Spalte schon existiert)
-    for ddl in (
-        "ALTER TABLE movies ADD COLUMN poster_url TEXT",
-        "ALTER TABLE movies ADD COLUMN user_id INTEGER",
-        "ALTER TABLE movies ADD COLUMN note TEXT",
-        "ALTER TABLE movies ADD COLUMN imdb_id TEXT",
+    # Upgrades für alte DBs ohne diese Spalten
+    existing = _table_columns(connection, "movies")
+    for column, ddl in (
+        ("poster_url", "ALTER TABLE movies ADD COLUMN poster_url TEXT"),
+        ("user_id", "ALTER TABLE movies ADD COLUMN user_id INTEGER"),
+        ("note", "ALTER TABLE movies ADD COLUMN note TEXT"),
+        ("imdb_id", "ALTER TABLE movies ADD COLUMN imdb_id TEXT"),
     ):
-        try:
+        if column not in existing:
             connection.execute(text(ddl))
-        except Exception:
-            pass
 
     # Default-User anlegen & user_id auffüllen
     connection.execute(
@@ -70,14 +175,800 @@ with engine.connect() as connection:
         {"uid": default_uid},
     )
 
-    connection.commit()
+
+def _dedupe_user_titles(connection) -> None:
+    """
+    Rename titles that differ from an older title of the same user only
+    in case ("Heat" / "heat"): the check before v2 was case-sensitive.
+    The oldest row keeps its title, later ones become "heat (2)", ...
+    """
+    dupes = connection.execute(
+        text(
+            """
+            SELECT id, user_id, title FROM (
+                SELECT id, user_id, title, ROW_NUMBER() OVER (
+                    PARTITION BY user_id, title COLLATE NOCASE ORDER BY id
+                ) AS rn
+                FROM movies
+            )
+            WHERE rn > 1
+            ORDER BY id
+            """
+        )
+    ).fetchall()
+    if not dupes:
+        return
+
+    taken: Dict[int, set] = {}
+    rows = connection.execute(
+        text("SELECT user_id, title FROM movies WHERE user_id IN :uids").bindparams(
+            bindparam("uids", expanding=True)
+        ),
+        {"uids": list({d[1] for d in dupes})},
+    )
+    for user_id, title in rows:
+        taken.setdefault(user_id, set()).add(title.translate(_NOCASE))
+    for movie_id, user_id, title in dupes:
+        n = 2
+        while f"{title} ({n})".translate(_NOCASE) in taken[user_id]:
+            n += 1
+        new_title = f"{title} ({n})"
+        taken[user_id].add(new_title.translate(_NOCASE))
+        connection.execute(
+            text("UPDATE movies SET title = :t WHERE id = :id"),
+            {"t": new_title, "id": movie_id},
+        )
+
+
+def _migrate_movie_indexes(connection) -> None:
+    """v2: per-user unique title + year/rating sort indexes."""
+    _dedupe_user_titles(connection)
+    # users(name) ist bereits über UNIQUE indiziert.
+    for ddl in (
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_movies_user_title "
+        "ON movies(user_id, title COLLATE NOCASE)",
+        "CREATE INDEX IF NOT EXISTS ix_movies_user_year "
+        "ON movies(user_id, year, title COLLATE NOCASE)",
+        "CREATE INDEX IF NOT EXISTS ix_movies_user_rating "
+        "ON movies(user_id, rating, title COLLATE NOCASE)",
+    ):
+        connection.execute(text(ddl))
+
+
+def _migrate_random_picks(connection) -> None:
+    """
+    v3: dense per-user movies.seq (1..count) for uniform random picks and
+    users.movies_version for the weighted-pick cache, both kept by triggers.
+    """
+    connection.execute(text("ALTER TABLE movies ADD COLUMN seq INTEGER"))
+    connection.execute(
+        text(
+            """
+            UPDATE movies SET seq = numbered.seq
+            FROM (
+                SELECT id, ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY id) AS seq
+                FROM movies
+            ) AS numbered
+            WHERE numbered.id = movies.id
+            """
+        )
+    )
+    connection.execute(
+        text("CREATE UNIQUE INDEX IF NOT EXISTS ux_movies_user_seq ON movies(user_id, seq)")
+    )
+    connection.execute(
+        text("ALTER TABLE users ADD COLUMN movies_version INTEGER NOT NULL DEFAULT 0")
+    )
+    for ddl in _random_pick_triggers("movies"):
+        connection.execute(text(ddl))
+
+
+def _random_pick_triggers(table: str) -> Tuple[str, ...]:
+    """Triggers keeping seq dense and bumping users.movies_version (v3, v7)."""
+    return (
+        f"""
+        CREATE TRIGGER IF NOT EXISTS movies_seq_ai AFTER INSERT ON {table} BEGIN
+            UPDATE {table} SET seq = (
+                SELECT COALESCE(MAX(seq), 0) + 1 FROM {table} WHERE user_id = new.user_id
+            )
+            WHERE id = new.id;
+            UPDATE users SET movies_version = movies_version + 1 WHERE id = new.user_id;
+        END
+        """,
+        # Lücke schließen: die letzte Zeile des Users übernimmt die seq
+        f"""
+        CREATE TRIGGER IF NOT EXISTS movies_seq_ad AFTER DELETE ON {table} BEGIN
+            UPDATE {table} SET seq = old.seq
+            WHERE user_id = old.user_id
+              AND seq = (SELECT MAX(seq) FROM {table} WHERE user_id = old.user_id)
+              AND seq > old.seq;
+            UPDATE users SET movies_version = movies_version + 1 WHERE id = old.user_id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS movies_version_au AFTER UPDATE OF rating ON {table}
+        BEGIN
+            UPDATE users SET movies_version = movies_version + 1 WHERE id = new.user_id;
+        END
+        """,
+    )
+
+
+def _has_fts5(connection) -> bool:
+    return bool(
+        connection.exec_driver_sql(
+            "SELECT sqlite_compileoption_used('ENABLE_FTS5')"
+        ).scalar()
+    )
+
+
+def _migrate_fulltext_search(connection) -> None:
+    """
+    v4: FTS5 index over title + note, keyed per user. The rowid is
+    (user_id << FTS_USER_SHIFT) + movies.id, so search_movies restricts
+    MATCH to one rowid range and FTS5 only reads that user's postings.
+
+    The table is contentless (its rowids are not movies.id); the triggers
+    pass the old title and note to FTS5's 'delete' command.
+    """
+    if not _has_fts5(connection):
+        # search_movies fällt dann auf LIKE zurück
+        return
+
+    connection.execute(
+        text(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5(
+                title, note,
+                content='',
+                prefix='2 3'
+            )
+            """
+        )
+    )
+    for ddl in _fulltext_triggers("movies"):
+        connection.execute(text(ddl))
+    connection.execute(
+        text(
+            f"""
+            INSERT INTO movies_fts(rowid, title, note)
+            SELECT (user_id << {FTS_USER_SHIFT}) + id, title, note FROM movies
+            """
+        )
+    )
+
+
+def _fulltext_triggers(table: str) -> Tuple[str, ...]:
+    """Triggers keeping movies_fts in sync with table (v4, v7)."""
+    return (
+        f"""
+        CREATE TRIGGER IF NOT EXISTS movies_fts_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO movies_fts(rowid, title, note)
+            VALUES ((new.user_id << {FTS_USER_SHIFT}) + new.id, new.title, new.note);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS movies_fts_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO movies_fts(movies_fts, rowid, title, note)
+            VALUES ('delete', (old.user_id << {FTS_USER_SHIFT}) + old.id, old.title, old.note);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS movies_fts_au AFTER UPDATE OF title, note ON {table}
+        BEGIN
+            INSERT INTO movies_fts(movies_fts, rowid, title, note)
+            VALUES ('delete', (old.user_id << {FTS_USER_SHIFT}) + old.id, old.title, old.note);
+            INSERT INTO movies_fts(rowid, title, note)
+            VALUES ((new.user_id << {FTS_USER_SHIFT}) + new.id, new.title, new.note);
+        END
+        """,
+    )
+
+
+def _title_grams(title: str) -> set[str]:
+    """Trigrams of the lowercased title, padded so short words have some."""
+    padded = f"  {title.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _index_title_grams(connection, movies: Iterable[Tuple[int, int, str]]) -> None:
+    """Add title_grams rows (and counts) for (user_id, movies.id, title) triples."""
+    for chunk in _chunked(movies, BULK_CHUNK_SIZE):
+        rows = [
+            {"uid": uid, "gram": gram, "id": movie_id}
+            for uid, movie_id, title in chunk
+            for gram in _title_grams(title)
+        ]
+        connection.execute(
+            text(
+                "INSERT INTO title_grams (user_id, gram, movie_id) "
+                "VALUES (:uid, :gram, :id)"
+            ),
+            rows,
+        )
+        counts: Dict[Tuple[int, str], int] = {}
+        for r in rows:
+            key = (r["uid"], r["gram"])
+            counts[key] = counts.get(key, 0) + 1
+        connection.execute(
+            text(
+                """
+                INSERT INTO title_gram_counts (user_id, gram, n) VALUES (:uid, :gram, :n)
+                ON CONFLICT (user_id, gram) DO UPDATE SET n = n + excluded.n
+                """
+            ),
+            [{"uid": uid, "gram": gram, "n": n} for (uid, gram), n in counts.items()],
+        )
+
+
+def _title_grams_trigger(table: str) -> str:
+    """Trigger removing a deleted movie's title_grams rows (v5, v7)."""
+    return f"""
+        CREATE TRIGGER title_grams_ad AFTER DELETE ON {table} BEGIN
+            UPDATE title_gram_counts SET n = n - 1
+            WHERE user_id = old.user_id
+              AND gram IN (SELECT gram FROM title_grams WHERE movie_id = old.id);
+            DELETE FROM title_grams WHERE movie_id = old.id;
+        END
+        """
+
+
+def _migrate_title_grams(connection) -> None:
+    """
+    v5: per-user trigram table for 'Did you mean' suggestions, plus the
+    number of titles per (user_id, gram).
+
+    Grams are computed in Python (Unicode-aware lower()) and written by
+    add_movie/add_movies_bulk; a trigger removes them with the movie.
+    """
+    for ddl in (
+        """
+        CREATE TABLE title_grams (
+            user_id  INTEGER NOT NULL,
+            gram     TEXT NOT NULL,
+            movie_id INTEGER NOT NULL,
+            PRIMARY KEY (user_id, gram, movie_id)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE title_gram_counts (
+            user_id INTEGER NOT NULL,
+            gram    TEXT NOT NULL,
+            n       INTEGER NOT NULL,
+            PRIMARY KEY (user_id, gram)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX ix_title_grams_movie ON title_grams(movie_id)",
+        _title_grams_trigger("movies"),
+    ):
+        connection.execute(text(ddl))
+
+    def movies() -> Iterator[Tuple[int, int, str]]:
+        result = connection.execute(text("SELECT user_id, id, title FROM movies"))
+        while rows := result.fetchmany(PAGE_SIZE):
+            yield from (tuple(r) for r in rows)
+
+    _index_title_grams(connection, movies())
+
+
+def _migrate_omdb_cache(connection) -> None:
+    """v6: persistent OMDb response cache (payload NULL = negative entry)."""
+    connection.execute(
+        text(
+            """
+            CREATE TABLE IF NOT EXISTS omdb_cache (
+                cache_key  TEXT PRIMARY KEY,
+                imdb_id    TEXT,
+                payload    TEXT,
+                error      TEXT,
+                fetched_at REAL NOT NULL,
+                last_used  REAL NOT NULL
+            )
+            """
+        )
+    )
+    connection.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_omdb_cache_last_used "
+            "ON omdb_cache(last_used)"
+        )
+    )
+
+
+def _table_exists(connection, name: str) -> bool:
+    return (
+        connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = :n"), {"n": name}
+        ).fetchone()
+        is not None
+    )
+
+
+def _migrate_title_catalog(connection) -> None:
+    """
+    v7: split movies into a shared titles catalog (one row per imdb_id)
+    and per-user user_movies rows; movies becomes a read-only view.
+
+    user_movies keeps the movies ids (movies_fts rowids and title_grams
+    stay valid) and carries copies of the sort keys title, year and the
+    effective rating, so every per-user sort runs on one composite
+    index. A trigger on titles fans catalog changes out to these copies.
+    """
+    connection.execute(
+        text(
+            """
+            CREATE TABLE titles (
+                id             INTEGER PRIMARY KEY AUTOINCREMENT,
+                imdb_id        TEXT UNIQUE,
+                title          TEXT NOT NULL,
+                year           INTEGER NOT NULL,
+                rating         REAL NOT NULL,
+                poster_url     TEXT,
+                source_imdb_id TEXT
+            )
+            """
+        )
+    )
+    connection.execute(
+        text(
+            """
+            CREATE TABLE user_movies (
+                id              INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id         INTEGER NOT NULL,
+                title_id        INTEGER NOT NULL,
+                note            TEXT,
+                personal_rating REAL,
+                seq             INTEGER,
+                title           TEXT NOT NULL,
+                year            INTEGER NOT NULL,
+                rating          REAL NOT NULL,
+                UNIQUE (user_id, title_id),
+                FOREIGN KEY(user_id) REFERENCES users(id),
+                FOREIGN KEY(title_id) REFERENCES titles(id)
+            )
+            """
+        )
+    )
+
+    # Katalog: je imdb_id eine Zeile (Metadaten der zuletzt angelegten Kopie)
+    connection.execute(
+        text(
+            """
+            INSERT INTO titles (imdb_id, title, year, rating, poster_url)
+            SELECT imdb_id, title, year, rating, poster_url FROM movies
+            WHERE id IN (
+                SELECT MAX(id) FROM movies WHERE imdb_id IS NOT NULL GROUP BY imdb_id
+            )
+            """
+        )
+    )
+    # Auf den Katalog verweisen nur Zeilen mit gleichem Titel (NOCASE, dank
+    # ux_movies_user_title höchstens eine pro User), Jahr und Poster – sonst
+    # würden Daten des Users überschrieben. Alle anderen Zeilen bekommen
+    # einen eigenen Eintrag; ihre imdb_id bleibt als source_imdb_id erhalten
+    # (imdb_id ist in titles eindeutig).
+    connection.execute(
+        text(
+            """
+            CREATE TEMP TABLE v7_linked AS
+            SELECT m.id FROM movies AS m JOIN titles AS t ON t.imdb_id = m.imdb_id
+            WHERE m.title = t.title COLLATE NOCASE
+              AND m.year = t.year
+              AND (m.poster_url IS NULL OR m.poster_url = t.poster_url)
+            """
+        )
+    )
+    standalone = "id NOT IN (SELECT id FROM v7_linked)"
+
+    # Gleiche ROW_NUMBER-Reihenfolge für titles und user_movies
+    base_id = connection.execute(text("SELECT COALESCE(MAX(id), 0) FROM titles")).scalar()
+    connection.execute(
+        text(
+            f"""
+            INSERT INTO titles (id, imdb_id, title, year, rating, poster_url, source_imdb_id)
+            SELECT :base + ROW_NUMBER() OVER (ORDER BY id), NULL,
+                   title, year, rating, poster_url, imdb_id
+            FROM movies WHERE {standalone}
+            """
+        ),
+        {"base": base_id},
+    )
+    # Weicht die Bewertung eines Users vom Katalog ab, bleibt sie als
+    # personal_rating erhalten
+    connection.execute(
+        text(
+            """
+            INSERT INTO user_movies
+                (id, user_id, title_id, note, personal_rating, seq, title, year, rating)
+            SELECT m.id, m.user_id, t.id, m.note, NULLIF(m.rating, t.rating), m.seq,
+                   t.title, t.year, m.rating
+            FROM movies AS m JOIN titles AS t ON t.imdb_id = m.imdb_id
+            WHERE m.id IN (SELECT id FROM v7_linked)
+            """
+        )
+    )
+    connection.execute(
+        text(
+            f"""
+            INSERT INTO user_movies (id, user_id, title_id, note, seq, title, year, rating)
+            SELECT id, user_id, :base + ROW_NUMBER() OVER (ORDER BY id), note, seq,
+                   title, year, rating
+            FROM movies WHERE {standalone}
+            """
+        ),
+        {"base": base_id},
+    )
+    connection.execute(text("DROP TABLE v7_linked"))
+    # Trigger und Indizes von movies verschwinden mit der Tabelle
+    connection.execute(text("DROP TABLE movies"))
+
+    for ddl in (
+        "CREATE UNIQUE INDEX ux_user_movies_title "
+        "ON user_movies(user_id, title COLLATE NOCASE)",
+        "CREATE INDEX ix_user_movies_year "
+        "ON user_movies(user_id, year, title COLLATE NOCASE)",
+        "CREATE INDEX ix_user_movies_rating "
+        "ON user_movies(user_id, rating, title COLLATE NOCASE)",
+        "CREATE UNIQUE INDEX ux_user_movies_seq ON user_movies(user_id, seq)",
+        "CREATE INDEX ix_user_movies_title_id ON user_movies(title_id)",
+        # Katalogänderungen in die Sortierschlüssel der User übernehmen
+        """
+        CREATE TRIGGER titles_fanout_au AFTER UPDATE OF title, year, rating ON titles
+        BEGIN
+            UPDATE user_movies
+            SET title = new.title,
+                year = new.year,
+                rating = COALESCE(personal_rating, new.rating)
+            WHERE title_id = new.id;
+        END
+        """,
+        *_random_pick_triggers("user_movies"),
+        _title_grams_trigger("user_movies"),
+    ):
+        connection.execute(text(ddl))
+
+    # Lesesicht mit den bisherigen Spalten (id = user_movies.id)
+    connection.execute(
+        text(
+            """
+            CREATE VIEW movies AS
+            SELECT um.id AS id,
+                   um.title AS title,
+                   um.year AS year,
+                   um.rating AS rating,
+                   t.poster_url AS poster_url,
+                   um.user_id AS user_id,
+                   um.note AS note,
+                   COALESCE(t.imdb_id, t.source_imdb_id) AS imdb_id,
+                   um.personal_rating AS personal_rating,
+                   um.title_id AS title_id,
+                   um.seq AS seq
+            FROM user_movies AS um
+            JOIN titles AS t ON t.id = um.title_id
+            """
+        )
+    )
+
+    if _table_exists(connection, "movies_fts"):
+        # Katalogtitel können sich in der Schreibweise unterscheiden
+        connection.execute(text("INSERT INTO movies_fts(movies_fts) VALUES ('delete-all')"))
+        connection.execute(
+            text(
+                f"""
+                INSERT INTO movies_fts(rowid, title, note)
+                SELECT (user_id << {FTS_USER_SHIFT}) + id, title, note FROM user_movies
+                """
+            )
+        )
+        for ddl in _fulltext_triggers("user_movies"):
+            connection.execute(text(ddl))
+
+
+def _migrate_refresh_checkpoints(connection) -> None:
+    """v8: resumable progress for background jobs (metadata refresh)."""
+    connection.execute(
+        text(
+            """
+            CREATE TABLE refresh_checkpoints (
+                job        TEXT PRIMARY KEY,
+                last_id    INTEGER NOT NULL,
+                started_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+    )
+
+
+def _migrate_poster_files(connection) -> None:
+    """v9: poster URL -> content-addressed file in the local mirror."""
+    connection.execute(
+        text(
+            """
+            CREATE TABLE poster_files (
+                url        TEXT PRIMARY KEY,
+                file       TEXT,
+                error      TEXT,
+                fetched_at REAL NOT NULL
+            )
+            """
+        )
+    )
+
+
+# Ordered registry: index + 1 == schema version. Only ever append.
+MIGRATIONS = (
+    _migrate_base_schema,
+    _migrate_movie_indexes,
+    _migrate_random_picks,
+    _migrate_fulltext_search,
+    _migrate_title_grams,
+    _migrate_omdb_cache,
+    _migrate_title_catalog,
+    _migrate_refresh_checkpoints,
+    _migrate_poster_files,
+)
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(connection) -> int:
+    return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def migrate(connection) -> int:
+    """
+    Apply pending migrations; returns the number of migrations run.
+
+    Each migration and its user_version bump run in one transaction, so a
+    failing migration leaves the schema exactly at the previous version.
+    The transaction takes the write lock up front (BEGIN IMMEDIATE) and
+    re-reads user_version under it: processes opening the same outdated
+    database at once apply every migration exactly once.
+    """
+    if schema_version(connection) >= SCHEMA_VERSION:
+        return 0
+
+    applied = 0
+    while True:
+        # pysqlite öffnet Transaktionen erst vor DML und committet DDL davor
+        # sofort – deshalb explizit beginnen
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            # Ein anderer Prozess kann inzwischen migriert haben
+            current = schema_version(connection)
+            if current >= SCHEMA_VERSION:
+                connection.rollback()
+                return applied
+            MIGRATIONS[current](connection)
+            # PRAGMA akzeptiert keine Bind-Parameter
+            connection.exec_driver_sql(f"PRAGMA user_version = {current + 1}")
+        except BaseException:
+            connection.rollback()
+            raise
+        connection.commit()
+        applied += 1
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Engine lifecycle
+# ──────────────────────────────────────────────────────────────────────────────
+def _resolve_pragmas(
+    profile: Union[str, Mapping[str, Union[str, int]], None]
+) -> Mapping[str, Union[str, int]]:
+    if profile is None:
+        profile = os.environ.get(PRAGMA_PROFILE_ENV) or DEFAULT_PRAGMA_PROFILE
+    if isinstance(profile, str):
+        if profile not in PRAGMA_PROFILES:
+            opts = ", ".join(sorted(PRAGMA_PROFILES))
+            raise ValueError(f"Unknown pragma profile '{profile}'. Allowed: {opts}.")
+        return PRAGMA_PROFILES[profile]
+    for name in profile:
+        if not name.isidentifier():
+            raise ValueError(f"Invalid pragma name '{name}'.")
+    return profile
+
+
+def _attach_pragmas(target: Engine, pragmas: Mapping[str, Union[str, int]]) -> None:
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            # busy_timeout zuerst: journal_mode=WAL braucht selbst eine Sperre
+            ordered = sorted(pragmas.items(), key=lambda p: p[0] != "busy_timeout")
+            for name, value in ordered:
+                # PRAGMA akzeptiert keine Bind-Parameter
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+
+    event.listen(target, "connect", _apply_pragmas)
+
+
+def _build_engine(
+    db_url: Optional[str],
+    echo: bool = False,
+    profile: Union[str, Mapping[str, Union[str, int]], None] = None,
+) -> Engine:
+    url = db_url or os.environ.get(DB_URL_ENV) or DEFAULT_DB_URL
+    pragmas = _resolve_pragmas(profile)
+    new_engine = create_engine(url, echo=echo)
+    if new_engine.dialect.name == "sqlite":
+        _attach_pragmas(new_engine, pragmas)
+    if _query_metrics_enabled:
+        _attach_query_metrics(new_engine)
+    with new_engine.connect() as connection:
+        if pragmas.get("query_only") == "ON":
+            # Read-only: Schema muss bereits aktuell sein
+            if schema_version(connection) < SCHEMA_VERSION:
+                new_engine.dispose()
+                raise RuntimeError(
+                    "Database schema is outdated; open it once without the "
+                    "read-only profile to migrate."
+                )
+        else:
+            migrate(connection)
+    return new_engine
+
+
+def init_storage(
+    db_url: Optional[str] = None,
+    *,
+    echo: bool = False,
+    profile: Union[str, Mapping[str, Union[str, int]], None] = None,
+) -> Engine:
+    """
+    Create the engine and bring the schema up to date.
+
+    db_url falls back to $MOVIES_DB_URL, then to sqlite:///movies.db.
+    profile is a PRAGMA_PROFILES name or a {pragma: value} mapping and
+    falls back to $MOVIES_DB_PROFILE, then to "fast".
+    echo=True logs every statement (development only).
+    Calling it again switches the process to the new database.
+    """
+    global _engine
+
+    new_engine = _build_engine(db_url, echo=echo, profile=profile)
+    with _engine_lock:
+        old_engine, _engine = _engine, new_engine
+    with _alias_lock:
+        _alias_tables.clear()  # movies_version gilt nur für eine Datenbank
+    if old_engine is not None:
+        old_engine.dispose()
+    return new_engine
+
+
+def get_engine() -> Engine:
+    """Return the engine, initializing storage lazily on first use."""
+    global _engine
+
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = _build_engine(None)
+    return _engine
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Query instrumentation (opt-in)
+# ──────────────────────────────────────────────────────────────────────────────
+def _call_site() -> str:
+    """
+    Name of the outermost public function of this module on the call
+    stack (the one a caller invoked, not the private helpers it delegates
+    to); the innermost private one if only those are found.
+    """
+    frame = sys._getframe(2)  # skip listener + _call_site
+    public = private = None
+    while frame is not None:
+        if frame.f_code.co_filename == __file__:
+            name = frame.f_code.co_name
+            if not name.startswith("_"):
+                public = name  # weiter außen liegende überschreiben
+            elif private is None:
+                private = name
+        frame = frame.f_back
+    return public or private or "<external>"
+
+
+class _RowCountingCursor:
+    """DBAPI cursor proxy counting fetched rows, reported on close()."""
+
+    def __init__(self, cursor, call_site: str) -> None:
+        self._cursor = cursor
+        self._call_site = call_site
+        self._rows: Optional[int] = 0
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None and self._rows is not None:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._cursor.fetchmany(*args)
+        if self._rows is not None:
+            self._rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        if self._rows is not None:
+            self._rows += len(rows)
+        return rows
+
+    def close(self) -> None:
+        if self._rows is not None:
+            query_metrics.add_rows(self._call_site, self._rows)
+            self._rows = None
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+    call_site = _call_site()
+    # rowcount ist nur für DML bekannt (SELECT: -1): gelesene Zeilen zählt
+    # der Cursor-Proxy, bis das Ergebnis geschlossen wird
+    query_metrics.observe(call_site, elapsed_ms, cursor.rowcount)
+    if cursor.description is not None and context is not None:
+        context.cursor = _RowCountingCursor(cursor, call_site)
+
+
+def _handle_error(exception_context) -> None:
+    # after_cursor_execute läuft bei Fehlern nicht: Startzeit verwerfen
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
+
+def _attach_query_metrics(target: Engine) -> None:
+    if not event.contains(target, "before_cursor_execute", _before_cursor_execute):
+        event.listen(target, "before_cursor_execute", _before_cursor_execute)
+        event.listen(target, "after_cursor_execute", _after_cursor_execute)
+        event.listen(target, "handle_error", _handle_error)
+
+
+def enable_query_metrics() -> None:
+    """
+    Record per-statement latency and row counts, keyed by storage function.
+    Rows are rowcount for DML and the rows fetched from a SELECT, counted
+    once its result is closed (exhausted or closed early).
+    """
+    global _query_metrics_enabled
+
+    _query_metrics_enabled = True
+    if _engine is not None:
+        _attach_query_metrics(_engine)
+
+
+def disable_query_metrics() -> None:
+    global _query_metrics_enabled
+
+    _query_metrics_enabled = False
+    if _engine is not None and event.contains(
+        _engine, "before_cursor_execute", _before_cursor_execute
+    ):
+        event.remove(_engine, "before_cursor_execute", _before_cursor_execute)
+        event.remove(_engine, "after_cursor_execute", _after_cursor_execute)
+        event.remove(_engine, "handle_error", _handle_error)
+
+
+def dump_query_metrics(fmt: str = "json") -> str:
+    """Export collected query metrics as 'json' or 'prometheus' text."""
+    return query_metrics.dump(fmt)
+
 
 
 # ──────────────────────────────────────────────────────────────────────────────
 # User helpers
 # ──────────────────────────────────────────────────────────────────────────────
 def list_users() -> List[Tuple[int, str]]:
-    with engine.connect() as connection:
+    with get_engine().connect() as connection:
         res = connection.execute(
             text("SELECT id, name FROM users ORDER BY name COLLATE NOCASE ASC")
         )
@@ -85,7 +976,7 @@ def list_users() -> List[Tuple[int, str]]:
 
 
 def get_user_by_name(name: str) -> Optional[Tuple[int, str]]:
-    with engine.connect() as connection:
+    with get_engine().connect() as connection:
         row = connection.execute(
             text("SELECT id, name FROM users WHERE name = :n"), {"n": name}
         ).fetchone()
@@ -93,7 +984,7 @@ def get_user_by_name(name: str) -> Optional[Tuple[int, str]]:
 
 
 def get_or_create_user(name: str) -> Tuple[int, str]:
-    with engine.connect() as connection:
+    with get_engine().connect() as connection:
         connection.execute(
             text("INSERT OR IGNORE INTO users(name) VALUES (:n)"), {"n": name}
         )
@@ -107,34 +998,595 @@ def get_or_create_user(name: str) -> Tuple[int, str]:
 # ──────────────────────────────────────────────────────────────────────────────
 # Movie operations (scoped by user_id)
 # ──────────────────────────────────────────────────────────────────────────────
+# Spalten für _movie_props aus "user_movies AS um {_TITLES_JOIN}";
+# private Kopien eines Katalogtitels zeigen dessen imdb_id
+_MOVIE_COLUMNS = (
+    "um.title, um.year, um.rating, t.poster_url, um.note, "
+    "COALESCE(t.imdb_id, t.source_imdb_id) AS imdb_id, um.personal_rating"
+)
+_TITLES_JOIN = "JOIN titles AS t ON t.id = um.title_id"
+# Ausdrücke zu JSON_EXPORT_FIELDS (gleiche Reihenfolge)
+_JSON_EXPORT_COLUMNS = (
+    "um.title, um.year, um.rating, t.poster_url, um.note, "
+    "COALESCE(t.imdb_id, t.source_imdb_id)"
+)
+
+
+def _movie_props(row) -> Dict[str, object]:
+    return {
+        "year": row[1],
+        "rating": row[2],
+        "poster_url": row[3],
+        "note": row[4],
+        "imdb_id": row[5],
+        "personal_rating": row[6],
+    }
+
+
 def list_movies(user_id: int) -> Dict[str, Dict]:
-    """Retrieve all movies for a given user_id."""
-    with engine.connect() as connection:
-        result = connection.execute(
+    """Retrieve all movies for a given user_id, ordered by title."""
+    return query_movies(user_id)
+
+
+def movie_cursor(title: str, props: Mapping, order_by: str = "title") -> Tuple:
+    """Keyset cursor for query_movies(after=...) from the last row of a page."""
+    if order_by == "title":
+        return (title,)
+    return (props[order_by], title)
+
+
+def query_movies(
+    user_id: int,
+    *,
+    order_by: str = "title",
+    descending: bool = False,
+    min_rating: Optional[float] = None,
+    year_range: Tuple[Optional[int], Optional[int]] = (None, None),
+    limit: Optional[int] = None,
+    after: Optional[Tuple] = None,
+) -> Dict[str, Dict]:
+    """
+    Retrieve a sorted, filtered page of the user's movies.
+
+    order_by is 'title', 'year' or 'rating' (ties broken by title, same
+    direction). year_range bounds are inclusive, None = open.
+    after is the movie_cursor() of the previous page's last row.
+    The returned dict preserves the SQL order.
+    """
+    sql, params = _movie_query(
+        user_id,
+        order_by=order_by,
+        descending=descending,
+        min_rating=min_rating,
+        year_range=year_range,
+        limit=limit,
+        after=after,
+    )
+    with get_engine().connect() as connection:
+        rows = connection.execute(text(sql), params).fetchall()
+
+    return {r[0]: _movie_props(r) for r in rows}
+
+
+def _movie_query(
+    user_id: int,
+    *,
+    order_by: str = "title",
+    descending: bool = False,
+    min_rating: Optional[float] = None,
+    year_range: Tuple[Optional[int], Optional[int]] = (None, None),
+    limit: Optional[int] = None,
+    after: Optional[Tuple] = None,
+    columns: str = _MOVIE_COLUMNS,
+) -> Tuple[str, Dict[str, object]]:
+    """(sql, params) for query_movies and iter_movie_rows."""
+    if order_by not in SORT_COLUMNS:
+        opts = ", ".join(sorted(SORT_COLUMNS))
+        raise ValueError(f"Cannot order by '{order_by}'. Allowed: {opts}.")
+
+    direction = "DESC" if descending else "ASC"
+    cmp = "<" if descending else ">"
+    where = ["um.user_id = :uid"]
+    params: Dict[str, object] = {"uid": user_id}
+
+    if min_rating is not None:
+        where.append("um.rating >= :min_rating")
+        params["min_rating"] = min_rating
+    start_year, end_year = year_range
+    if start_year is not None:
+        where.append("um.year >= :start_year")
+        params["start_year"] = start_year
+    if end_year is not None:
+        where.append("um.year <= :end_year")
+        params["end_year"] = end_year
+
+    if order_by == "title":
+        order_sql = f"um.title COLLATE NOCASE {direction}"
+        if after is not None:
+            where.append(f"um.title COLLATE NOCASE {cmp} :after_title")
+            params["after_title"] = after[0]
+    else:
+        order_sql = f"um.{order_by} {direction}, um.title COLLATE NOCASE {direction}"
+        if after is not None:
+            # Zeilenwert-Vergleich: Index-Seek hinter den Cursor
+            where.append(
+                f"(um.{order_by}, um.title COLLATE NOCASE) {cmp} (:after_key, :after_title)"
+            )
+            params["after_key"], params["after_title"] = after
+
+    # INDEXED BY: sonst wählt SQLite bei Jahres-/Rating-Filtern den Index des
+    # Filters und sortiert jede Seite erneut in einem temporären B-Tree
+    sql = (
+        f"SELECT {columns} "
+        f"FROM user_movies AS um INDEXED BY {SORT_COLUMNS[order_by]} {_TITLES_JOIN} "
+        f"WHERE {' AND '.join(where)} ORDER BY {order_sql}"
+    )
+    if limit is not None:
+        sql += " LIMIT :limit"
+        params["limit"] = limit
+    return sql, params
+
+
+def iter_movies(
+    user_id: int, *, page_size: int = PAGE_SIZE, **query
+) -> Iterator[Tuple[str, Dict]]:
+    """
+    Yield (title, props) in query_movies order, fetching page_size rows
+    at a time via keyset pagination. Accepts query_movies keyword args
+    except limit/after.
+    """
+    for r in iter_movie_rows(user_id, page_size=page_size, **query):
+        yield r[0], _movie_props(r)
+
+
+def iter_movie_rows(
+    user_id: int, *, page_size: int = PAGE_SIZE, **query
+) -> Iterator[Row]:
+    """
+    Like iter_movies, but yields the result rows as they are (attribute
+    access: row.title, row.year, row.rating, row.poster_url, row.note,
+    row.imdb_id, row.personal_rating) without a props dict per movie.
+    """
+    return _iter_keyset(user_id, _MOVIE_COLUMNS, page_size, query)
+
+
+def iter_movie_json(
+    user_id: int, *, page_size: int = PAGE_SIZE, **query
+) -> Iterator[str]:
+    """
+    Yield each movie as a compact JSON array in JSON_EXPORT_FIELDS order,
+    serialized by SQLite (json_array), in query_movies order.
+    """
+    # Sortierschlüssel mitlesen: daraus wird der Keyset-Cursor gebildet
+    columns = f"json_array({_JSON_EXPORT_COLUMNS}), um.title, um.year, um.rating"
+    for r in _iter_keyset(user_id, columns, page_size, query):
+        yield r[0]
+
+
+def _iter_keyset(
+    user_id: int, columns: str, page_size: int, query: Mapping
+) -> Iterator[Row]:
+    """Rows of _movie_query(columns=...) page by page; columns include the sort keys."""
+    order_by = query.get("order_by", "title")
+    after = None
+    while True:
+        sql, params = _movie_query(
+            user_id, limit=page_size, after=after, columns=columns, **query
+        )
+        with get_engine().connect() as connection:
+            rows = connection.execute(text(sql), params).fetchall()
+        yield from rows
+        if len(rows) < page_size:
+            return
+        last = rows[-1]
+        after = (last.title,) if order_by == "title" else (getattr(last, order_by), last.title)
+
+
+def movie_stats(user_id: int) -> Optional[Dict[str, object]]:
+    """
+    Rating statistics computed in SQL: count, avg, min, max, median and
+    the best/worst titles. None if the user has no movies.
+    """
+    with get_engine().connect() as connection:
+        count, avg, min_rating, max_rating = connection.execute(
             text(
-                """
-                SELECT title, year, rating, poster_url, note, imdb_id
-                FROM movies
-                WHERE user_id = :uid
-                ORDER BY title COLLATE NOCASE ASC
-                """
+                "SELECT COUNT(rating), AVG(rating), MIN(rating), MAX(rating) "
+                "FROM user_movies WHERE user_id = :uid"
             ),
             {"uid": user_id},
+        ).one()
+        if not count:
+            return None
+
+        # Median: mittlere(n) Zeile(n) über den (user_id, rating)-Index;
+        # OFFSET überspringt Indexeinträge, sortiert wird nichts
+        median = connection.execute(
+            text(
+                f"""
+                SELECT AVG(rating) FROM (
+                    SELECT rating FROM user_movies INDEXED BY {SORT_COLUMNS["rating"]}
+                    WHERE user_id = :uid
+                    ORDER BY rating
+                    LIMIT 2 - :n % 2 OFFSET (:n - 1) / 2
+                )
+                """
+            ),
+            {"uid": user_id, "n": count},
+        ).scalar()
+
+        titles_with_rating = text(
+            "SELECT title FROM user_movies WHERE user_id = :uid AND rating = :r "
+            "ORDER BY title COLLATE NOCASE ASC"
         )
-        rows = result.fetchall()
+        best = connection.execute(
+            titles_with_rating, {"uid": user_id, "r": max_rating}
+        ).scalars().all()
+        worst = connection.execute(
+            titles_with_rating, {"uid": user_id, "r": min_rating}
+        ).scalars().all()
 
     return {
-        r[0]: {
-            "year": r[1],
-            "rating": r[2],
-            "poster_url": r[3],
-            "note": r[4],
-            "imdb_id": r[5],
-        }
-        for r in rows
+        "count": count,
+        "avg": avg,
+        "min": min_rating,
+        "max": max_rating,
+        "median": median,
+        "best": list(best),
+        "worst": list(worst),
     }
 
 
+class _AliasTable:
+    """Vose's alias method: O(1) weighted draws over fixed weights."""
+
+    def __init__(self, keys: List[int], weights: List[float]) -> None:
+        n = len(keys)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        self.keys, self.weights = keys, weights
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            s, g = small.pop(), large.pop()
+            self.prob[s], self.alias[s] = scaled[s], g
+            scaled[g] += scaled[s] - 1
+            (small if scaled[g] < 1 else large).append(g)
+
+    def draw(self) -> int:
+        i = random.randrange(len(self.keys))
+        return self.keys[i] if random.random() < self.prob[i] else self.keys[self.alias[i]]
+
+
+def _alias_table(connection, user_id: int, column: str) -> Optional[_AliasTable]:
+    """The user's alias table over seq -> column, rebuilt when movies_version moved."""
+    version = connection.execute(
+        text("SELECT movies_version FROM users WHERE id = :uid"), {"uid": user_id}
+    ).scalar()
+    key = (user_id, column)
+    with _alias_lock:
+        cached = _alias_tables.get(key)
+        if cached is not None and cached[0] == version:
+            _alias_tables.move_to_end(key)
+            return cached[1]
+
+    rows = connection.execute(
+        text(f"SELECT seq, {column} FROM user_movies WHERE user_id = :uid AND {column} > 0"),
+        {"uid": user_id},
+    ).fetchall()
+    table = _AliasTable([r[0] for r in rows], [r[1] for r in rows]) if rows else None
+    with _alias_lock:
+        _alias_tables[key] = (version, table)
+        _alias_tables.move_to_end(key)
+        while len(_alias_tables) > RANDOM_ALIAS_CACHE_SIZE:
+            _alias_tables.popitem(last=False)
+    return table
+
+
+def _weighted_seqs(table: _AliasTable, n: int) -> List[int]:
+    """
+    Up to n distinct seqs drawn without replacement: repeats are redrawn,
+    which matches drawing again from the remaining movies.
+    """
+    want = min(n, len(table.keys))
+    picked: Dict[int, None] = {}
+    attempts = 0
+    while len(picked) < want and attempts < 8 * want:
+        picked[table.draw()] = None
+        attempts += 1
+    if len(picked) < want:
+        # sehr ungleiche Gewichte: Rest exakt über die übrigen Filme ziehen
+        rest = [(k, w) for k, w in zip(table.keys, table.weights) if k not in picked]
+        while len(picked) < want:
+            i = random.choices(range(len(rest)), weights=[w for _, w in rest])[0]
+            picked[rest.pop(i)[0]] = None
+    return list(picked)
+
+
+def random_movie(
+    user_id: int, n: int = 1, weighted_by: Optional[str] = None
+) -> Dict[str, Dict]:
+    """
+    Pick up to n distinct random movies without loading the collection.
+
+    Uniform picks draw seq numbers (dense per user, 1..count) and fetch
+    each row through the (user_id, seq) index. weighted_by='rating' picks
+    proportionally to the rating from an alias table of the user's
+    weights, built once per users.movies_version and kept in the process.
+    """
+    if weighted_by is not None and weighted_by not in WEIGHT_COLUMNS:
+        opts = ", ".join(sorted(WEIGHT_COLUMNS))
+        raise ValueError(f"Cannot weight by '{weighted_by}'. Allowed: {opts}.")
+
+    picked: Dict[str, Dict] = {}
+    with get_engine().connect() as connection:
+        if weighted_by is None:
+            count = connection.execute(
+                text("SELECT MAX(seq) FROM user_movies WHERE user_id = :uid"),
+                {"uid": user_id},
+            ).scalar() or 0
+            seqs = random.sample(range(1, count + 1), min(n, count))
+        else:
+            table = _alias_table(connection, user_id, weighted_by)
+            seqs = _weighted_seqs(table, n) if table is not None else []
+
+        pick_by_seq = text(
+            f"SELECT {_MOVIE_COLUMNS} FROM user_movies AS um {_TITLES_JOIN} "
+            "WHERE um.user_id = :uid AND um.seq = :seq"
+        )
+        for seq in seqs:
+            row = connection.execute(pick_by_seq, {"uid": user_id, "seq": seq}).first()
+            if row is not None:  # gleichzeitig gelöscht
+                picked[row[0]] = _movie_props(row)
+    return picked
+
+
+def _fts_query(query: str) -> str:
+    """Turn free text into an FTS5 query: every word as a quoted prefix term."""
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", query))
+
+
+def search_movies(
+    user_id: int, query: str, limit: int = SEARCH_LIMIT
+) -> Dict[str, Dict]:
+    """
+    Full-text search over the user's titles and notes.
+
+    Every word must match as a word prefix; movies matching in the title
+    come before those matching only in the note, then shorter titles
+    first. MATCH only reads the user's rowid range of movies_fts (bm25()
+    is not used: it counts every user's matches for its IDF). Falls back
+    to a LIKE substring scan if the SQLite build lacks FTS5.
+    """
+    match = _fts_query(query)
+    if not match:
+        return {}
+
+    with get_engine().connect() as connection:
+        has_index = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE name = 'movies_fts'")
+        ).fetchone()
+        if has_index:
+            rows = connection.execute(
+                text(
+                    f"""
+                    SELECT {_MOVIE_COLUMNS}
+                    FROM movies_fts
+                    JOIN user_movies AS um ON um.id = movies_fts.rowid - :lo
+                    {_TITLES_JOIN}
+                    WHERE movies_fts MATCH :q
+                      AND movies_fts.rowid BETWEEN :lo AND :hi
+                      AND um.user_id = :uid
+                    ORDER BY movies_fts.rowid IN (
+                                 SELECT rowid FROM movies_fts
+                                 WHERE movies_fts MATCH :q_title
+                                   AND rowid BETWEEN :lo AND :hi
+                             ) DESC,
+                             length(um.title),
+                             um.title COLLATE NOCASE
+                    LIMIT :limit
+                    """
+                ),
+                {
+                    "q": match,
+                    "q_title": f"title : ({match})",
+                    "uid": user_id,
+                    "lo": user_id << FTS_USER_SHIFT,
+                    "hi": ((user_id + 1) << FTS_USER_SHIFT) - 1,
+                    "limit": limit,
+                },
+            ).fetchall()
+        else:
+            pattern = "%" + re.sub(r"([\\%_])", r"\\\1", query.strip()) + "%"
+            rows = connection.execute(
+                text(
+                    f"""
+                    SELECT {_MOVIE_COLUMNS} FROM user_movies AS um {_TITLES_JOIN}
+                    WHERE um.user_id = :uid
+                      AND (um.title LIKE :p ESCAPE '\\' OR um.note LIKE :p ESCAPE '\\')
+                    ORDER BY um.title COLLATE NOCASE
+                    LIMIT :limit
+                    """
+                ),
+                {"p": pattern, "uid": user_id, "limit": limit},
+            ).fetchall()
+
+    return {r[0]: _movie_props(r) for r in rows}
+
+
+def suggest_titles(
+    user_id: int,
+    keyword: str,
+    k: int = SUGGEST_LIMIT,
+    cutoff: float = SUGGEST_CUTOFF,
+) -> Dict[str, Dict]:
+    """
+    Fuzzy 'Did you mean' suggestions for a keyword, best first.
+
+    Candidates are the user's titles sharing the most padded trigrams with
+    the keyword, read from title_grams by (user_id, gram); only those are
+    re-ranked with difflib's similarity ratio. The keyword's trigrams are
+    read rarest first (title_gram_counts) until SUGGEST_POSTINGS_BUDGET
+    rows: common ones like " th" say little about the keyword, and the
+    cost stays bounded whatever the collection size.
+    """
+    keyword = keyword.lower()
+    grams = _title_grams(keyword)
+
+    matcher = difflib.SequenceMatcher()
+    matcher.set_seq2(keyword)
+
+    budget = SUGGEST_POSTINGS_BUDGET
+    with get_engine().connect() as connection:
+        counts = connection.execute(
+            text(
+                "SELECT gram, n FROM title_gram_counts "
+                "WHERE user_id = :uid AND gram IN :grams AND n > 0 ORDER BY n"
+            ).bindparams(bindparam("grams", expanding=True)),
+            {"uid": user_id, "grams": sorted(grams)},
+        ).fetchall()
+        selected = []
+        for gram, n in counts:
+            if selected and n > budget:
+                break
+            selected.append(gram)
+            budget -= n
+        if not selected:
+            return {}
+        # Das seltenste Trigramm allein kann das Budget übersteigen
+        postings = " UNION ALL ".join(
+            "SELECT * FROM (SELECT movie_id FROM title_grams "
+            f"WHERE user_id = :uid AND gram = :g{i} LIMIT :budget)"
+            for i in range(len(selected))
+        )
+        rows = connection.execute(
+            text(
+                f"""
+                SELECT {_MOVIE_COLUMNS}
+                FROM (
+                    SELECT movie_id, COUNT(*) AS shared FROM ({postings})
+                    GROUP BY movie_id
+                    ORDER BY shared DESC
+                    LIMIT :candidates
+                ) AS c
+                JOIN user_movies AS um ON um.id = c.movie_id
+                {_TITLES_JOIN}
+                """
+            ),
+            {
+                "uid": user_id,
+                "budget": SUGGEST_POSTINGS_BUDGET,
+                "candidates": k * SUGGEST_CANDIDATES_PER_RESULT,
+                **{f"g{i}": g for i, g in enumerate(selected)},
+            },
+        )
+        best = []
+        for row in rows:
+            matcher.set_seq1(row[0].lower())
+            if (
+                matcher.real_quick_ratio() >= cutoff
+                and matcher.quick_ratio() >= cutoff
+                and matcher.ratio() >= cutoff
+            ):
+                best.append((matcher.ratio(), row))
+    best.sort(key=lambda pair: pair[0], reverse=True)
+
+    return {row[0]: _movie_props(row) for _, row in best[:k]}
+
+
+# Vorhandene Katalogzeilen werden beim Hinzufügen nur ergänzt, nie
+# überschrieben; id ist vorab reserviert (siehe _reserve_title_ids)
+_UPSERT_TITLE = text(
+    """
+    INSERT INTO titles (id, imdb_id, title, year, rating, poster_url)
+    VALUES (:id, :imdb_id, :title, :year, :rating, :poster_url)
+    ON CONFLICT (imdb_id) DO UPDATE SET
+        poster_url = COALESCE(titles.poster_url, excluded.poster_url)
+    """
+)
+
+
+def _catalog_rows(
+    connection, imdb_ids: Iterable[Optional[str]]
+) -> Dict[str, Tuple[int, str]]:
+    """(titles.id, title) per imdb_id, for the ids already in the catalog."""
+    ids = list({i for i in imdb_ids if i})
+    if not ids:
+        return {}
+    rows = connection.execute(
+        text("SELECT imdb_id, id, title FROM titles WHERE imdb_id IN :ids").bindparams(
+            bindparam("ids", expanding=True)
+        ),
+        {"ids": ids},
+    )
+    return {r[0]: (r[1], r[2]) for r in rows}
+
+
+def _user_title_ids(connection, user_id: int, title_ids: Iterable[int]) -> set:
+    """The subset of title_ids the user already has."""
+    ids = list(set(title_ids))
+    if not ids:
+        return set()
+    return set(
+        connection.execute(
+            text(
+                "SELECT title_id FROM user_movies "
+                "WHERE user_id = :uid AND title_id IN :ids"
+            ).bindparams(bindparam("ids", expanding=True)),
+            {"uid": user_id, "ids": ids},
+        ).scalars()
+    )
+
+
+def _reserve_title_ids(connection, n: int) -> int:
+    """
+    Reserve n consecutive titles ids and return the first. The range is
+    taken from sqlite_sequence inside the write transaction, so no other
+    writer can hand out the same ids.
+    """
+    taken = connection.execute(
+        text(
+            "UPDATE sqlite_sequence "
+            "SET seq = MAX(seq, (SELECT COALESCE(MAX(id), 0) FROM titles)) + :n "
+            "WHERE name = 'titles'"
+        ),
+        {"n": n},
+    ).rowcount
+    if not taken:
+        # Noch nie in titles eingefügt: sqlite_sequence hat keine Zeile
+        connection.execute(
+            text(
+                "INSERT INTO sqlite_sequence (name, seq) "
+                "SELECT 'titles', COALESCE(MAX(id), 0) + :n FROM titles"
+            ),
+            {"n": n},
+        )
+    last = connection.execute(
+        text("SELECT seq FROM sqlite_sequence WHERE name = 'titles'")
+    ).scalar()
+    return last - n + 1
+
+
+def _resolve_title_ids(connection, records: List[Mapping]) -> List[int]:
+    """
+    Catalog ids for records (title, year, rating, poster_url, imdb_id) in
+    order, written with one executemany. Records with an imdb_id share one
+    row, created if missing (an existing row only gains a missing
+    poster_url, its reserved id stays unused); records without get a row
+    of their own.
+    """
+    if not records:
+        return []
+    first = _reserve_title_ids(connection, len(records))
+    rows = [{**r, "id": first + i} for i, r in enumerate(records)]
+    connection.execute(_UPSERT_TITLE, rows)
+    by_imdb = {i: row[0] for i, row in _catalog_rows(
+        connection, (r["imdb_id"] for r in records)
+    ).items()}
+    return [by_imdb[r["imdb_id"]] if r["imdb_id"] else r["id"] for r in rows]
+
+
 def add_movie(
     title: str,
     year: int,
@@ -142,47 +1594,232 @@ def add_movie(
     poster_url: Optional[str],
     user_id: int,
     imdb_id: Optional[str] = None,
-) -> None:
-    """Add a new movie for the user (per-user unique title)."""
-    with engine.connect() as connection:
-        exists = connection.execute(
-            text("SELECT 1 FROM movies WHERE user_id = :uid AND title = :t"),
-            {"uid": user_id, "t": title},
-        ).fetchone()
-        if exists:
-            raise ValueError(f"Movie '{title}' already exists for this user.")
+) -> str:
+    """
+    Add a new movie for the user (per-user unique title).
+
+    An imdb_id already in the catalog links the user to that row, whose
+    title wins over the given one. Returns the title the movie is stored
+    under; raises ValueError if the user already has that title or
+    imdb_id.
+    """
+    record = {
+        "title": title,
+        "year": year,
+        "rating": rating,
+        "poster_url": poster_url,
+        "imdb_id": imdb_id,
+    }
+    with get_engine().begin() as connection:
+        [(title, status)] = _add_movies_chunk(connection, user_id, [record])
+    if status != "inserted":
+        raise ValueError(f"Movie '{title}' already exists for this user.")
+    print(f"Movie '{title}' added successfully.")
+    return title
+
+
+def _chunked(iterable: Iterable, size: int) -> Iterator[list]:
+    it = iter(iterable)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+def _validate_bulk_record(record: Mapping) -> Optional[Dict[str, object]]:
+    """Normalize one bulk record into INSERT params; None if invalid."""
+    title = record.get("title")
+    if not isinstance(title, str) or not title.strip():
+        return None
+    try:
+        year = int(record["year"])
+        rating = float(record["rating"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return {
+        "title": title.strip(),
+        "year": year,
+        "rating": rating,
+        "poster_url": record.get("poster_url"),
+        "note": record.get("note"),
+        "imdb_id": record.get("imdb_id") or None,
+    }
+
+
+def _add_movies_chunk(connection, user_id: int, chunk: List[Mapping]) -> List[Tuple[str, str]]:
+    params = [_validate_bulk_record(r) for r in chunk]
+    # Eine bekannte imdb_id bringt den Katalogtitel mit: gegen diesen wird
+    # geprüft und gespeichert
+    known = _catalog_rows(connection, (p["imdb_id"] for p in params if p is not None))
+    for p in params:
+        if p is not None and p["imdb_id"] in known:
+            p["title"] = known[p["imdb_id"]][1]  # type: ignore[index]
+    titles = [p["title"] for p in params if p is not None]
+
+    existing = set()
+    if titles:
+        rows = connection.execute(
+            text(
+                "SELECT title FROM user_movies "
+                "WHERE user_id = :uid AND title COLLATE NOCASE IN :titles"
+            ).bindparams(bindparam("titles", expanding=True)),
+            {"uid": user_id, "titles": titles},
+        )
+        existing = {r[0].translate(_NOCASE) for r in rows}
+    # gleiche imdb_id unter anderem Titel zählt ebenfalls als Duplikat
+    taken = _user_title_ids(connection, user_id, (row[0] for row in known.values()))
+    taken_imdb = {i for i, row in known.items() if row[0] in taken}
+
+    results: List[Tuple[str, str]] = []
+    to_insert: List[Dict[str, object]] = []
+    for record, p in zip(chunk, params):
+        if p is None:
+            results.append((str(record.get("title") or ""), "invalid"))
+            continue
+        key = p["title"].translate(_NOCASE)  # type: ignore[union-attr]
+        if key in existing or p["imdb_id"] in taken_imdb:
+            results.append((p["title"], "duplicate"))  # type: ignore[arg-type]
+            continue
+        existing.add(key)
+        if p["imdb_id"]:
+            taken_imdb.add(p["imdb_id"])
+        to_insert.append(p)
+        results.append((p["title"], "inserted"))  # type: ignore[arg-type]
 
+    if to_insert:
+        title_ids = _resolve_title_ids(connection, to_insert)
+        # Sortierschlüssel aus dem Katalog übernehmen
         connection.execute(
             text(
                 """
-                INSERT INTO movies (title, year, rating, poster_url, user_id, note, imdb_id)
-                VALUES (:title, :year, :rating, :poster_url, :uid, NULL, :imdb_id)
+                INSERT INTO user_movies (user_id, title_id, note, title, year, rating)
+                SELECT :uid, id, :note, title, year, rating FROM titles WHERE id = :tid
+                ON CONFLICT DO NOTHING
                 """
             ),
-            {
-                "title": title,
-                "year": year,
-                "rating": rating,
-                "poster_url": poster_url,
-                "uid": user_id,
-                "imdb_id": imdb_id,
-            },
+            [
+                {"uid": user_id, "tid": title_id, "note": p["note"]}
+                for p, title_id in zip(to_insert, title_ids)
+            ],
         )
-        connection.commit()
-        print(f"Movie '{title}' added successfully.")
+        rows = connection.execute(
+            text(
+                "SELECT id, title FROM user_movies "
+                "WHERE user_id = :uid AND title_id IN :tids"
+            ).bindparams(bindparam("tids", expanding=True)),
+            {"uid": user_id, "tids": title_ids},
+        )
+        _index_title_grams(connection, [(user_id, r[0], r[1]) for r in rows])
+    return results
+
+
+def add_movies_bulk(
+    user_id: int,
+    records: Iterable[Mapping],
+    chunk_size: int = BULK_CHUNK_SIZE,
+) -> List[Tuple[str, str]]:
+    """
+    Add many movies for the user in a single transaction.
+
+    records yields mappings with title, year, rating and optionally
+    poster_url, note, imdb_id. They are consumed lazily in chunks of
+    chunk_size, each written with one executemany.
+    Returns (title, status) per record in input order, status being
+    'inserted', 'duplicate' or 'invalid'; title is the stored one (the
+    catalog's title for an imdb_id already in the catalog).
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1.")
+
+    results: List[Tuple[str, str]] = []
+    with get_engine().begin() as connection:
+        for chunk in _chunked(records, chunk_size):
+            results.extend(_add_movies_chunk(connection, user_id, chunk))
+    return results
+
+
+def _find_user_movie(connection, title: str, user_id: int) -> Tuple[int, int]:
+    """(user_movies.id, title_id) of the user's movie; KeyError if missing."""
+    row = connection.execute(
+        text(
+            "SELECT id, title_id FROM user_movies "
+            "WHERE user_id = :uid AND title = :t COLLATE NOCASE"
+        ),
+        {"uid": user_id, "t": title},
+    ).fetchone()
+    if row is None:
+        raise KeyError(f"Movie '{title}' not found for this user.")
+    return row[0], row[1]
+
+
+def _drop_unused_title(connection, title_id: int) -> None:
+    connection.execute(
+        text(
+            "DELETE FROM titles WHERE id = :tid AND NOT EXISTS "
+            "(SELECT 1 FROM user_movies WHERE title_id = :tid)"
+        ),
+        {"tid": title_id},
+    )
 
 
 def delete_movie(title: str, user_id: int) -> None:
-    """Delete a movie for the user."""
-    with engine.connect() as connection:
-        result = connection.execute(
-            text("DELETE FROM movies WHERE title = :t AND user_id = :uid"),
-            {"t": title, "uid": user_id},
+    """Delete a movie for the user (and its catalog entry once unused)."""
+    with get_engine().begin() as connection:
+        movie_id, title_id = _find_user_movie(connection, title, user_id)
+        connection.execute(
+            text("DELETE FROM user_movies WHERE id = :id"), {"id": movie_id}
         )
-        connection.commit()
-        if result.rowcount == 0:
-            raise KeyError(f"Movie '{title}' not found for this user.")
-        print(f"Movie '{title}' deleted successfully.")
+        _drop_unused_title(connection, title_id)
+    print(f"Movie '{title}' deleted successfully.")
+
+
+def _update_title_fields(
+    connection,
+    title: str,
+    user_id: int,
+    title_sets: List[str],
+    imdb_id: Optional[str],
+    params: Mapping[str, object],
+) -> int:
+    """
+    Apply update_movie's titles columns (copy-on-write for catalog rows);
+    returns the user_movies.id.
+    """
+    movie_id, title_id = _find_user_movie(connection, title, user_id)
+    current_imdb, source_imdb = connection.execute(
+        text("SELECT imdb_id, source_imdb_id FROM titles WHERE id = :tid"),
+        {"tid": title_id},
+    ).one()
+    if imdb_id is not None and imdb_id not in (current_imdb, source_imdb):
+        owner = _catalog_rows(connection, [imdb_id]).get(imdb_id)
+        if owner is not None and owner[0] != title_id:
+            raise ValueError(f"IMDb id '{imdb_id}' already belongs to another title.")
+        title_sets = [*title_sets, "imdb_id = :imdb_id, source_imdb_id = NULL"]
+        params = {**params, "imdb_id": imdb_id}
+    if not title_sets:
+        return movie_id
+    if current_imdb is not None:
+        # Copy-on-write: eigene Zeile statt Änderung am Katalog
+        private_id = connection.execute(
+            text(
+                """
+                INSERT INTO titles (title, year, rating, poster_url, source_imdb_id)
+                SELECT title, year, rating, poster_url, imdb_id
+                FROM titles WHERE id = :tid
+                """
+            ),
+            {"tid": title_id},
+        ).lastrowid
+        connection.execute(
+            text("UPDATE user_movies SET title_id = :new WHERE id = :id"),
+            {"new": private_id, "id": movie_id},
+        )
+        _drop_unused_title(connection, title_id)
+        title_id = private_id
+    # titles_fanout_au übernimmt das Jahr nach user_movies
+    connection.execute(
+        text(f"UPDATE titles SET {', '.join(title_sets)} WHERE id = :tid"),
+        {**params, "tid": title_id},
+    )
+    return movie_id
 
 
 def update_movie(
@@ -195,38 +1832,291 @@ def update_movie(
     note: Optional[str] = None,
     imdb_id: Optional[str] = None,
 ) -> None:
-    """Update provided fields for a user's movie."""
-    sets = []
-    params = {"t": title, "uid": user_id}
+    """
+    Update provided fields for a user's movie.
+
+    rating is stored as the user's personal_rating, note is the user's
+    own as well. year, poster_url and imdb_id live in titles: a shared
+    catalog row (one with an imdb_id) is never changed here – the user
+    gets a private copy that keeps the catalog's imdb_id as
+    source_imdb_id. Raises KeyError if the movie is missing, ValueError
+    if imdb_id already belongs to another title.
+    """
+    title_sets = []
+    user_sets = []
+    params: Dict[str, object] = {}
 
     if rating is not None:
-        sets.append("rating = :rating")
+        user_sets.append("personal_rating = :rating, rating = :rating")
         params["rating"] = rating
     if year is not None:
-        sets.append("year = :year")
+        title_sets.append("year = :year")
         params["year"] = year
     if poster_url is not None:
-        sets.append("poster_url = :poster_url")
+        title_sets.append("poster_url = :poster_url")
         params["poster_url"] = poster_url
     if note is not None:
-        sets.append("note = :note")
+        user_sets.append("note = :note")
         params["note"] = note
-    if imdb_id is not None:
-        sets.append("imdb_id = :imdb_id")
-        params["imdb_id"] = imdb_id
 
-    if not sets:
+    if not title_sets and not user_sets and imdb_id is None:
         return
 
-    with engine.connect() as connection:
-        result = connection.execute(
+    with get_engine().begin() as connection:
+        if title_sets or imdb_id is not None:
+            movie_id = _update_title_fields(
+                connection, title, user_id, title_sets, imdb_id, params
+            )
+            where, where_params = "id = :id", {"id": movie_id}
+        else:
+            # Nur Spalten des Users: ein UPDATE über ux_user_movies_title
+            where = "user_id = :uid AND title = :t COLLATE NOCASE"
+            where_params = {"uid": user_id, "t": title}
+        if user_sets:
+            result = connection.execute(
+                text(f"UPDATE user_movies SET {', '.join(user_sets)} WHERE {where}"),
+                {**params, **where_params},
+            )
+            if result.rowcount == 0:
+                raise KeyError(f"Movie '{title}' not found for this user.")
+    print(f"Movie '{title}' updated.")
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Metadata refresh (titles catalog)
+# ──────────────────────────────────────────────────────────────────────────────
+def count_refreshable_titles(after_id: int = 0) -> int:
+    """Titles with an imdb_id (own or source_imdb_id) and id > after_id."""
+    with get_engine().connect() as connection:
+        return connection.execute(
+            text(
+                "SELECT COUNT(*) FROM titles "
+                "WHERE COALESCE(imdb_id, source_imdb_id) IS NOT NULL AND id > :after"
+            ),
+            {"after": after_id},
+        ).scalar_one()
+
+
+def refreshable_titles(after_id: int, limit: int) -> List[Dict[str, object]]:
+    """
+    Next batch of titles with an imdb_id, in id order. Private copies
+    (private=1) report their source_imdb_id as imdb_id.
+    """
+    with get_engine().connect() as connection:
+        rows = connection.execute(
             text(
-                f"UPDATE movies SET {', '.join(sets)} "
-                "WHERE title = :t AND user_id = :uid"
+                """
+                SELECT id, COALESCE(imdb_id, source_imdb_id) AS imdb_id,
+                       imdb_id IS NULL AS private,
+                       title, year, rating, poster_url
+                FROM titles
+                WHERE COALESCE(imdb_id, source_imdb_id) IS NOT NULL AND id > :after
+                ORDER BY id
+                LIMIT :limit
+                """
+            ),
+            {"after": after_id, "limit": limit},
+        )
+        return [dict(r._mapping) for r in rows]
+
+
+def get_checkpoint(job: str) -> Optional[int]:
+    """last_id saved by an unfinished run of job, if any."""
+    with get_engine().connect() as connection:
+        return connection.execute(
+            text("SELECT last_id FROM refresh_checkpoints WHERE job = :job"),
+            {"job": job},
+        ).scalar_one_or_none()
+
+
+def clear_checkpoint(job: str) -> None:
+    with get_engine().begin() as connection:
+        connection.execute(
+            text("DELETE FROM refresh_checkpoints WHERE job = :job"), {"job": job}
+        )
+
+
+def apply_title_refresh(
+    job: str, last_id: int, changes: List[Mapping[str, object]]
+) -> int:
+    """
+    Write changed catalog rows (id, year, rating, poster_url) and advance
+    the job checkpoint to last_id in one transaction. Returns rows updated;
+    titles_fanout_au passes year and rating on to every user's copy.
+    """
+    now = time.time()
+    with get_engine().begin() as connection:
+        updated = 0
+        if changes:
+            updated = connection.execute(
+                text(
+                    """
+                    UPDATE titles
+                    SET year = :year, rating = :rating, poster_url = :poster_url
+                    WHERE id = :id
+                    """
+                ),
+                list(changes),
+            ).rowcount
+        connection.execute(
+            text(
+                """
+                INSERT INTO refresh_checkpoints (job, last_id, started_at, updated_at)
+                VALUES (:job, :last_id, :now, :now)
+                ON CONFLICT (job) DO UPDATE SET
+                    last_id = excluded.last_id,
+                    updated_at = excluded.updated_at
+                """
             ),
-            params,
+            {"job": job, "last_id": last_id, "now": now},
+        )
+    return updated
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# OMDb response cache
+# ──────────────────────────────────────────────────────────────────────────────
+def omdb_cache_get(cache_key: str) -> Optional[Tuple[Optional[Dict], Optional[str], float]]:
+    """
+    Look up a cached OMDb response and mark it as recently used.
+
+    Returns (payload, error, fetched_at) or None; payload is None for a
+    cached negative answer, with error holding OMDb's message.
+    """
+    with get_engine().connect() as connection:
+        row = connection.execute(
+            text(
+                "SELECT payload, error, fetched_at FROM omdb_cache "
+                "WHERE cache_key = :k"
+            ),
+            {"k": cache_key},
+        ).fetchone()
+        if row is None:
+            return None
+        connection.execute(
+            text("UPDATE omdb_cache SET last_used = :now WHERE cache_key = :k"),
+            {"now": time.time(), "k": cache_key},
         )
         connection.commit()
-        if result.rowcount == 0:
-            raise KeyError(f"Movie '{title}' not found for this user.")
-        print(f"Movie '{title}' updated.")
\ No newline at end of file
+
+    payload = json.loads(row[0]) if row[0] is not None else None
+    return payload, row[1], row[2]
+
+
+def omdb_cache_put(
+    cache_keys: Iterable[str],
+    payload: Optional[Mapping],
+    *,
+    error: Optional[str] = None,
+    max_entries: Optional[int] = None,
+) -> None:
+    """
+    Store one OMDb answer under several keys (e.g. query and imdbID).
+
+    payload=None stores a negative entry. With max_entries set, the least
+    recently used entries beyond that bound are evicted.
+    """
+    now = time.time()
+    raw = json.dumps(payload) if payload is not None else None
+    imdb_id = payload.get("imdbID") if payload is not None else None
+    rows = [
+        {"k": key, "imdb": imdb_id, "p": raw, "e": error, "now": now}
+        for key in cache_keys
+    ]
+    if not rows:
+        return
+
+    with get_engine().begin() as connection:
+        connection.execute(
+            text(
+                """
+                INSERT INTO omdb_cache (cache_key, imdb_id, payload, error, fetched_at, last_used)
+                VALUES (:k, :imdb, :p, :e, :now, :now)
+                ON CONFLICT (cache_key) DO UPDATE SET
+                    imdb_id = excluded.imdb_id,
+                    payload = excluded.payload,
+                    error = excluded.error,
+                    fetched_at = excluded.fetched_at,
+                    last_used = excluded.last_used
+                """
+            ),
+            rows,
+        )
+        if max_entries is not None:
+            connection.execute(
+                text(
+                    """
+                    DELETE FROM omdb_cache WHERE cache_key IN (
+                        SELECT cache_key FROM omdb_cache
+                        ORDER BY last_used ASC
+                        LIMIT MAX(0, (SELECT COUNT(*) FROM omdb_cache) - :max)
+                    )
+                    """
+                ),
+                {"max": max_entries},
+            )
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Poster mirror index
+# ──────────────────────────────────────────────────────────────────────────────
+def poster_urls(user_id: Optional[int] = None) -> Iterator[str]:
+    """Distinct poster URLs (of one user, or across all users), streamed."""
+    if user_id is None:
+        stmt = text(
+            "SELECT DISTINCT poster_url FROM titles "
+            "WHERE poster_url IS NOT NULL AND poster_url != ''"
+        )
+    else:
+        stmt = text(
+            f"SELECT DISTINCT t.poster_url FROM user_movies AS um {_TITLES_JOIN} "
+            "WHERE um.user_id = :uid AND t.poster_url IS NOT NULL AND t.poster_url != ''"
+        )
+    with get_engine().connect() as connection:
+        result = connection.execute(stmt, {"uid": user_id})
+        while rows := result.fetchmany(PAGE_SIZE):
+            for r in rows:
+                yield r[0]
+
+
+def poster_files_get(
+    urls: Iterable[str],
+) -> Dict[str, Tuple[Optional[str], Optional[str], float]]:
+    """Known poster URLs -> (file, error, fetched_at); file None after a failure."""
+    urls = list(dict.fromkeys(urls))
+    found: Dict[str, Tuple[Optional[str], Optional[str], float]] = {}
+    if not urls:
+        return found
+    stmt = text(
+        "SELECT url, file, error, fetched_at FROM poster_files WHERE url IN :urls"
+    ).bindparams(bindparam("urls", expanding=True))
+    with get_engine().connect() as connection:
+        for chunk in _chunked(urls, BULK_CHUNK_SIZE):
+            for row in connection.execute(stmt, {"urls": chunk}):
+                found[row[0]] = (row[1], row[2], row[3])
+    return found
+
+
+def poster_files_put(entries: Mapping[str, Tuple[Optional[str], Optional[str]]]) -> None:
+    """Record download results: url -> (file, error)."""
+    now = time.time()
+    rows = [
+        {"url": url, "file": file, "error": error, "now": now}
+        for url, (file, error) in entries.items()
+    ]
+    if not rows:
+        return
+    with get_engine().begin() as connection:
+        connection.execute(
+            text(
+                """
+                INSERT INTO poster_files (url, file, error, fetched_at)
+                VALUES (:url, :file, :error, :now)
+                ON CONFLICT (url) DO UPDATE SET
+                    file = excluded.file,
+                    error = excluded.error,
+                    fetched_at = excluded.fetched_at
+                """
+            ),
+            rows,
+        )
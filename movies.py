@@ -8,31 +8,73 @@ Poster is clickable and opens IMDb.
 'Add a new movie' now supports adding multiple movies in one go (type 'done' to stop).
 """
 
-from pathlib import Path
-from typing import Dict, Optional
-
-import difflib
-import html
-import json
-import random
-import shutil
-import urllib.parse
-import urllib.request
-from urllib.error import HTTPError, URLError
+from itertools import chain
+from typing import Dict, Iterator, Optional, Tuple
+
+import argparse
+import atexit
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 import matplotlib.pyplot as plt
 
 import movie_storage_sql as storage  # persistence layer (SQLAlchemy)
+import website  # static site rendering
+from omdb_client import (
+    CircuitBreaker,
+    OmdbBadResponse,
+    OmdbCircuitOpen,
+    OmdbClient,
+    OmdbHTTPError,
+    OmdbNetworkError,
+    OmdbRateLimited,
+    OmdbTimeout,
+    SingleFlight,
+    TokenBucket,
+)
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Constants & Settings
 # ──────────────────────────────────────────────────────────────────────────────
 APP_TITLE = "My Movies Database"
-PAGE_TITLE = "My Movie App"
 
 OMDB_API_KEY = "8496f341"
 OMDB_TIMEOUT_SEC = 8
 OMDB_BASE_URL = "http://www.omdbapi.com/"
+OMDB_MAX_CONCURRENCY = 8  # parallel lookups in batch add mode
+OMDB_POOL_SIZE = OMDB_MAX_CONCURRENCY  # keep-alive connections
+OMDB_BURST_PER_SEC = 5        # client-side burst limit
+# Free API key quota, counted in memory: it starts full on every process
+# start and only keeps one long run (a large paste, refresh-metadata)
+# below it
+OMDB_DAILY_QUOTA = 1000
+OMDB_RATE_WAIT_SEC = 30       # max wait for a rate-limit token
+OMDB_MAX_RETRIES = 3          # on 429/5xx/timeouts, with backoff
+OMDB_BREAKER_FAILURES = 5     # consecutive failures -> cache-only mode
+OMDB_BREAKER_RESET_SEC = 60
+
+# SQL timing report printed on exit (movies.py --query-metrics [FORMAT])
+QUERY_METRICS_ENV = "MOVIES_QUERY_METRICS"
+QUERY_METRICS_FORMATS = ("json", "prometheus")
+
+# OMDb response cache (persisted in the DB, shared by all users)
+OMDB_CACHE_TTL_SEC = 7 * 24 * 3600
+OMDB_NEGATIVE_TTL_SEC = 24 * 3600  # "Movie not found!" answers
+OMDB_CACHE_MAX_ENTRIES = 10_000
+OMDB_CACHE_STATS = {"hits": 0, "negative_hits": 0, "misses": 0, "stale_hits": 0}
+_omdb_stats_lock = threading.Lock()
+
+# Metadata refresh (CLI: movies.py refresh-metadata)
+REFRESH_JOB = "metadata"
+REFRESH_BATCH_SIZE = 100
+
+_omdb_client: Optional[OmdbClient] = None
+_omdb_client_lock = threading.Lock()
+_omdb_in_flight = SingleFlight()
 
 # Console colors
 COLOR_RESET = "\033[0m"
@@ -154,6 +196,24 @@ def safe_list_movies() -> Dict[str, Dict[str, object]]:
         return {}
 
 
+def safe_has_movies() -> bool:
+    assert ACTIVE_USER is not None
+    try:
+        return bool(storage.query_movies(ACTIVE_USER["id"], limit=1))  # type: ignore[arg-type]
+    except Exception as exc:
+        print(f"   {COLOR_ERROR}DB error while listing movies: {exc}{COLOR_RESET}")
+        return False
+
+
+def safe_iter_movies(**query) -> Iterator[Tuple[str, Dict[str, object]]]:
+    """Stream the active user's movies page by page (see storage.query_movies)."""
+    assert ACTIVE_USER is not None
+    try:
+        yield from storage.iter_movies(ACTIVE_USER["id"], **query)  # type: ignore[arg-type]
+    except Exception as exc:
+        print(f"   {COLOR_ERROR}DB error while listing movies: {exc}{COLOR_RESET}")
+
+
 def input_existing_title(prompt: str) -> str | None:
     if not require_user():
         return None
@@ -244,18 +304,14 @@ def list_movies() -> None:
 def sort_by_rating() -> None:
     if not require_user():
         return
-    movies = safe_list_movies()
-    if not movies:
+    movies = safe_iter_movies(order_by="rating", descending=True)
+    first = next(movies, None)
+    if first is None:
         print(f"   {COLOR_ERROR}No movies to sort.{COLOR_RESET}")
         return
 
-    sorted_movies = sorted(
-        movies.items(),
-        key=lambda kv: (kv[1].get("rating", float("-inf")), kv[0]),
-        reverse=True,
-    )
     print(f"   {COLOR_OUTPUT}Movies sorted by rating:{COLOR_RESET}")
-    for idx, (title, props) in enumerate(sorted_movies, 1):
+    for idx, (title, props) in enumerate(chain([first], movies), 1):
         print(
             f"   {idx}. {title} ({props.get('year','N/A')}): "
             f"{props.get('rating','N/A')}/10"
@@ -266,8 +322,7 @@ def sort_by_rating() -> None:
 def sort_by_year() -> None:
     if not require_user():
         return
-    movies = safe_list_movies()
-    if not movies:
+    if not safe_has_movies():
         print(f"   {COLOR_ERROR}No movies to sort.{COLOR_RESET}")
         return
 
@@ -278,18 +333,7 @@ def sort_by_year() -> None:
         f"   {COLOR_INPUT}Enter choice (1-2): {COLOR_RESET}", {"1", "2"}
     )
 
-    if choice == "1":
-        sorted_movies = sorted(
-            movies.items(),
-            key=lambda kv: (kv[1].get("year", float("-inf")), kv[0]),
-            reverse=True,
-        )
-    else:
-        sorted_movies = sorted(
-            movies.items(),
-            key=lambda kv: (kv[1].get("year", float("inf")), kv[0]),
-            reverse=False,
-        )
+    sorted_movies = safe_iter_movies(order_by="year", descending=choice == "1")
 
     print(f"   {COLOR_OUTPUT}Movies sorted by year:{COLOR_RESET}")
     for idx, (title, props) in enumerate(sorted_movies, 1):
@@ -299,47 +343,260 @@ def sort_by_year() -> None:
     print()
 
 
-def _fetch_from_omdb(title_query: str) -> dict | None:
-    query = urllib.parse.urlencode({"t": title_query, "apikey": OMDB_API_KEY})
-    url = f"{OMDB_BASE_URL}?{query}"
+def get_omdb_client() -> OmdbClient:
+    """Shared OMDb client (keep-alive pool), created on first use."""
+    global _omdb_client
+
+    if _omdb_client is None:
+        with _omdb_client_lock:
+            if _omdb_client is None:
+                _omdb_client = OmdbClient(
+                    OMDB_API_KEY,
+                    base_url=OMDB_BASE_URL,
+                    timeout=OMDB_TIMEOUT_SEC,
+                    pool_size=OMDB_POOL_SIZE,
+                    limiters=(
+                        TokenBucket(OMDB_BURST_PER_SEC, OMDB_BURST_PER_SEC),
+                        TokenBucket(OMDB_DAILY_QUOTA / 86400, OMDB_DAILY_QUOTA),
+                    ),
+                    limiter_timeout=OMDB_RATE_WAIT_SEC,
+                    max_retries=OMDB_MAX_RETRIES,
+                    breaker=CircuitBreaker(
+                        OMDB_BREAKER_FAILURES, OMDB_BREAKER_RESET_SEC
+                    ),
+                )
+    return _omdb_client
 
-    try:
-        with urllib.request.urlopen(url, timeout=OMDB_TIMEOUT_SEC) as resp:
-            if resp.status != 200:
-                print(f"   {COLOR_ERROR}OMDb HTTP error: {resp.status}{COLOR_RESET}")
-                return None
-            raw = resp.read()
-    except HTTPError as exc:
-        print(f"   {COLOR_ERROR}OMDb HTTP error: {exc.code} {exc.reason}{COLOR_RESET}")
-        return None
-    except URLError as exc:
-        print(f"   {COLOR_ERROR}Network error reaching OMDb: {exc.reason}{COLOR_RESET}")
-        return None
-    except TimeoutError:
-        print(f"   {COLOR_ERROR}OMDb request timed out.{COLOR_RESET}")
+
+def _omdb_cache_key(title_query: str) -> str:
+    return "t:" + " ".join(title_query.casefold().split())
+
+
+def _count_omdb_cache(stat: str) -> None:
+    with _omdb_stats_lock:
+        OMDB_CACHE_STATS[stat] += 1
+
+
+def omdb_cache_stats_line() -> str | None:
+    """Summary of this session's OMDb cache lookups; None if there were none."""
+    with _omdb_stats_lock:
+        stats = dict(OMDB_CACHE_STATS)
+    lookups = stats["hits"] + stats["negative_hits"] + stats["misses"]
+    if not lookups:
         return None
+    served = stats["hits"] + stats["negative_hits"]
+    line = (
+        f"OMDb cache: {stats['hits']} hits, {stats['negative_hits']} negative hits, "
+        f"{stats['misses']} misses ({served / lookups:.0%} served from cache)"
+    )
+    if stats["stale_hits"]:
+        line += f", {stats['stale_hits']} misses served stale while OMDb was unavailable"
+    return line
+
+
+def _omdb_from_cache(
+    cache_key: str, allow_stale: bool = False
+) -> tuple[bool, dict | None]:
+    """
+    (hit, data) from the persistent cache; expired entries are misses
+    unless allow_stale (cache-only mode while OMDb is unreachable).
+    """
+    try:
+        entry = storage.omdb_cache_get(cache_key)
+    except Exception:
+        return False, None
+    if entry is None:
+        return False, None
+
+    payload, error, fetched_at = entry
+    ttl = OMDB_CACHE_TTL_SEC if payload is not None else OMDB_NEGATIVE_TTL_SEC
+    stale = time.time() - fetched_at > ttl
+    if stale and not allow_stale:
+        return False, None
+
+    # Veraltete Einträge wurden schon als Fehlschlag gezählt
+    if stale:
+        _count_omdb_cache("stale_hits")
+    if payload is None:
+        if not stale:
+            _count_omdb_cache("negative_hits")
+        print(f"   {COLOR_ERROR}OMDb error: {error}{COLOR_RESET}")
+        return True, None
+    if not stale:
+        _count_omdb_cache("hits")
+    return True, payload
+
+
+def _omdb_to_cache(cache_key: str, data: dict | None, error: str | None = None) -> None:
+    keys = [cache_key]
+    if data and data.get("imdbID") and cache_key != f"i:{data['imdbID']}":
+        keys.append(f"i:{data['imdbID']}")
+    try:
+        storage.omdb_cache_put(
+            keys, data, error=error, max_entries=OMDB_CACHE_MAX_ENTRIES
+        )
     except Exception as exc:
-        print(f"   {COLOR_ERROR}Unexpected OMDb error: {exc}{COLOR_RESET}")
-        return None
+        print(f"   {COLOR_ERROR}Could not cache OMDb response: {exc}{COLOR_RESET}")
+
+
+def _fetch_from_omdb(title_query: str) -> dict | None:
+    cache_key = _omdb_cache_key(title_query)
+    hit, cached = _omdb_from_cache(cache_key)
+    if hit:
+        return cached
+    _count_omdb_cache("misses")
+
+    # Gleichzeitige Anfragen mit gleichem Schlüssel teilen sich einen Abruf
+    data, err_msg = _omdb_in_flight.do(
+        cache_key, lambda: _lookup_title_uncached(cache_key, title_query)
+    )
+    if err_msg is not None:
+        print(f"   {COLOR_ERROR}{err_msg}{COLOR_RESET}")
+    return data
 
+
+def _lookup_title_uncached(
+    cache_key: str, title_query: str
+) -> tuple[dict | None, str | None]:
+    """Network lookup plus cache write; returns (data, error message)."""
     try:
-        data = json.loads(raw.decode())
-    except json.JSONDecodeError:
-        print(f"   {COLOR_ERROR}OMDb returned invalid JSON.{COLOR_RESET}")
-        return None
+        data = get_omdb_client().lookup_title(title_query)
+    except (OmdbCircuitOpen, OmdbRateLimited) as exc:
+        err_msg = f"{exc} Try again later."
+    except OmdbHTTPError as exc:
+        err_msg = f"OMDb HTTP error: {exc.status} {exc.reason}"
+    except OmdbTimeout:
+        err_msg = "OMDb request timed out."
+    except OmdbNetworkError as exc:
+        err_msg = f"Network error reaching OMDb: {exc}"
+    except OmdbBadResponse:
+        err_msg = "OMDb returned invalid JSON."
+    except Exception as exc:
+        err_msg = f"Unexpected OMDb error: {exc}"
+    else:
+        err_msg = None
+
+    if err_msg is not None:
+        # Cache-only mode: auch abgelaufene Einträge sind besser als nichts
+        hit, cached = _omdb_from_cache(cache_key, allow_stale=True)
+        if hit:
+            return cached, None
+        return None, err_msg
 
     if data.get("Response") != "True":
         err_msg = data.get("Error", "Unknown error")
-        print(f"   {COLOR_ERROR}OMDb error: {err_msg}{COLOR_RESET}")
+        # Nur "nicht gefunden" negativ cachen, nicht z.B. Key-/Limit-Fehler
+        if "not found" in err_msg.lower():
+            _omdb_to_cache(cache_key, None, err_msg)
+        return None, f"OMDb error: {err_msg}"
+
+    _omdb_to_cache(cache_key, data)
+    return data, None
+
+
+def _parse_omdb_movie(data: dict, title_input: str) -> dict | None:
+    """Map an OMDb response to a storage record; None if year/rating are unusable."""
+    title = data.get("Title") or title_input
+
+    # Year parsing (handles ranges like "1999–2003")
+    year = None
+    year_str = data.get("Year", "")
+    if year_str and year_str[:4].isdigit():
+        year = int(year_str[:4])
+
+    # Rating parsing
+    rating = None
+    rating_str = data.get("imdbRating")
+    if rating_str and rating_str != "N/A":
+        try:
+            rating = float(rating_str)
+        except ValueError:
+            rating = None
+
+    poster_url = data.get("Poster") if data.get("Poster") not in (None, "N/A") else None
+    imdb_id = data.get("imdbID") or None
+
+    if year is None or rating is None:
+        print(
+            f"   {COLOR_ERROR}Could not parse year/rating from OMDb for "
+            f"'{title}'. Skipping.{COLOR_RESET}"
+        )
         return None
 
-    return data
+    return {
+        "title": title,
+        "year": year,
+        "rating": rating,
+        "poster_url": poster_url,
+        "imdb_id": imdb_id,
+    }
+
+
+def input_title_batch() -> list[str]:
+    """Read pasted titles, one per line, until an empty line."""
+    print(
+        f"   {COLOR_MENU}Paste titles, one per line. "
+        f"Finish with an empty line.{COLOR_RESET}"
+    )
+    titles: list[str] = []
+    while True:
+        line = input().strip()
+        if not line:
+            return titles
+        titles.append(line)
+
+
+def add_movies_batch(titles: list[str]) -> None:
+    """Resolve titles concurrently via OMDb, then store them in one bulk call."""
+    titles = list(dict.fromkeys(t.strip() for t in titles if t.strip()))
+    if not titles:
+        return
+
+    print(
+        f"   {COLOR_OUTPUT}Looking up {len(titles)} titles "
+        f"(up to {OMDB_MAX_CONCURRENCY} at a time)...{COLOR_RESET}"
+    )
+    workers = max(1, min(OMDB_MAX_CONCURRENCY, len(titles)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        responses = list(pool.map(_fetch_from_omdb, titles))
+
+    records = []
+    for title_input, data in zip(titles, responses):
+        if data:
+            record = _parse_omdb_movie(data, title_input)
+            if record:
+                records.append(record)
+    if not records:
+        print(f"   {COLOR_ERROR}No movies could be resolved.{COLOR_RESET}")
+        return
+
+    try:
+        results = storage.add_movies_bulk(ACTIVE_USER["id"], records)  # type: ignore[index]
+    except Exception as exc:
+        print(f"   {COLOR_ERROR}DB error while saving movies: {exc}{COLOR_RESET}")
+        return
+
+    added = 0
+    for title, status in results:
+        if status == "inserted":
+            added += 1
+            print(f"   {COLOR_OUTPUT}Movie '{title}' added.{COLOR_RESET}")
+        elif status == "duplicate":
+            print(f"   {COLOR_ERROR}Movie '{title}' already exists for this user.{COLOR_RESET}")
+        else:
+            print(f"   {COLOR_ERROR}Movie '{title}' could not be saved.{COLOR_RESET}")
+    print(
+        f"   {COLOR_OUTPUT}{added} of {len(titles)} movies added to "
+        f"{ACTIVE_USER['name']}'s collection.{COLOR_RESET}"
+    )
 
 
 def add_movie() -> None:
     """
     Add multiple movies in one go.
     Type 'done' (or 'cancel') as title to return to the main menu.
+    'paste' reads several titles (one per line), which are looked up
+    concurrently and saved together.
     """
     if not require_user():
         return
@@ -348,6 +605,10 @@ def add_movie() -> None:
         f"   {COLOR_MENU}Add mode:{COLOR_RESET} "
         f"enter movie titles one by one. Type '{COLOR_OUTPUT}done{COLOR_RESET}' to finish."
     )
+    print(
+        f"   {COLOR_MENU}Batch:{COLOR_RESET} type '{COLOR_OUTPUT}paste{COLOR_RESET}' "
+        f"to enter several titles, one per line."
+    )
 
     while True:
         raw = input(f"   {COLOR_INPUT}Enter movie title (or 'done'): {COLOR_RESET}").strip()
@@ -357,6 +618,9 @@ def add_movie() -> None:
         if raw.lower() in {"done", "cancel", "exit", "quit"}:
             print(f"   {COLOR_OUTPUT}Finished adding movies.{COLOR_RESET}")
             break
+        if raw.lower() == "paste":
+            add_movies_batch(input_title_batch())
+            continue
 
         title_input = raw
 
@@ -365,38 +629,19 @@ def add_movie() -> None:
             # keep looping so the user can try another title
             continue
 
-        title = data.get("Title") or title_input
-
-        # Year parsing (handles ranges like "1999–2003")
-        year = None
-        year_str = data.get("Year", "")
-        if year_str and year_str[:4].isdigit():
-            year = int(year_str[:4])
-
-        # Rating parsing
-        rating = None
-        rating_str = data.get("imdbRating")
-        if rating_str and rating_str != "N/A":
-            try:
-                rating = float(rating_str)
-            except ValueError:
-                rating = None
-
-        poster_url = data.get("Poster") if data.get("Poster") not in (None, "N/A") else None
-        imdb_id = data.get("imdbID") or None
-
-        if year is None or rating is None:
-            print(
-                f"   {COLOR_ERROR}Could not parse year/rating from OMDb for "
-                f"'{title}'. Skipping.{COLOR_RESET}"
-            )
+        record = _parse_omdb_movie(data, title_input)
+        if not record:
             continue
+        title = record["title"]
+        poster_url = record["poster_url"]
+        imdb_id = record["imdb_id"]
 
         try:
-            storage.add_movie(
+            # bei bekannter imdb_id gilt der Titel aus dem Katalog
+            title = storage.add_movie(
                 title=title,
-                year=year,
-                rating=rating,
+                year=record["year"],
+                rating=record["rating"],
                 poster_url=poster_url,
                 user_id=ACTIVE_USER["id"],  # type: ignore[index]
                 imdb_id=imdb_id,
@@ -469,46 +714,34 @@ def update_movie() -> None:
 def show_stats() -> None:
     if not require_user():
         return
-    movies = safe_list_movies()
-    if not movies:
-        print(f"   {COLOR_ERROR}No movies to analyze.{COLOR_RESET}")
+    try:
+        stats = storage.movie_stats(ACTIVE_USER["id"])  # type: ignore[index]
+    except Exception as exc:
+        print(f"   {COLOR_ERROR}DB error while computing stats: {exc}{COLOR_RESET}")
         return
-
-    ratings = [
-        p.get("rating")
-        for p in movies.values()
-        if isinstance(p.get("rating"), (int, float))
-    ]
-    if not ratings:
-        print(f"   {COLOR_ERROR}No numeric ratings available.{COLOR_RESET}")
+    if not stats:
+        print(f"   {COLOR_ERROR}No movies to analyze.{COLOR_RESET}")
         return
 
-    ratings.sort()
-    n = len(ratings)
-    avg = sum(ratings) / n
-    median = ratings[n // 2] if n % 2 == 1 else (
-        ratings[n // 2 - 1] + ratings[n // 2]
-    ) / 2
-    max_rating = max(ratings)
-    min_rating = min(ratings)
-    best = [t for t, p in movies.items() if p.get("rating") == max_rating]
-    worst = [t for t, p in movies.items() if p.get("rating") == min_rating]
-
     print(
-        f"   {COLOR_OUTPUT}Average: {avg:.1f} | Median: {median:.1f} | "
-        f"Best: {', '.join(best)} | Worst: {', '.join(worst)}{COLOR_RESET}"
+        f"   {COLOR_OUTPUT}Average: {stats['avg']:.1f} | Median: {stats['median']:.1f} | "
+        f"Best: {', '.join(stats['best'])} | Worst: {', '.join(stats['worst'])}{COLOR_RESET}"
     )
 
 
 def random_movie() -> None:
     if not require_user():
         return
-    movies = safe_list_movies()
-    if not movies:
+    try:
+        picked = storage.random_movie(ACTIVE_USER["id"])  # type: ignore[index]
+    except Exception as exc:
+        print(f"   {COLOR_ERROR}DB error while picking a movie: {exc}{COLOR_RESET}")
+        return
+    if not picked:
         print(f"   {COLOR_ERROR}No movies available.{COLOR_RESET}")
         return
 
-    title, props = random.choice(list(movies.items()))
+    title, props = next(iter(picked.items()))
     print(
         f"   {COLOR_OUTPUT}Random movie: {title} "
         f"({props.get('year','N/A')}) — {props.get('rating','N/A')}/10{COLOR_RESET}"
@@ -518,8 +751,7 @@ def random_movie() -> None:
 def search_movie() -> None:
     if not require_user():
         return
-    movies = safe_list_movies()
-    if not movies:
+    if not safe_has_movies():
         print(f"   {COLOR_ERROR}No movies in database.{COLOR_RESET}")
         return
 
@@ -527,25 +759,40 @@ def search_movie() -> None:
         f"   {COLOR_INPUT}Enter search keyword: {COLOR_RESET}"
     ).lower()
 
-    found_any = False
-    for title, props in movies.items():
-        if keyword in title.lower():
-            print(
-                f"   {COLOR_OUTPUT}{title} ({props.get('year','N/A')}): "
-                f"{props.get('rating','N/A')}/10{COLOR_RESET}",
-                end=" | ",
-            )
-            found_any = True
+    # Einen Treffer mehr anfordern, um Abschneiden zu erkennen
+    limit = storage.SEARCH_LIMIT
+    try:
+        found = storage.search_movies(
+            ACTIVE_USER["id"], keyword, limit=limit + 1  # type: ignore[index]
+        )
+    except Exception as exc:
+        print(f"   {COLOR_ERROR}DB error while searching: {exc}{COLOR_RESET}")
+        return
 
-    if found_any:
+    for title, props in list(found.items())[:limit]:
+        print(
+            f"   {COLOR_OUTPUT}{title} ({props.get('year','N/A')}): "
+            f"{props.get('rating','N/A')}/10{COLOR_RESET}",
+            end=" | ",
+        )
+
+    if found:
         print()
+        if len(found) > limit:
+            print(
+                f"   {COLOR_OUTPUT}Showing the best {limit} matches only; "
+                f"refine the keyword to narrow them down.{COLOR_RESET}"
+            )
         return
 
-    close = difflib.get_close_matches(keyword, movies.keys(), n=5, cutoff=0.4)
+    try:
+        close = storage.suggest_titles(ACTIVE_USER["id"], keyword)  # type: ignore[index]
+    except Exception as exc:
+        print(f"   {COLOR_ERROR}DB error while searching: {exc}{COLOR_RESET}")
+        return
     if close:
         print(f"\n   {COLOR_ERROR}No exact match found. Did you mean:{COLOR_RESET} ", end="")
-        for match in close:
-            props = movies[match]
+        for match, props in close.items():
             print(
                 f"{COLOR_OUTPUT}{match} ({props.get('year','N/A')}): "
                 f"{props.get('rating','N/A')}/10{COLOR_RESET}",
@@ -591,8 +838,7 @@ def filter_movies() -> None:
     if not require_user():
         return
 
-    movies = safe_list_movies()
-    if not movies:
+    if not safe_has_movies():
         print(f"   {COLOR_ERROR}No movies available to filter.{COLOR_RESET}")
         return
 
@@ -610,28 +856,16 @@ def filter_movies() -> None:
     start_year = int(start_year_in) if start_year_in else None
     end_year = int(end_year_in) if end_year_in else None
 
-    filtered: list[tuple[str, Dict[str, object]]] = []
-    for title, props in movies.items():
-        rating = props.get("rating")
-        year = props.get("year")
-
-        if min_rating is not None and (
-            not isinstance(rating, (int, float)) or rating < min_rating
-        ):
-            continue
-        if start_year is not None and (not isinstance(year, int) or year < start_year):
-            continue
-        if end_year is not None and (not isinstance(year, int) or year > end_year):
-            continue
-
-        filtered.append((title, props))
-
-    if not filtered:
+    filtered = safe_iter_movies(
+        min_rating=min_rating, year_range=(start_year, end_year)
+    )
+    first = next(filtered, None)
+    if first is None:
         print(f"   {COLOR_ERROR}No movies matched the given criteria.{COLOR_RESET}")
         return
 
     print(f"   {COLOR_OUTPUT}Filtered Movies for {ACTIVE_USER['name']}:{COLOR_RESET}")
-    for idx, (title, props) in enumerate(filtered, 1):
+    for idx, (title, props) in enumerate(chain([first], filtered), 1):
         print(
             f"   {idx}. {title} ({props.get('year','N/A')}): "
             f"{props.get('rating','N/A')}/10"
@@ -639,103 +873,302 @@ def filter_movies() -> None:
     print()
 
 # ──────────────────────────────────────────────────────────────────────────────
-# Website generation (per user; writes <username>.html)
+# Website generation (per user; writes <username>.html, see website.py)
 # ──────────────────────────────────────────────────────────────────────────────
+def _report_poster_downloads(downloaded: int, failed: int) -> None:
+    if downloaded:
+        print(f"   {COLOR_OUTPUT}Downloaded {downloaded} posters.{COLOR_RESET}")
+    if failed:
+        print(
+            f"   {COLOR_ERROR}{failed} posters could not be downloaded; "
+            f"linking the originals instead.{COLOR_RESET}"
+        )
+
+
 def generate_website() -> None:
     """
     Generate a static website for the active user.
 
+    Mode:     $MOVIES_SITE_MODE, "pages" (default) or "client"
     Template: _static/index_template.html
-    Output:   ./<username>.html
-    CSS:      ensure ./style.css exists (copied from _static/style.css)
+    Output:   pages: ./<username>/page-<hash>.html (pages of about 100
+              movies with prev/next links, <username>/manifest.json) and
+              the index ./<username>.html; only pages whose rows, posters,
+              template or CSS changed are rewritten
+              client: ./<username>.movies.json, the same data as the script
+              ./<username>.movies.js and a shell ./<username>.html rendered
+              in the browser by grid.js (virtualized grid, works from file://)
+    Static:   ensure ./style.css and ./grid.js exist (copied from _static/
+              only when they differ)
+    Posters:  mirrored into ./posters/ (content-addressed, shared by all
+              users); WebP/JPEG thumbnails when Pillow is installed
     Hover:    show note via CSS tooltip (data-note on poster element)
     Click:    poster links to IMDb if imdb_id exists
     """
     if not require_user():
         return
 
-    movies = safe_list_movies()
-    project_dir = Path(__file__).parent
-    static_dir = project_dir / "_static"
-    template_path = static_dir / "index_template.html"
-    output_path = project_dir / f"{ACTIVE_USER['name']}.html"
-    css_src = static_dir / "style.css"
-    css_dst = project_dir / "style.css"
-
-    if not template_path.exists():
-        print(f"   {COLOR_ERROR}Template not found: {template_path}{COLOR_RESET}")
-        return
-
     try:
-        template = template_path.read_text(encoding="utf-8")
+        website.sync_static()
+    except website.SiteError as exc:
+        print(f"   {COLOR_ERROR}{exc}{COLOR_RESET}")
+    try:
+        result = website.render_site(ACTIVE_USER["id"], ACTIVE_USER["name"])  # type: ignore[index]
+    except (website.SiteError, ValueError) as exc:
+        print(f"   {COLOR_ERROR}{exc}{COLOR_RESET}")
+        return
     except Exception as exc:
-        print(f"   {COLOR_ERROR}Failed to read template: {exc}{COLOR_RESET}")
-        return
-
-    # Build grid (NOTE via data-note; rating badge; poster is a link to IMDb)
-    grid_items: list[str] = []
-    if movies:
-        for title, props in movies.items():
-            safe_title = html.escape(str(title))
-            year = props.get("year")
-            safe_year = html.escape(str(year)) if year is not None else "N/A"
-            poster_url = props.get("poster_url") or ""
-            safe_poster = html.escape(poster_url) if poster_url else ""
-            note = props.get("note") or ""
-            safe_note = html.escape(str(note)) if note else ""
-            rating = props.get("rating")
-            rating_txt = f"{float(rating):.1f}" if isinstance(rating, (int, float)) else "–"
-            imdb_id = props.get("imdb_id") or ""
-            imdb_url = f"https://www.imdb.com/title/{html.escape(imdb_id)}/" if imdb_id else "#"
-
-            # Use <a class="poster"> to keep tooltip styles and make it clickable
-            grid_items.append(
-                (
-                    '<li class="movie">\n'
-                    f'  <a class="poster" data-note="{safe_note}" href="{imdb_url}" '
-                    'target="_blank" rel="noopener noreferrer">\n'
-                    f'    <span class="rating-badge">{rating_txt}</span>\n'
-                    f'    <img src="{safe_poster}" alt="{safe_title} poster" />\n'
-                    "  </a>\n"
-                    f'  <div class="title">{safe_title}</div>\n'
-                    f'  <div class="year">{safe_year}</div>\n'
-                    "</li>"
-                )
-            )
+        print(f"   {COLOR_ERROR}DB error while generating website: {exc}{COLOR_RESET}")
+        return
+
+    _report_poster_downloads(result.posters_downloaded, result.posters_failed)
+    if result.written:
+        print(
+            f"   {COLOR_OUTPUT}Website was generated successfully for "
+            f"{ACTIVE_USER['name']} ({result.pages_written} of {result.pages} "
+            f"pages written).{COLOR_RESET}"
+        )
     else:
-        grid_items.append(
-            '<li class="movie empty">No movies yet. Add some and regenerate the site.</li>'
+        print(
+            f"   {COLOR_OUTPUT}Website for {ACTIVE_USER['name']} is up to date."
+            f"{COLOR_RESET}"
         )
+    print(f"   {COLOR_OUTPUT}Open: {result.output}{COLOR_RESET}")
 
-    grid_html = "\n".join(grid_items)
-
-    html_out = (
-        template.replace("__TEMPLATE_TITLE__", PAGE_TITLE)
-        .replace("__TEMPLATE_MOVIE_GRID__", grid_html)
-    )
 
+def generate_all_websites(workers: int | None = None, mode: str | None = None) -> None:
+    """Render every user's site on a process pool and report timings."""
     try:
-        output_path.write_text(html_out, encoding="utf-8")
-    except Exception as exc:
-        print(f"   {COLOR_ERROR}Failed to write output HTML: {exc}{COLOR_RESET}")
+        mode = website.site_mode(mode)
+    except ValueError as exc:
+        print(f"   {COLOR_ERROR}{exc}{COLOR_RESET}")
+        return
+    users = storage.list_users()
+    if not users:
+        print(f"   {COLOR_ERROR}No users yet.{COLOR_RESET}")
         return
 
+    started = time.perf_counter()
     try:
-        if css_src.exists():
-            shutil.copyfile(css_src, css_dst)
-    except Exception as exc:
-        print(f"   {COLOR_ERROR}Could not copy style.css: {exc}{COLOR_RESET}")
+        website.sync_static()
+    except website.SiteError as exc:
+        print(f"   {COLOR_ERROR}{exc}{COLOR_RESET}")
+
+    # Poster einmal zentral spiegeln, die Worker lösen sie nur noch auf
+    downloaded, failed = website.sync_posters(
+        website.poster_mirror(), storage.poster_urls()
+    )
+    _report_poster_downloads(downloaded, failed)
+
+    written = unchanged = errors = total_movies = pages_written = 0
+    done: set[str] = set()
+    try:
+        for result in website.render_all_sites(users, workers=workers, mode=mode):
+            done.add(result.username)
+            if result.error is not None:
+                errors += 1
+                print(f"   {COLOR_ERROR}{result.username}: {result.error}{COLOR_RESET}")
+                continue
+            total_movies += result.movies
+            pages_written += result.pages_written
+            if result.written:
+                written += 1
+            else:
+                unchanged += 1
+            print(
+                f"   {COLOR_OUTPUT}{result.username}: {result.movies} movies, "
+                f"{result.pages_written}/{result.pages} pages written in "
+                f"{result.seconds * 1000:.0f} ms{COLOR_RESET}"
+            )
+    except BrokenProcessPool as exc:
+        # Ein Worker ist abgestürzt (OOM-Killer, Segfault): alle offenen
+        # Aufträge sind verloren, die fertigen Seiten bleiben gültig
+        missing = [name for _uid, name in users if name not in done]
+        errors += len(missing)
+        print(
+            f"   {COLOR_ERROR}Worker pool failed: {exc or type(exc).__name__}. "
+            f"Not rendered: {', '.join(missing)}{COLOR_RESET}"
+        )
 
+    elapsed = time.perf_counter() - started
     print(
-        f"   {COLOR_OUTPUT}Website was generated successfully for "
-        f"{ACTIVE_USER['name']}.{COLOR_RESET}"
+        f"   {COLOR_OUTPUT}{len(users)} users ({written} written, {unchanged} "
+        f"unchanged, {errors} failed), {pages_written} pages written in "
+        f"{elapsed:.2f}s: {len(users) / elapsed:.1f} users/s, "
+        f"{total_movies / elapsed:.0f} movies/s{COLOR_RESET}"
     )
-    print(f"   {COLOR_OUTPUT}Open: {output_path}{COLOR_RESET}")
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Metadata refresh (shared titles catalog; resumable)
+# ──────────────────────────────────────────────────────────────────────────────
+def _refresh_lookup(imdb_id: str) -> tuple[dict | None, str | None]:
+    """
+    Cached, rate-limited lookup by IMDb id. Returns (data, error); data None
+    without error means OMDb has no usable entry, an error means "retry later".
+    """
+    cache_key = f"i:{imdb_id}"
+    hit, cached = _omdb_from_cache(cache_key)
+    if hit:
+        return cached, None
+    _count_omdb_cache("misses")
+    return _omdb_in_flight.do(cache_key, lambda: _lookup_imdb_id_uncached(cache_key, imdb_id))
+
+
+def _lookup_imdb_id_uncached(
+    cache_key: str, imdb_id: str
+) -> tuple[dict | None, str | None]:
+    """Network lookup plus cache write for refresh-metadata."""
+    try:
+        data = get_omdb_client().lookup_imdb_id(imdb_id)
+    except Exception as exc:  # Circuit offen, Quota, Netz: abbrechen, später fortsetzen
+        return None, str(exc) or type(exc).__name__
+
+    if data.get("Response") != "True":
+        err_msg = data.get("Error", "Unknown error")
+        if "not found" in err_msg.lower() or "incorrect imdb id" in err_msg.lower():
+            _omdb_to_cache(cache_key, None, err_msg)
+            return None, None
+        return None, f"OMDb error: {err_msg}"
+
+    _omdb_to_cache(cache_key, data)
+    return data, None
+
+
+def refresh_metadata(batch_size: int = REFRESH_BATCH_SIZE, restart: bool = False) -> None:
+    """
+    Re-fetch year, rating and poster for every catalog title with an imdb_id
+    (only the rating for users' private copies) and write back only the
+    rows that changed. Progress is checkpointed per batch, so an
+    interrupted run picks up where it stopped.
+    """
+    if restart:
+        storage.clear_checkpoint(REFRESH_JOB)
+    last_id = storage.get_checkpoint(REFRESH_JOB) or 0
+    total = storage.count_refreshable_titles()
+    done = total - storage.count_refreshable_titles(last_id)
+    if last_id:
+        print(f"   {COLOR_OUTPUT}Resuming after {done}/{total} titles.{COLOR_RESET}")
+
+    changed = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=OMDB_MAX_CONCURRENCY) as pool:
+        while True:
+            batch = storage.refreshable_titles(last_id, batch_size)
+            if not batch:
+                break
+            responses = list(pool.map(lambda row: _refresh_lookup(row["imdb_id"]), batch))
+
+            changes = []
+            processed = 0
+            stop_reason = None
+            for row, (data, err_msg) in zip(batch, responses):
+                if err_msg is not None:
+                    stop_reason = err_msg
+                    break
+                processed += 1
+                record = _parse_omdb_movie(data, row["title"]) if data else None
+                if record is None:
+                    continue
+                new = {
+                    "id": row["id"],
+                    "year": record["year"],
+                    "rating": record["rating"],
+                    "poster_url": record["poster_url"] or row["poster_url"],
+                }
+                if row["private"]:
+                    # Private Kopie: Jahr und Poster hat der User selbst gesetzt
+                    new["year"], new["poster_url"] = row["year"], row["poster_url"]
+                if any(new[k] != row[k] for k in ("year", "rating", "poster_url")):
+                    changes.append(new)
+
+            if processed:
+                last_id = batch[processed - 1]["id"]
+                changed += storage.apply_title_refresh(REFRESH_JOB, last_id, changes)
+                done += processed
+            elapsed = time.perf_counter() - started
+            print(
+                f"   {COLOR_OUTPUT}{done}/{total} titles checked, {changed} updated "
+                f"({elapsed:.1f}s){COLOR_RESET}"
+            )
+            if stop_reason is not None:
+                print(f"   {COLOR_ERROR}Stopped: {stop_reason}{COLOR_RESET}")
+                print(f"   {COLOR_OUTPUT}Progress saved; run again to resume.{COLOR_RESET}")
+                return
+
+    storage.clear_checkpoint(REFRESH_JOB)
+    print(f"   {COLOR_OUTPUT}Metadata refresh complete: {changed} titles updated.{COLOR_RESET}")
+
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Main
 # ──────────────────────────────────────────────────────────────────────────────
-def main() -> None:
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=APP_TITLE)
+    parser.add_argument(
+        "--query-metrics",
+        nargs="?",
+        const="json",
+        default=os.environ.get(QUERY_METRICS_ENV) or None,
+        choices=QUERY_METRICS_FORMATS,
+        metavar="FORMAT",
+        help="time every SQL statement and print the report (json or "
+        "prometheus) to stderr on exit (default: $MOVIES_QUERY_METRICS)",
+    )
+    commands = parser.add_subparsers(dest="command")
+    refresh = commands.add_parser(
+        "refresh-metadata",
+        help="re-fetch year/rating/poster of all titles from OMDb (resumable)",
+    )
+    refresh.add_argument("--batch-size", type=int, default=REFRESH_BATCH_SIZE)
+    refresh.add_argument(
+        "--restart", action="store_true", help="ignore a saved checkpoint"
+    )
+    generate_all = commands.add_parser(
+        "generate-all", help="render the website of every user in parallel"
+    )
+    generate_all.add_argument(
+        "--workers", type=int, default=None, help="worker processes (default: CPUs)"
+    )
+    generate_all.add_argument(
+        "--mode",
+        choices=website.SITE_MODES,
+        default=None,
+        help="pages: static HTML pages; client: JSON data rendered in the "
+        "browser (default: $MOVIES_SITE_MODE or pages)",
+    )
+    args = parser.parse_args(argv)
+    if args.command == "refresh-metadata" and args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+    if args.command == "generate-all" and args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    # argparse prüft choices nicht für den Default aus der Umgebung
+    if args.query_metrics not in (None, *QUERY_METRICS_FORMATS):
+        parser.error(
+            f"${QUERY_METRICS_ENV} must be one of: {', '.join(QUERY_METRICS_FORMATS)}"
+        )
+    return args
+
+
+def report_query_metrics_on_exit(fmt: str) -> None:
+    """Time SQL statements from now on and print the report when the process exits."""
+    storage.enable_query_metrics()
+    atexit.register(lambda: print(storage.dump_query_metrics(fmt), file=sys.stderr))
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    if args.query_metrics:
+        report_query_metrics_on_exit(args.query_metrics)
+    if args.command == "refresh-metadata":
+        refresh_metadata(batch_size=args.batch_size, restart=args.restart)
+        stats_line = omdb_cache_stats_line()
+        if stats_line:
+            print(f"   {COLOR_OUTPUT}{stats_line}{COLOR_RESET}")
+        return
+    if args.command == "generate-all":
+        generate_all_websites(workers=args.workers, mode=args.mode)
+        return
+
     print_title()
     choose_user()
 
@@ -747,6 +1180,9 @@ def main() -> None:
         )
         print()
         if choice == "0":
+            stats_line = omdb_cache_stats_line()
+            if stats_line:
+                print(f"   {COLOR_OUTPUT}{stats_line}{COLOR_RESET}")
             print("   Bye!")
             break
         if choice == "1":
@@ -0,0 +1,438 @@
+from __future__ import annotations
+
+"""
+OMDb HTTP client with a keep-alive connection pool, client-side rate
+limiting, retry with exponential backoff, a circuit breaker and
+per-request latency metrics. Knows nothing about caching or the CLI.
+"""
+
+import http.client
+import json
+import queue
+import random
+import socket
+import threading
+import time
+import urllib.parse
+from typing import Callable, Dict, Mapping, Optional, Sequence, TypeVar
+
+from metrics import HistogramRegistry
+
+OMDB_BASE_URL = "http://www.omdbapi.com/"
+DEFAULT_TIMEOUT_SEC = 8
+DEFAULT_POOL_SIZE = 8
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_BASE_SEC = 0.5
+DEFAULT_BACKOFF_MAX_SEC = 8.0
+
+T = TypeVar("T")
+
+# Fehler einer wiederverwendeten Keep-Alive-Verbindung, die der Server
+# inzwischen geschlossen hat – einmal mit frischer Verbindung wiederholen
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+
+
+class OmdbError(Exception):
+    """Base class for OMDb client failures."""
+
+
+class OmdbHTTPError(OmdbError):
+    def __init__(self, status: int, reason: str) -> None:
+        super().__init__(f"{status} {reason}")
+        self.status = status
+        self.reason = reason
+
+
+class OmdbNetworkError(OmdbError):
+    """Connection could not be established or broke mid-request."""
+
+
+class OmdbTimeout(OmdbError):
+    """No response within the configured timeout."""
+
+
+class OmdbBadResponse(OmdbError):
+    """Response body was not valid JSON."""
+
+
+class OmdbRateLimited(OmdbError):
+    """Client-side rate limit could not grant a request in time."""
+
+
+class OmdbCircuitOpen(OmdbError):
+    """OMDb is considered down; requests are short-circuited."""
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Rate limiting & circuit breaking
+# ──────────────────────────────────────────────────────────────────────────────
+class TokenBucket:
+    """
+    Thread-safe token bucket: refills rate tokens per second up to capacity.
+
+    A burst limit is e.g. TokenBucket(10, 10); a daily quota of 1000 is
+    TokenBucket(1000 / 86400, 1000). The state lives in memory only, so
+    such a quota is per process and starts full on every start.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        if rate <= 0 or capacity < 1:
+            raise ValueError("rate must be > 0 and capacity >= 1.")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Take one token, waiting up to timeout seconds (None = forever).
+        Returns False at once if the next token arrives only after timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            # Warten lohnt nur, wenn das Token vor der Frist kommt
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def release(self) -> None:
+        """Give back a token taken by acquire() but not used."""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + 1)
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failed calls (a call with
+    retries records one outcome, after its last attempt) and rejects calls
+    for reset_timeout seconds; then lets one trial call through
+    (half-open) which either closes or re-opens the circuit. A call that
+    was allowed but never reached the server must release() instead.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._trial_owner: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._reset_due():
+                return self.HALF_OPEN
+            return self._state
+
+    def _reset_due(self) -> bool:
+        return time.monotonic() - self._opened_at >= self.reset_timeout
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and self._reset_due():
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                self._trial_owner = threading.get_ident()
+                return True
+            return False
+
+    def release(self) -> None:
+        """Give back this thread's half-open trial without an outcome."""
+        with self._lock:
+            if self._trial_in_flight and self._trial_owner == threading.get_ident():
+                self._trial_in_flight = False
+                self._trial_owner = None
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Request coalescing
+# ──────────────────────────────────────────────────────────────────────────────
+class _Flight:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: object = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls per key: the first caller runs fn, callers
+    arriving while it is in flight wait and get the same result (or
+    exception). Nothing is cached once the call has finished.
+    """
+
+    def __init__(self) -> None:
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result  # type: ignore[return-value]
+
+        try:
+            flight.result = fn()
+            return flight.result  # type: ignore[return-value]
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Client
+# ──────────────────────────────────────────────────────────────────────────────
+def _is_retryable(exc: OmdbError) -> bool:
+    if isinstance(exc, OmdbHTTPError):
+        return exc.status == 429 or exc.status >= 500
+    return isinstance(exc, (OmdbTimeout, OmdbNetworkError))
+
+
+class OmdbClient:
+    """
+    Thread-safe OMDb client reusing up to pool_size persistent connections.
+
+    Callers beyond pool_size wait for a free connection, so the pool size
+    also bounds concurrent requests. Every attempt first takes a token
+    from each limiter (waiting at most limiter_timeout; tokens already
+    taken are given back if a later limiter refuses). 429/5xx, timeouts
+    and network errors are retried up to max_retries times with
+    full-jitter exponential backoff; a call that still fails counts once
+    against the circuit breaker. While it is open, calls fail fast with
+    OmdbCircuitOpen. Latency per lookup kind is recorded in self.metrics.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        *,
+        base_url: str = OMDB_BASE_URL,
+        timeout: float = DEFAULT_TIMEOUT_SEC,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        limiters: Sequence[TokenBucket] = (),
+        limiter_timeout: Optional[float] = None,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_base: float = DEFAULT_BACKOFF_BASE_SEC,
+        backoff_max: float = DEFAULT_BACKOFF_MAX_SEC,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1.")
+        parsed = urllib.parse.urlsplit(base_url)
+        if parsed.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported OMDb URL scheme: {parsed.scheme!r}")
+
+        self.api_key = api_key
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.limiters = tuple(limiters)
+        self.limiter_timeout = limiter_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self._scheme = parsed.scheme
+        self._host = parsed.hostname or ""
+        self._port = parsed.port
+        self._path = parsed.path or "/"
+        # None = Platz für eine noch nicht geöffnete Verbindung
+        self._pool: "queue.LifoQueue[Optional[http.client.HTTPConnection]]" = (
+            queue.LifoQueue(maxsize=pool_size)
+        )
+        for _ in range(pool_size):
+            self._pool.put(None)
+        self.metrics = HistogramRegistry(
+            "omdb_request",
+            "OMDb request latency per lookup kind.",
+            label="lookup",
+        )
+
+    # ── public API ────────────────────────────────────────────────────────────
+    def lookup_title(self, title: str) -> Dict:
+        """Raw OMDb JSON for ?t=<title> (may carry Response == 'False')."""
+        return self.get({"t": title}, kind="title")
+
+    def lookup_imdb_id(self, imdb_id: str) -> Dict:
+        """Raw OMDb JSON for ?i=<imdb_id>."""
+        return self.get({"i": imdb_id}, kind="imdb_id")
+
+    def get(self, params: Mapping[str, str], kind: str = "other") -> Dict:
+        query = urllib.parse.urlencode({**params, "apikey": self.api_key})
+        target = f"{self._path}?{query}"
+
+        if not self.breaker.allow():
+            raise OmdbCircuitOpen("OMDb is unavailable (circuit open).")
+        # Ein Ergebnis pro Aufruf für den Breaker, nicht pro Versuch;
+        # None: Server nie erreicht, Half-Open-Versuch wieder freigeben
+        outcome: Optional[bool] = None
+        attempt = 0
+        try:
+            while True:
+                try:
+                    self._acquire_tokens()
+                    data = self._get_once(target, kind)
+                except OmdbRateLimited:
+                    raise
+                except OmdbError as exc:
+                    if not _is_retryable(exc):
+                        outcome = True  # Server antwortet
+                        raise
+                    outcome = False
+                    if attempt >= self.max_retries:
+                        raise
+                    time.sleep(self._backoff(attempt))
+                    attempt += 1
+                else:
+                    outcome = True
+                    return data
+        finally:
+            if outcome is None:
+                self.breaker.release()
+            elif outcome:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+
+    def close(self) -> None:
+        """Close all idle pooled connections."""
+        conns = []
+        while True:
+            try:
+                conns.append(self._pool.get_nowait())
+            except queue.Empty:
+                break
+        for conn in conns:
+            if conn is not None:
+                conn.close()
+            self._pool.put(None)
+
+    # ── internals ─────────────────────────────────────────────────────────────
+    def _backoff(self, attempt: int) -> float:
+        # "Full jitter": zufällig in [0, min(max, base * 2^attempt)]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _acquire_tokens(self) -> None:
+        taken = []
+        for limiter in self.limiters:
+            if not limiter.acquire(self.limiter_timeout):
+                for bucket in taken:
+                    bucket.release()
+                raise OmdbRateLimited("OMDb rate limit reached.")
+            taken.append(limiter)
+
+    def _get_once(self, target: str, kind: str) -> Dict:
+        start = time.perf_counter()
+        try:
+            status, reason, body = self._request(target)
+        finally:
+            self.metrics.observe(kind, (time.perf_counter() - start) * 1000)
+
+        if status != 200:
+            raise OmdbHTTPError(status, reason)
+        try:
+            return json.loads(body.decode())
+        except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+            raise OmdbBadResponse("OMDb returned invalid JSON.") from exc
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        cls = (
+            http.client.HTTPSConnection
+            if self._scheme == "https"
+            else http.client.HTTPConnection
+        )
+        return cls(self._host, self._port, timeout=self.timeout)
+
+    def _request(self, target: str) -> tuple[int, str, bytes]:
+        conn = self._pool.get()
+        try:
+            reused = conn is not None
+            if conn is None:
+                conn = self._new_connection()
+            try:
+                result = self._send(conn, target)
+            except _STALE_CONNECTION_ERRORS:
+                conn.close()
+                if not reused:
+                    raise
+                conn = self._new_connection()
+                result = self._send(conn, target)
+            status, reason, body, will_close = result
+            if will_close:
+                conn.close()
+                conn = None
+            return status, reason, body
+        except (socket.timeout, TimeoutError) as exc:
+            conn = _discard(conn)
+            raise OmdbTimeout("OMDb request timed out.") from exc
+        except (OSError, http.client.HTTPException) as exc:
+            conn = _discard(conn)
+            raise OmdbNetworkError(str(exc) or type(exc).__name__) from exc
+        finally:
+            self._pool.put(conn)
+
+    @staticmethod
+    def _send(conn: http.client.HTTPConnection, target: str):
+        conn.request("GET", target, headers={"Connection": "keep-alive"})
+        resp = conn.getresponse()
+        body = resp.read()
+        return resp.status, resp.reason, body, resp.will_close
+
+
+def _discard(conn: Optional[http.client.HTTPConnection]) -> None:
+    if conn is not None:
+        conn.close()
+    return None
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+"""
+Local poster mirror with content-addressed storage.
+
+Downloads are named by the SHA-256 of their bytes, so a poster shared by
+many users (or reachable via several URLs) is stored once. With Pillow
+installed, resized WebP and JPEG thumbnails are written next to the
+original. Knows nothing about the database or the CLI.
+"""
+
+import hashlib
+import http.client
+import io
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from atomic_files import write_atomic
+
+try:
+    from PIL import Image
+except ImportError:  # optional: without Pillow only originals are mirrored
+    Image = None
+
+DEFAULT_WORKERS = 8
+DEFAULT_TIMEOUT_SEC = 10
+DEFAULT_THUMB_WIDTH = 256  # 2x the 128px poster in the website grid
+MAX_POSTER_BYTES = 10 * 1024 * 1024
+USER_AGENT = "MovieApp-PosterMirror/1.0"
+
+_CONTENT_TYPES = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/gif": ".gif",
+}
+_MAGIC = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF8", ".gif"),
+)
+
+
+class PosterError(Exception):
+    """A poster could not be downloaded or is not an image."""
+
+
+def _sniff_extension(data: bytes, content_type: str) -> Optional[str]:
+    for magic, ext in _MAGIC:
+        if data.startswith(magic):
+            return ext
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ".webp"
+    return _CONTENT_TYPES.get(content_type.split(";")[0].strip().lower())
+
+
+class PosterMirror:
+    """
+    Thread-safe poster downloader writing into root/<aa>/<sha256><ext>.
+
+    Names returned by fetch() are paths relative to root using "/", ready
+    to be joined onto a URL prefix. Writes are atomic (temp file +
+    rename), so concurrent fetches of the same poster are harmless.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        *,
+        workers: int = DEFAULT_WORKERS,
+        timeout: float = DEFAULT_TIMEOUT_SEC,
+        thumb_width: int = DEFAULT_THUMB_WIDTH,
+    ) -> None:
+        self.root = Path(root)
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.thumb_width = thumb_width
+
+    # ── public API ────────────────────────────────────────────────────────────
+    def fetch(self, url: str) -> str:
+        """Download url (if needed) and return the stored file name."""
+        data, content_type = self._download(url)
+        ext = _sniff_extension(data, content_type)
+        if ext is None:
+            raise PosterError(f"Not an image: {content_type or 'unknown type'}")
+
+        digest = hashlib.sha256(data).hexdigest()
+        name = f"{digest[:2]}/{digest}{ext}"
+        path = self.root / name
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            write_atomic(path, data)
+        self._make_thumbnails(name, data)
+        return name
+
+    def fetch_many(
+        self, urls: Iterable[str]
+    ) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """Fetch urls concurrently; maps url -> (name, error message)."""
+        unique = list(dict.fromkeys(u for u in urls if u))
+        if not unique:
+            return {}
+
+        def one(url: str) -> Tuple[Optional[str], Optional[str]]:
+            try:
+                return self.fetch(url), None
+            except (PosterError, OSError) as exc:
+                return None, str(exc) or type(exc).__name__
+
+        workers = min(self.workers, len(unique))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return dict(zip(unique, pool.map(one, unique)))
+
+    def exists(self, name: str) -> bool:
+        return (self.root / name).is_file()
+
+    def thumbnails(self, name: str) -> Dict[str, str]:
+        """
+        Thumbnail names for a stored poster ({"webp": ..., "jpeg": ...}),
+        creating missing ones when Pillow is available.
+        """
+        if Image is not None and not all(
+            p.exists() for p in self._thumbnail_paths(name).values()
+        ):
+            try:
+                self._make_thumbnails(name, (self.root / name).read_bytes())
+            except OSError:
+                pass
+        found = {}
+        for fmt, path in self._thumbnail_paths(name).items():
+            if path.is_file():
+                found[fmt] = path.relative_to(self.root).as_posix()
+        return found
+
+    # ── internals ─────────────────────────────────────────────────────────────
+    def _download(self, url: str) -> Tuple[bytes, str]:
+        if not url.lower().startswith(("http://", "https://")):
+            raise PosterError(f"Unsupported poster URL: {url!r}")
+        request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as resp:
+                data = resp.read(MAX_POSTER_BYTES + 1)
+                content_type = resp.headers.get("Content-Type", "")
+                # read(n) meldet ein vorzeitiges Verbindungsende nicht:
+                # abgeschnittene Bilder nicht als Poster speichern
+                length = resp.headers.get("Content-Length", "")
+                if length.isdigit() and len(data) < min(int(length), MAX_POSTER_BYTES + 1):
+                    raise http.client.IncompleteRead(data, int(length) - len(data))
+        except urllib.error.HTTPError as exc:
+            raise PosterError(f"HTTP {exc.code} {exc.reason}") from exc
+        except (OSError, http.client.HTTPException) as exc:
+            # URLError, Timeouts, abgebrochene Verbindung; IncompleteRead
+            # (Server schließt vor Content-Length) ist kein OSError
+            raise PosterError(f"Download failed: {exc!r}") from exc
+        if len(data) > MAX_POSTER_BYTES:
+            raise PosterError("Poster too large.")
+        return data, content_type
+
+    def _thumbnail_paths(self, name: str) -> Dict[str, Path]:
+        stem = (self.root / name).with_suffix("")
+        suffix = f"-w{self.thumb_width}"
+        return {
+            "webp": stem.with_name(stem.name + suffix + ".webp"),
+            "jpeg": stem.with_name(stem.name + suffix + ".jpg"),
+        }
+
+    def _make_thumbnails(self, name: str, data: bytes) -> None:
+        if Image is None:
+            return
+        targets = {
+            fmt: path
+            for fmt, path in self._thumbnail_paths(name).items()
+            if not path.exists()
+        }
+        if not targets:
+            return
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                img = img.convert("RGB")
+                img.thumbnail((self.thumb_width, self.thumb_width * 3))
+                for fmt, path in targets.items():
+                    buf = io.BytesIO()
+                    if fmt == "webp":
+                        img.save(buf, "WEBP", quality=80, method=4)
+                    else:
+                        img.save(buf, "JPEG", quality=82, optimize=True, progressive=True)
+                    write_atomic(path, buf.getvalue())
+        except (OSError, ValueError, Image.DecompressionBombError):
+            # Original bleibt nutzbar, nur ohne Vorschaubilder
+            return
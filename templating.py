@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+"""
+Minimal compiled templates for the static website.
+
+Template text with __NAME__ placeholders (upper case) is split once into
+literal and placeholder segments. render() fills a small template into a
+string via a precompiled format string; stream() writes a large one
+segment by segment, so placeholder values may be iterables of chunks
+(e.g. the movie grid) that are never joined in memory.
+"""
+
+import re
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Mapping, Tuple, Union
+
+PLACEHOLDER_RE = re.compile(r"__([A-Z][A-Z0-9_]*?)__")
+
+Value = Union[str, Iterable[str]]
+
+
+class TemplateError(Exception):
+    """A value required by the template was not supplied."""
+
+
+class CompiledTemplate:
+    """Template text split into literals[0], name[0], literals[1], ..."""
+
+    __slots__ = ("source", "literals", "names", "tokens", "_format")
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        literals = []
+        names = []
+        tokens = []
+        pos = 0
+        for match in PLACEHOLDER_RE.finditer(source):
+            literals.append(source[pos:match.start()])
+            names.append(match.group(1))
+            tokens.append(match.group(0))
+            pos = match.end()
+        literals.append(source[pos:])
+        self.literals: Tuple[str, ...] = tuple(literals)
+        self.names: Tuple[str, ...] = tuple(names)
+        self.tokens: Tuple[str, ...] = tuple(tokens)
+        # Literale mit maskierten Klammern + {name}-Felder: render() läuft in C
+        self._format = "".join(
+            lit.replace("{", "{{").replace("}", "}}") + (f"{{{name}}}" if i < len(names) else "")
+            for i, (lit, name) in enumerate(zip(literals, names + [""]))
+        )
+
+    @property
+    def placeholders(self) -> frozenset:
+        return frozenset(self.names)
+
+    def render(self, values: Mapping[str, str]) -> str:
+        """Fill every placeholder from values (all must be present)."""
+        try:
+            return self._format.format_map(values)
+        except KeyError as exc:
+            raise TemplateError(f"No value for placeholder {exc.args[0]!r}.") from None
+
+    def stream(self, write: Callable[[str], object], values: Mapping[str, Value]) -> None:
+        """
+        Write the template through write(). A value may be a string or an
+        iterable of strings; placeholders without a value stay as written.
+        """
+        literals = self.literals
+        write(literals[0])
+        for i, name in enumerate(self.names):
+            value = values.get(name)
+            if value is None:
+                write(self.tokens[i])
+            elif isinstance(value, str):
+                write(value)
+            else:
+                for chunk in value:
+                    write(chunk)
+            write(literals[i + 1])
+
+
+_cache: Dict[Path, Tuple[Tuple[int, int], CompiledTemplate]] = {}
+_cache_lock = threading.Lock()
+
+
+def load_template(path: Path) -> CompiledTemplate:
+    """Compiled template for path, re-parsed only when the file changes."""
+    path = Path(path)
+    stat = path.stat()
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        cached = _cache.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    template = CompiledTemplate(path.read_text(encoding="utf-8"))
+    with _cache_lock:
+        _cache[path] = (key, template)
+    return template
@@ -0,0 +1,57 @@
+"""
+atomic_files: the target is replaced only by a complete write; a failed
+write leaves the previous file and no temp files behind.
+"""
+
+import os
+import stat
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from atomic_files import atomic_writer, write_atomic  # noqa: E402
+
+
+class AtomicWriterTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.path = self.dir / "alice.html"
+
+    def test_replaces_the_file_readable_for_a_web_server(self) -> None:
+        self.path.write_text("old", encoding="utf-8")
+        with atomic_writer(self.path) as fh:
+            fh.write("new")
+            # Bis zum Ende des Blocks bleibt die alte Datei sichtbar
+            self.assertEqual(self.path.read_text(encoding="utf-8"), "old")
+        self.assertEqual(self.path.read_text(encoding="utf-8"), "new")
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o644)
+        self.assertEqual(os.listdir(self.dir), ["alice.html"])
+
+    def test_failed_write_keeps_the_old_file(self) -> None:
+        self.path.write_text("old", encoding="utf-8")
+        with self.assertRaises(RuntimeError):
+            with atomic_writer(self.path) as fh:
+                fh.write("half a page")
+                raise RuntimeError("render failed")
+        self.assertEqual(self.path.read_text(encoding="utf-8"), "old")
+        self.assertEqual(os.listdir(self.dir), ["alice.html"])
+
+    def test_failed_first_write_creates_nothing(self) -> None:
+        with self.assertRaises(KeyboardInterrupt):
+            with atomic_writer(self.path, binary=True) as fh:
+                fh.write(b"\x00")
+                raise KeyboardInterrupt
+        self.assertEqual(os.listdir(self.dir), [])
+
+    def test_write_atomic_writes_bytes(self) -> None:
+        write_atomic(self.path, b"<html></html>")
+        self.assertEqual(self.path.read_bytes(), b"<html></html>")
+
+
+if __name__ == "__main__":
+    unittest.main()
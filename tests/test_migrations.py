@@ -0,0 +1,309 @@
+"""
+Schema migrations on databases written by the original (pre-versioning)
+code: every migration up to SCHEMA_VERSION must apply and keep the data.
+"""
+
+import contextlib
+import io
+import multiprocessing
+import sqlite3
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from sqlalchemy import create_engine
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import movie_storage_sql as storage  # noqa: E402
+
+# Schema as created by the module bootstrap before PRAGMA user_version
+BASELINE_SCHEMA = """
+CREATE TABLE users (
+    id   INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE NOT NULL
+);
+CREATE TABLE movies (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    title      TEXT NOT NULL,
+    year       INTEGER NOT NULL,
+    rating     REAL NOT NULL,
+    poster_url TEXT,
+    user_id    INTEGER NOT NULL,
+    note       TEXT,
+    imdb_id    TEXT,
+    FOREIGN KEY(user_id) REFERENCES users(id)
+);
+INSERT INTO users(name) VALUES ('Default');
+"""
+
+
+class BaselineMigrationTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / "movies.db"
+        self.db = sqlite3.connect(self.path)
+        self.db.executescript(BASELINE_SCHEMA)
+
+    def add_user(self, name: str) -> int:
+        return self.db.execute("INSERT INTO users(name) VALUES (?)", (name,)).lastrowid
+
+    def add_movies(self, user_id: int, *movies) -> None:
+        """movies: (title, year, rating, imdb_id[, note]) tuples, in insert order."""
+        for title, year, rating, imdb_id, *note in movies:
+            self.db.execute(
+                "INSERT INTO movies (title, year, rating, poster_url, user_id, note, imdb_id) "
+                "VALUES (?, ?, ?, NULL, ?, ?, ?)",
+                (title, year, rating, user_id, note[0] if note else None, imdb_id),
+            )
+
+    def migrate(self) -> None:
+        self.db.commit()
+        self.db.close()
+        engine = create_engine(f"sqlite:///{self.path}")
+        self.addCleanup(engine.dispose)
+        with engine.connect() as connection:
+            storage.migrate(connection)
+            self.assertEqual(storage.schema_version(connection), storage.SCHEMA_VERSION)
+        self.db = sqlite3.connect(self.path)
+        self.addCleanup(self.db.close)
+
+    def titles(self, user_id: int) -> dict:
+        """title -> year of the user's movies."""
+        return dict(
+            self.db.execute("SELECT title, year FROM movies WHERE user_id = ?", (user_id,))
+        )
+
+
+class MovieIndexMigrationTests(BaselineMigrationTestCase):
+    def test_case_variant_titles_are_renamed_not_rejected(self) -> None:
+        alice = self.add_user("alice")
+        self.add_movies(
+            alice,
+            ("Heat", 1995, 8.3, None),
+            ("heat", 1986, 5.0, None),
+            ("HEAT", 2013, 4.0, None),
+            ("heat (2)", 2000, 6.0, None),
+        )
+        self.migrate()
+        movies = self.titles(alice)
+        # älteste Zeile behält den Titel, "heat (2)" ist schon vergeben
+        self.assertCountEqual(movies, ["Heat", "heat (2)", "heat (3)", "HEAT (4)"])
+        self.assertEqual(movies["Heat"], 1995)
+        self.assertEqual(movies["heat (3)"], 1986)
+        self.assertEqual(movies["HEAT (4)"], 2013)
+
+    def test_same_title_for_different_users_is_kept(self) -> None:
+        alice, bob = self.add_user("alice"), self.add_user("bob")
+        self.add_movies(alice, ("Heat", 1995, 8.3, None))
+        self.add_movies(bob, ("heat", 1995, 8.3, None))
+        self.migrate()
+        self.assertEqual(list(self.titles(alice)), ["Heat"])
+        self.assertEqual(list(self.titles(bob)), ["heat"])
+
+    def test_unique_index_rejects_case_variants(self) -> None:
+        alice = self.add_user("alice")
+        self.add_movies(alice, ("Heat", 1995, 8.3, None))
+        self.migrate()
+        # ab v7 liegt der Titel (als Sortierschlüssel) in user_movies
+        title_id = self.db.execute(
+            "INSERT INTO titles (title, year, rating) VALUES ('HEAT', 1995, 8.3)"
+        ).lastrowid
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.db.execute(
+                "INSERT INTO user_movies (user_id, title_id, title, year, rating) "
+                "VALUES (?, ?, 'HEAT', 1995, 8.3)",
+                (alice, title_id),
+            )
+
+
+class RandomPickMigrationTests(BaselineMigrationTestCase):
+    def seqs(self, user_id: int) -> dict:
+        return dict(self.db.execute("SELECT title, seq FROM movies WHERE user_id = ?", (user_id,)))
+
+    def test_seq_is_dense_per_user_in_insert_order(self) -> None:
+        alice, bob = self.add_user("alice"), self.add_user("bob")
+        # Zeilen beider User durchmischt
+        for n in range(3):
+            self.add_movies(alice, (f"A{n}", 2000, 7.0, None))
+            self.add_movies(bob, (f"B{n}", 2000, 7.0, None))
+        self.migrate()
+        self.assertEqual(self.seqs(alice), {"A0": 1, "A1": 2, "A2": 3})
+        self.assertEqual(self.seqs(bob), {"B0": 1, "B1": 2, "B2": 3})
+
+    def test_triggers_keep_seq_dense_and_bump_the_version(self) -> None:
+        alice = self.add_user("alice")
+        self.add_movies(alice, ("A0", 2000, 7.0, None), ("A1", 2000, 7.0, None))
+        self.migrate()
+        version = lambda: self.db.execute(  # noqa: E731
+            "SELECT movies_version FROM users WHERE id = ?", (alice,)
+        ).fetchone()[0]
+        self.assertEqual(version(), 0)
+        engine = storage.init_storage(f"sqlite:///{self.path}")
+        self.addCleanup(engine.dispose)
+        with contextlib.redirect_stdout(io.StringIO()):
+            storage.add_movie("A2", 2000, 7.0, None, alice)
+            storage.add_movie("A3", 2000, 7.0, None, alice)
+            self.assertEqual(self.seqs(alice), {"A0": 1, "A1": 2, "A2": 3, "A3": 4})
+            storage.delete_movie("A1", alice)
+            # die letzte Zeile rückt in die Lücke
+            self.assertEqual(self.seqs(alice), {"A0": 1, "A3": 2, "A2": 3})
+            storage.delete_movie("A2", alice)
+            self.assertEqual(self.seqs(alice), {"A0": 1, "A3": 2})
+            storage.update_movie("A0", alice, note="x")
+            self.assertEqual(version(), 4)
+            storage.update_movie("A0", alice, rating=9)
+            self.assertEqual(version(), 5)
+
+
+class FulltextMigrationTests(BaselineMigrationTestCase):
+    def test_existing_movies_are_searchable_per_user(self) -> None:
+        alice, bob = self.add_user("alice"), self.add_user("bob")
+        self.add_movies(alice, ("Heat", 1995, 8.3, None, "bank heist"))
+        self.add_movies(bob, ("Heat", 2013, 4.0, None))
+        self.migrate()
+        engine = storage.init_storage(f"sqlite:///{self.path}")
+        self.addCleanup(engine.dispose)
+        self.assertEqual(storage.search_movies(alice, "heist")["Heat"]["year"], 1995)
+        self.assertEqual(storage.search_movies(bob, "heat")["Heat"]["year"], 2013)
+        self.assertEqual(storage.search_movies(bob, "heist"), {})
+
+
+class TitleCatalogMigrationTests(BaselineMigrationTestCase):
+    def open_storage(self) -> None:
+        engine = storage.init_storage(f"sqlite:///{self.path}")
+        self.addCleanup(engine.dispose)
+
+    def test_matching_titles_share_the_catalog_row(self) -> None:
+        alice, bob = self.add_user("alice"), self.add_user("bob")
+        self.add_movies(alice, ("heat", 1995, 9.0, "tt0113277", "bank heist"))
+        self.add_movies(bob, ("Heat", 1995, 8.3, "tt0113277"))
+        self.migrate()
+        self.assertEqual(self.db.execute("SELECT COUNT(*) FROM titles").fetchone(), (1,))
+        self.open_storage()
+
+        alice_heat = storage.list_movies(alice)["Heat"]
+        bob_heat = storage.list_movies(bob)["Heat"]
+        self.assertEqual(alice_heat["imdb_id"], "tt0113277")
+        # Katalogwert von bob, alice behält ihre Bewertung und Notiz
+        self.assertEqual((alice_heat["rating"], alice_heat["personal_rating"]), (9.0, 9.0))
+        self.assertEqual(alice_heat["note"], "bank heist")
+        self.assertEqual((bob_heat["rating"], bob_heat["personal_rating"]), (8.3, None))
+        # movies_fts kennt die Schreibweise aus dem Katalog
+        self.assertEqual(list(storage.search_movies(alice, "heist")), ["Heat"])
+
+    def test_forked_rows_keep_their_data_and_imdb_id(self) -> None:
+        alice, bob, carol = self.add_user("alice"), self.add_user("bob"), self.add_user("carol")
+        self.add_movies(alice, ("Inception", 2010, 9.0, "tt1375666", "great"))
+        self.add_movies(carol, ("Inception", 2011, 6.0, "tt1375666"))
+        # neueste Zeile stellt den Katalogeintrag
+        self.add_movies(bob, ("Inception (Director's Cut)", 2010, 7.5, "tt1375666"))
+        self.migrate()
+        self.assertEqual(
+            self.db.execute("SELECT COUNT(*) FROM titles WHERE imdb_id IS NOT NULL").fetchone(),
+            (1,),
+        )
+        self.open_storage()
+
+        for user_id, title, year, rating in (
+            (alice, "Inception", 2010, 9.0),
+            (carol, "Inception", 2011, 6.0),
+            (bob, "Inception (Director's Cut)", 2010, 7.5),
+        ):
+            movies = storage.list_movies(user_id)
+            self.assertEqual(list(movies), [title])
+            self.assertEqual(movies[title]["year"], year)
+            self.assertEqual(movies[title]["rating"], rating)
+            self.assertEqual(movies[title]["imdb_id"], "tt1375666")
+        self.assertEqual(storage.list_movies(alice)["Inception"]["note"], "great")
+        # abgespaltene Zeilen bleiben für refresh-metadata erreichbar
+        rows = storage.refreshable_titles(0, 10)
+        self.assertEqual([r["imdb_id"] for r in rows], ["tt1375666"] * 3)
+        self.assertEqual(sorted(r["private"] for r in rows), [0, 1, 1])
+
+    def test_ids_seq_and_sort_indexes_carry_over(self) -> None:
+        alice = self.add_user("alice")
+        self.add_movies(alice, ("B", 2001, 5.0, None), ("A", 2000, 7.0, "tt0000001"))
+        self.migrate()
+        rows = self.db.execute(
+            "SELECT id, title, seq FROM user_movies ORDER BY id"
+        ).fetchall()
+        self.assertEqual(rows, [(1, "B", 1), (2, "A", 2)])
+        self.open_storage()
+        self.assertEqual(list(storage.query_movies(alice, order_by="rating")), ["B", "A"])
+        self.assertEqual(list(storage.suggest_titles(alice, "a")), ["A"])
+
+
+class TitleGramMigrationTests(BaselineMigrationTestCase):
+    def test_existing_titles_are_suggested_per_user(self) -> None:
+        alice, bob = self.add_user("alice"), self.add_user("bob")
+        self.add_movies(alice, ("Heat", 1995, 8.3, None))
+        self.add_movies(bob, ("Aliens", 1986, 8.4, None))
+        self.migrate()
+        engine = storage.init_storage(f"sqlite:///{self.path}")
+        self.addCleanup(engine.dispose)
+        self.assertEqual(list(storage.suggest_titles(bob, "alein")), ["Aliens"])
+        self.assertEqual(storage.suggest_titles(alice, "alein"), {})
+
+
+class MigrationEngineTests(BaselineMigrationTestCase):
+    def test_current_schema_runs_nothing(self) -> None:
+        self.migrate()
+        engine = create_engine(f"sqlite:///{self.path}")
+        self.addCleanup(engine.dispose)
+        with engine.connect() as connection:
+            self.assertEqual(storage.migrate(connection), 0)
+
+    def test_failing_migration_is_rolled_back(self) -> None:
+        def broken(connection) -> None:
+            connection.exec_driver_sql("CREATE TABLE half_done (id INTEGER)")
+            raise RuntimeError("boom")
+
+        self.db.commit()
+        self.db.close()
+        engine = create_engine(f"sqlite:///{self.path}")
+        self.addCleanup(engine.dispose)
+        migrations = storage.MIGRATIONS[:1] + (broken,)
+        with mock.patch.multiple(storage, MIGRATIONS=migrations, SCHEMA_VERSION=2):
+            with engine.connect() as connection:
+                with self.assertRaises(RuntimeError):
+                    storage.migrate(connection)
+                # v1 ist committet, der Rest von v2 zurückgerollt
+                self.assertEqual(storage.schema_version(connection), 1)
+                self.assertIsNone(
+                    connection.exec_driver_sql(
+                        "SELECT 1 FROM sqlite_master WHERE name = 'half_done'"
+                    ).fetchone()
+                )
+
+
+def _open(url: str) -> None:
+    engine = create_engine(url)
+    with engine.connect() as connection:
+        storage.migrate(connection)
+    engine.dispose()
+
+
+class ConcurrentMigrationTests(unittest.TestCase):
+    def test_processes_opening_a_new_database_migrate_it_once(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        url = f"sqlite:///{tmp.name}/movies.db"
+        ctx = multiprocessing.get_context("spawn")
+        procs = [ctx.Process(target=_open, args=(url,)) for _ in range(6)]
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join()
+        self.assertEqual([proc.exitcode for proc in procs], [0] * len(procs))
+        engine = create_engine(url)
+        self.addCleanup(engine.dispose)
+        with engine.connect() as connection:
+            self.assertEqual(storage.schema_version(connection), storage.SCHEMA_VERSION)
+
+
+if __name__ == "__main__":
+    unittest.main()
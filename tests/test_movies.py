@@ -0,0 +1,331 @@
+"""
+CLI entry points of movies.py that run without an interactive session.
+"""
+
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import movie_storage_sql as storage  # noqa: E402
+import movies  # noqa: E402
+
+
+class CliTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        engine = storage.init_storage(f"sqlite:///{self.tmp}/movies.db")
+        self.addCleanup(engine.dispose)
+
+
+class QueryMetricsFlagTests(CliTestCase):
+    def test_flag_defaults_to_json(self) -> None:
+        with mock.patch.dict(os.environ, {movies.QUERY_METRICS_ENV: ""}):
+            self.assertIsNone(movies.parse_args([]).query_metrics)
+            self.assertEqual(movies.parse_args(["--query-metrics"]).query_metrics, "json")
+
+    def test_environment_selects_the_format(self) -> None:
+        with mock.patch.dict(os.environ, {movies.QUERY_METRICS_ENV: "prometheus"}):
+            self.assertEqual(movies.parse_args([]).query_metrics, "prometheus")
+        with mock.patch.dict(os.environ, {movies.QUERY_METRICS_ENV: "xml"}), \
+                redirect_stderr(io.StringIO()):
+            with self.assertRaises(SystemExit):
+                movies.parse_args([])
+
+    def test_report_is_printed_on_exit(self) -> None:
+        self.addCleanup(storage.disable_query_metrics)
+        self.addCleanup(storage.query_metrics.reset)
+        with mock.patch.object(movies.atexit, "register") as register:
+            movies.report_query_metrics_on_exit("prometheus")
+        storage.list_users()
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            register.call_args.args[0]()
+        self.assertIn('movies_db_query_ms_count{call_site="list_users"} 1', stderr.getvalue())
+
+
+
+class OmdbCacheTests(CliTestCase):
+    HEAT = {"Response": "True", "Title": "Heat", "Year": "1995", "imdbID": "tt0113277"}
+    NOT_FOUND = {"Response": "False", "Error": "Movie not found!"}
+
+    def setUp(self) -> None:
+        super().setUp()
+        patcher = mock.patch.dict(
+            movies.OMDB_CACHE_STATS,
+            {"hits": 0, "negative_hits": 0, "misses": 0, "stale_hits": 0},
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fetch(self, title: str, answer=None, now: float = 1000.0):
+        """_fetch_from_omdb at time now; returns (data, number of HTTP requests)."""
+        client = mock.Mock()
+        if isinstance(answer, Exception):
+            client.lookup_title.side_effect = answer
+        else:
+            client.lookup_title.return_value = answer
+        with mock.patch.object(movies, "get_omdb_client", return_value=client), \
+                mock.patch.object(movies.time, "time", return_value=now), \
+                mock.patch.object(storage.time, "time", return_value=now), \
+                redirect_stdout(io.StringIO()):
+            return movies._fetch_from_omdb(title), client.lookup_title.call_count
+
+    def test_answers_are_served_from_the_cache_within_the_ttl(self) -> None:
+        self.assertEqual(self.fetch("Heat", self.HEAT), (self.HEAT, 1))
+        self.assertEqual(self.fetch("  HEAT "), (self.HEAT, 0))
+        self.assertEqual(storage.omdb_cache_get("i:tt0113277")[0], self.HEAT)
+        expired = 1000.0 + movies.OMDB_CACHE_TTL_SEC + 1
+        self.assertEqual(self.fetch("Heat", self.HEAT, now=expired), (self.HEAT, 1))
+
+    def test_not_found_answers_expire_after_the_negative_ttl(self) -> None:
+        self.assertEqual(self.fetch("Heaat", self.NOT_FOUND), (None, 1))
+        self.assertEqual(self.fetch("Heaat", now=1000.0 + movies.OMDB_NEGATIVE_TTL_SEC), (None, 0))
+        expired = 1000.0 + movies.OMDB_NEGATIVE_TTL_SEC + 1
+        self.assertEqual(self.fetch("Heaat", self.HEAT, now=expired), (self.HEAT, 1))
+
+    def test_expired_entries_are_served_while_omdb_is_unavailable(self) -> None:
+        self.fetch("Heat", self.HEAT)
+        expired = 1000.0 + movies.OMDB_CACHE_TTL_SEC + 1
+        down = movies.OmdbCircuitOpen("OMDb is unavailable.")
+        self.assertEqual(self.fetch("Heat", down, now=expired), (self.HEAT, 1))
+        self.assertEqual(self.fetch("Alien", down, now=expired), (None, 1))
+        self.assertTrue(movies.omdb_cache_stats_line().endswith(
+            "3 misses (0% served from cache), 1 misses served stale while OMDb was unavailable"
+        ))
+
+    def test_concurrent_lookups_of_one_title_share_a_request(self) -> None:
+        def lookup(title: str) -> dict:
+            time.sleep(0.2)  # alle Aufrufer warten auf denselben Abruf
+            return {**self.HEAT, "Title": title.strip().title()}
+
+        client = mock.Mock()
+        client.lookup_title.side_effect = lookup
+        queries = ["Heat", "heat", " HEAT", "Heat ", "Alien", "alien"]
+        with mock.patch.object(movies, "get_omdb_client", return_value=client), \
+                ThreadPoolExecutor(max_workers=len(queries)) as pool:
+            results = list(pool.map(movies._fetch_from_omdb, queries))
+        self.assertEqual(client.lookup_title.call_count, 2)
+        self.assertEqual([r["Title"] for r in results], ["Heat"] * 4 + ["Alien"] * 2)
+
+    def test_other_errors_are_not_cached(self) -> None:
+        self.fetch("Heat", {"Response": "False", "Error": "Invalid API key!"})
+        self.assertIsNone(storage.omdb_cache_get("t:heat"))
+
+    def test_stats_line_counts_hits_and_misses(self) -> None:
+        self.assertIsNone(movies.omdb_cache_stats_line())
+        self.fetch("Heat", self.HEAT)
+        self.fetch("Heat")
+        self.fetch("Heaat", self.NOT_FOUND)
+        self.fetch("Heaat")
+        self.assertEqual(
+            movies.omdb_cache_stats_line(),
+            "OMDb cache: 1 hits, 1 negative hits, 2 misses (50% served from cache)",
+        )
+
+
+def omdb_answer(title: str) -> dict:
+    return {
+        "Response": "True", "Title": title, "Year": "1995",
+        "imdbRating": "8.3", "Poster": "N/A", "imdbID": "tt" + title.lower(),
+    }
+
+
+class AddMoviesBatchTests(CliTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        uid = storage.get_or_create_user("alice")[0]
+        patcher = mock.patch.object(movies, "ACTIVE_USER", {"id": uid, "name": "alice"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def add_mode(self, *lines: str, fetch=omdb_answer) -> tuple:
+        """Run add mode on the given input lines; (lookups, printed output)."""
+        fetch = mock.Mock(side_effect=fetch)
+        out = io.StringIO()
+        with mock.patch.object(movies, "_fetch_from_omdb", fetch), \
+                mock.patch("builtins.input", side_effect=[*lines, "done"]), \
+                redirect_stdout(out):
+            movies.add_movie()
+        return sorted(c.args[0] for c in fetch.call_args_list), out.getvalue()
+
+    def titles(self) -> list:
+        return list(storage.list_movies(movies.ACTIVE_USER["id"]))
+
+    def test_semicolons_stay_part_of_the_title(self) -> None:
+        lookups, _ = self.add_mode("Love; Death")
+        self.assertEqual(lookups, ["Love; Death"])
+        self.assertEqual(self.titles(), ["Love; Death"])
+
+    def test_pasted_titles_are_looked_up_once_and_saved_together(self) -> None:
+        storage.add_movie("Heat", 1995, 8.3, None, movies.ACTIVE_USER["id"])
+        with mock.patch.object(storage, "add_movies_bulk", wraps=storage.add_movies_bulk) as bulk:
+            lookups, out = self.add_mode("paste", "Heat", "Alien", " Heat ", "Nope", "")
+        self.assertEqual(lookups, ["Alien", "Heat", "Nope"])
+        bulk.assert_called_once()
+        self.assertEqual(self.titles(), ["Alien", "Heat", "Nope"])
+        self.assertIn("Movie 'Heat' already exists", out)
+        self.assertIn("2 of 3 movies added", out)
+
+    def test_lookups_run_concurrently(self) -> None:
+        titles = [f"Movie {n}" for n in range(min(4, movies.OMDB_MAX_CONCURRENCY))]
+        # Blockiert, bis alle Abfragen gleichzeitig laufen
+        barrier = threading.Barrier(len(titles), timeout=5)
+
+        def fetch(title: str) -> dict:
+            barrier.wait()
+            return omdb_answer(title)
+
+        self.add_mode("paste", *titles, "", fetch=fetch)
+        self.assertEqual(self.titles(), titles)
+
+class RefreshMetadataTests(CliTestCase):
+    CATALOG = {
+        "tt0113277": ("Heat", "1995", "8.3"),
+        "tt0078748": ("Alien", "1979", "8.5"),
+        "tt0088846": ("Brazil", "1985", "7.9"),
+    }
+
+    def setUp(self) -> None:
+        super().setUp()
+        patcher = mock.patch.dict(
+            movies.OMDB_CACHE_STATS,
+            {"hits": 0, "negative_hits": 0, "misses": 0, "stale_hits": 0},
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.alice = storage.get_or_create_user("alice")[0]
+        self.bob = storage.get_or_create_user("bob")[0]
+        with redirect_stdout(io.StringIO()):
+            for imdb_id, (title, year, rating) in self.CATALOG.items():
+                storage.add_movie(title, int(year), float(rating), None, self.alice, imdb_id)
+            storage.add_movie("Heat", 1995, 8.3, None, self.bob, "tt0113277")
+        self.answers = {}
+        for imdb_id, (title, year, rating) in self.CATALOG.items():
+            self.answers[imdb_id] = {
+                **omdb_answer(title), "Year": year, "imdbRating": rating, "imdbID": imdb_id,
+            }
+
+    def refresh(self, fail_after=None, **kwargs) -> tuple:
+        """refresh_metadata against a fake OMDb; returns (output, looked up ids)."""
+        lookups = []
+
+        def lookup(imdb_id: str) -> dict:
+            if fail_after is not None and len(lookups) >= fail_after:
+                raise movies.OmdbCircuitOpen("OMDb is unavailable.")
+            lookups.append(imdb_id)
+            return self.answers[imdb_id]
+
+        client = mock.Mock()
+        client.lookup_imdb_id.side_effect = lookup
+        out = io.StringIO()
+        # ein Worker: Abbruchstelle deterministisch
+        with mock.patch.object(movies, "get_omdb_client", return_value=client), \
+                mock.patch.object(movies, "OMDB_MAX_CONCURRENCY", 1), \
+                redirect_stdout(out):
+            movies.refresh_metadata(**kwargs)
+        return out.getvalue(), lookups
+
+    def test_changed_titles_reach_every_user(self) -> None:
+        self.answers["tt0113277"]["imdbRating"] = "8.4"
+        with redirect_stdout(io.StringIO()):
+            storage.update_movie("Heat", self.alice, rating=10.0)
+        out, lookups = self.refresh()
+        self.assertEqual(len(lookups), 3)
+        self.assertIn("complete: 1 titles updated", out)
+        self.assertEqual(storage.list_movies(self.bob)["Heat"]["rating"], 8.4)
+        # eigene Bewertung bleibt
+        self.assertEqual(storage.list_movies(self.alice)["Heat"]["rating"], 10.0)
+        self.assertIsNone(storage.get_checkpoint(movies.REFRESH_JOB))
+        # zweiter Lauf: alles aus dem Cache
+        self.assertEqual(self.refresh()[1], [])
+
+    def test_interrupted_run_resumes_after_the_checkpoint(self) -> None:
+        self.answers["tt0088846"]["imdbRating"] = "8.0"
+        out, lookups = self.refresh(fail_after=1, batch_size=2)
+        self.assertEqual(lookups, ["tt0113277"])
+        self.assertIn("Stopped: OMDb is unavailable.", out)
+        checkpoint = storage.get_checkpoint(movies.REFRESH_JOB)
+        self.assertEqual([r["id"] for r in storage.refreshable_titles(0, 1)], [checkpoint])
+
+        out, lookups = self.refresh(batch_size=2)
+        self.assertIn("Resuming after 1/3 titles.", out)
+        self.assertEqual(lookups, ["tt0078748", "tt0088846"])
+        self.assertEqual(storage.list_movies(self.alice)["Brazil"]["rating"], 8.0)
+        self.assertIsNone(storage.get_checkpoint(movies.REFRESH_JOB))
+
+    def test_restart_ignores_the_checkpoint(self) -> None:
+        self.refresh(fail_after=2, batch_size=1)
+        out, _ = self.refresh(restart=True)
+        self.assertNotIn("Resuming", out)
+        self.assertIn("3/3 titles checked", out)
+
+    def test_private_copies_only_take_the_rating(self) -> None:
+        with redirect_stdout(io.StringIO()):
+            storage.update_movie("Heat", self.alice, year=1996)
+        self.answers["tt0113277"].update(imdbRating="8.4", Poster="http://img/heat.jpg")
+        self.refresh()
+        alice_heat = storage.list_movies(self.alice)["Heat"]
+        bob_heat = storage.list_movies(self.bob)["Heat"]
+        self.assertEqual((alice_heat["year"], alice_heat["rating"]), (1996, 8.4))
+        self.assertIsNone(alice_heat["poster_url"])
+        self.assertEqual(bob_heat["poster_url"], "http://img/heat.jpg")
+
+    def test_batch_size_must_be_positive(self) -> None:
+        self.assertEqual(movies.parse_args(["refresh-metadata"]).batch_size, 100)
+        with redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            movies.parse_args(["refresh-metadata", "--batch-size", "0"])
+
+
+class GenerateAllTests(CliTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        for name in ("alice", "bob", "carol"):
+            storage.get_or_create_user(name)
+
+    def generate_all(self, results) -> str:
+        def render_all_sites(users, workers=None, mode=None):
+            yield from results(users)
+
+        out = io.StringIO()
+        with mock.patch.object(movies.website, "sync_static"), \
+                mock.patch.object(movies.website, "render_all_sites", render_all_sites), \
+                redirect_stdout(out):
+            movies.generate_all_websites()
+        return out.getvalue()
+
+    def test_broken_pool_lists_the_users_not_rendered(self) -> None:
+        def results(users):
+            user_id, name = users[0]
+            yield movies.website.RenderResult(name, self.tmp / f"{name}.html", True, 0, 0.01)
+            raise BrokenProcessPool("A child process terminated abruptly")
+
+        out = self.generate_all(results)
+        self.assertIn("alice: 0 movies, 0/0 pages written", out)
+        self.assertIn(
+            f"{movies.COLOR_ERROR}Worker pool failed: A child process terminated abruptly. "
+            "Not rendered: bob, carol, Default",
+            out,
+        )
+        self.assertIn("4 users (1 written, 0 unchanged, 3 failed)", out)
+
+    def test_workers_must_be_positive(self) -> None:
+        with redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            movies.parse_args(["generate-all", "--workers", "0"])
+        self.assertEqual(movies.parse_args(["generate-all", "--workers", "2"]).workers, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,383 @@
+"""
+OmdbClient against a local fake OMDb server: keep-alive connection
+pooling, rate limiting, retry with backoff, circuit breaker (including
+the half-open trial) and their interaction; SingleFlight coalescing.
+Run with `python -m pytest tests` or `python -m unittest`.
+"""
+
+import json
+import sys
+import threading
+import time
+import unittest
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from omdb_client import (  # noqa: E402
+    CircuitBreaker,
+    OmdbBadResponse,
+    OmdbCircuitOpen,
+    OmdbClient,
+    OmdbHTTPError,
+    OmdbRateLimited,
+    SingleFlight,
+    TokenBucket,
+)
+
+
+class FakeOmdb:
+    """
+    Threaded HTTP server answering like OMDb. Statuses queued with
+    fail() are served first (one per request), then 200 with JSON.
+    """
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.connections = 0
+        self.body = None  # fester Antworttext statt JSON
+        self.drop_connections = False  # nach jeder Antwort still schließen
+        self._statuses: list = []
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-Alive
+
+            def setup(self) -> None:
+                super().setup()
+                with fake._lock:
+                    fake.connections += 1
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                with fake._lock:
+                    fake.requests += 1
+                    status = fake._statuses.pop(0) if fake._statuses else 200
+                query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+                body = fake.body or json.dumps(
+                    {"Response": "True", "Title": query.get("t", ["?"])[0]}
+                    if status == 200
+                    else {"Response": "False", "Error": "fake failure"}
+                ).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                # Wie ein Server nach seinem Keep-Alive-Timeout: ohne
+                # "Connection: close", der Client merkt es erst beim Senden
+                self.close_connection = fake.drop_connections
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_port}/"
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+        )
+        self._thread.start()
+
+    def fail(self, *statuses: int) -> None:
+        with self._lock:
+            self._statuses.extend(statuses)
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class OmdbClientTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = FakeOmdb()
+        self.addCleanup(self.server.close)
+
+    def client(self, **kwargs) -> OmdbClient:
+        kwargs.setdefault("backoff_base", 0.001)
+        kwargs.setdefault("backoff_max", 0.001)
+        client = OmdbClient("key", base_url=self.server.url, timeout=2, **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+
+class TokenBucketTests(unittest.TestCase):
+    def test_burst_then_refill(self) -> None:
+        bucket = TokenBucket(rate=20, capacity=2)
+        self.assertTrue(bucket.acquire(timeout=0))
+        self.assertTrue(bucket.acquire(timeout=0))
+        self.assertFalse(bucket.acquire(timeout=0))
+        time.sleep(0.06)  # 20/s -> ein Token nach 50 ms
+        self.assertTrue(bucket.acquire(timeout=0))
+
+    def test_acquire_waits_up_to_timeout(self) -> None:
+        bucket = TokenBucket(rate=20, capacity=1)
+        bucket.acquire()
+        start = time.monotonic()
+        self.assertTrue(bucket.acquire(timeout=1))
+        self.assertGreaterEqual(time.monotonic() - start, 0.03)
+
+    def test_acquire_fails_at_once_if_token_comes_after_timeout(self) -> None:
+        bucket = TokenBucket(rate=0.1, capacity=1)  # ein Token alle 10 s
+        bucket.acquire()
+        start = time.monotonic()
+        self.assertFalse(bucket.acquire(timeout=5))
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_rejects_invalid_parameters(self) -> None:
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=0, capacity=1)
+
+
+class ConnectionPoolTests(OmdbClientTestCase):
+    def test_lookup_reuses_keep_alive_connection(self) -> None:
+        client = self.client(pool_size=1)
+        for title in ("Heat", "Alien", "Up"):
+            self.assertEqual(client.lookup_title(title)["Title"], title)
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_concurrent_lookups_share_at_most_pool_size_connections(self) -> None:
+        client = self.client(pool_size=3)
+        titles = [f"Movie {n}" for n in range(60)]
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            results = list(pool.map(lambda t: client.lookup_title(t)["Title"], titles))
+        self.assertEqual(results, titles)
+        self.assertEqual(self.server.requests, 60)
+        self.assertLessEqual(self.server.connections, 3)
+
+    def test_connection_closed_by_server_is_replaced_once(self) -> None:
+        client = self.client(pool_size=1)
+        self.server.drop_connections = True
+        for title in ("Heat", "Alien"):
+            self.assertEqual(client.lookup_title(title)["Title"], title)
+        self.assertEqual(self.server.connections, 2)
+
+    def test_pool_size_must_be_positive(self) -> None:
+        with self.assertRaises(ValueError):
+            OmdbClient("key", pool_size=0)
+
+
+class ResponseTests(OmdbClientTestCase):
+    def test_http_errors_carry_the_status(self) -> None:
+        self.server.fail(404)
+        with self.assertRaises(OmdbHTTPError) as ctx:
+            self.client().lookup_title("Heat")
+        self.assertEqual(ctx.exception.status, 404)
+
+    def test_invalid_json_is_a_bad_response(self) -> None:
+        self.server.body = b"<html>"
+        with self.assertRaises(OmdbBadResponse):
+            self.client().lookup_imdb_id("tt0113277")
+
+    def test_latency_is_recorded_per_lookup_kind(self) -> None:
+        client = self.client()
+        client.lookup_title("Heat")
+        client.lookup_title("Alien")
+        client.lookup_imdb_id("tt0113277")
+        counts = {kind: snap["count"] for kind, snap in client.metrics.to_dict().items()}
+        self.assertEqual(counts, {"imdb_id": 1, "title": 2})
+        self.assertNotIn("rows_total", client.metrics.to_prometheus())
+
+
+class RetryTests(OmdbClientTestCase):
+    def test_retries_server_errors_and_429(self) -> None:
+        self.server.fail(500, 429)
+        data = self.client(max_retries=3).lookup_title("Heat")
+        self.assertEqual(data["Title"], "Heat")
+        self.assertEqual(self.server.requests, 3)
+
+    def test_gives_up_after_max_retries(self) -> None:
+        self.server.fail(503, 503, 503)
+        client = self.client(max_retries=2, breaker=CircuitBreaker(failure_threshold=10))
+        with self.assertRaises(OmdbHTTPError) as ctx:
+            client.lookup_title("Heat")
+        self.assertEqual(ctx.exception.status, 503)
+        self.assertEqual(self.server.requests, 3)
+
+    def test_client_errors_are_not_retried(self) -> None:
+        self.server.fail(404)
+        with self.assertRaises(OmdbHTTPError):
+            self.client(max_retries=3).lookup_title("Heat")
+        self.assertEqual(self.server.requests, 1)
+
+
+class RateLimitTests(OmdbClientTestCase):
+    def test_empty_limiter_raises_without_request(self) -> None:
+        bucket = TokenBucket(rate=1, capacity=1)
+        client = self.client(limiters=[bucket], limiter_timeout=0)
+        client.lookup_title("Heat")
+        with self.assertRaises(OmdbRateLimited):
+            client.lookup_title("Alien")
+        self.assertEqual(self.server.requests, 1)
+
+    def test_every_attempt_takes_a_token(self) -> None:
+        self.server.fail(500)
+        bucket = TokenBucket(rate=1, capacity=1)
+        client = self.client(limiters=[bucket], limiter_timeout=0, max_retries=3)
+        with self.assertRaises(OmdbRateLimited):
+            client.lookup_title("Heat")
+        self.assertEqual(self.server.requests, 1)
+
+    def test_refused_limiter_gives_back_earlier_tokens(self) -> None:
+        burst = TokenBucket(rate=1, capacity=1)
+        daily = TokenBucket(rate=0.001, capacity=1)
+        daily.acquire()
+        client = self.client(limiters=[burst, daily], limiter_timeout=0)
+        with self.assertRaises(OmdbRateLimited):
+            client.lookup_title("Heat")
+        self.assertTrue(burst.acquire(timeout=0))
+        self.assertEqual(self.server.requests, 0)
+
+
+class CircuitBreakerTests(OmdbClientTestCase):
+    def test_opens_after_threshold_and_fails_fast(self) -> None:
+        self.server.fail(500, 500)
+        client = self.client(
+            max_retries=0, breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        )
+        for _ in range(2):
+            with self.assertRaises(OmdbHTTPError):
+                client.lookup_title("Heat")
+        with self.assertRaises(OmdbCircuitOpen):
+            client.lookup_title("Heat")
+        self.assertEqual(self.server.requests, 2)
+
+    def test_retried_call_counts_as_one_failure(self) -> None:
+        self.server.fail(503, 503, 503, 503, 503, 503)
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        client = self.client(max_retries=2, breaker=breaker)
+        with self.assertRaises(OmdbHTTPError):
+            client.lookup_title("Heat")
+        self.assertEqual(self.server.requests, 3)
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        with self.assertRaises(OmdbHTTPError):
+            client.lookup_title("Heat")
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_half_open_trial_closes_on_success(self) -> None:
+        self.server.fail(500)
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        client = self.client(max_retries=0, breaker=breaker)
+        with self.assertRaises(OmdbHTTPError):
+            client.lookup_title("Heat")
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        time.sleep(0.06)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertEqual(client.lookup_title("Heat")["Title"], "Heat")
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_trial_reopens_on_failure(self) -> None:
+        self.server.fail(500, 500)
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        client = self.client(max_retries=0, breaker=breaker)
+        with self.assertRaises(OmdbHTTPError):
+            client.lookup_title("Heat")
+        time.sleep(0.06)
+        with self.assertRaises(OmdbHTTPError):
+            client.lookup_title("Heat")
+        with self.assertRaises(OmdbCircuitOpen):
+            client.lookup_title("Heat")
+
+    def test_only_one_half_open_trial(self) -> None:
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+    def test_rate_limited_half_open_trial_is_released(self) -> None:
+        # Regression: ein am Limiter gescheiterter Half-Open-Versuch darf
+        # den Breaker nicht dauerhaft blockieren
+        self.server.fail(500)
+        bucket = TokenBucket(rate=5, capacity=1)  # ein Token alle 200 ms
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        client = self.client(
+            limiters=[bucket], limiter_timeout=0, max_retries=0, breaker=breaker
+        )
+        with self.assertRaises(OmdbHTTPError):
+            client.lookup_title("Heat")
+        time.sleep(0.06)
+        with self.assertRaises(OmdbRateLimited):
+            client.lookup_title("Heat")
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        time.sleep(0.25)
+        self.assertEqual(client.lookup_title("Heat")["Title"], "Heat")
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_unexpected_error_releases_half_open_trial(self) -> None:
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        client = self.client(max_retries=0, breaker=breaker)
+        breaker.record_failure()
+        time.sleep(0.06)
+
+        def broken(target, kind):
+            raise RuntimeError("bug")
+
+        client._get_once = broken  # type: ignore[method-assign]
+        with self.assertRaises(RuntimeError):
+            client.lookup_title("Heat")
+        del client._get_once
+        self.assertEqual(client.lookup_title("Heat")["Title"], "Heat")
+
+
+class SingleFlightTests(unittest.TestCase):
+    def run_concurrently(self, flight: SingleFlight, key: str, fn, callers: int = 5) -> list:
+        """Outcome (result or exception) per caller; fn blocks until all are waiting."""
+        outcomes: list = []
+        lock = threading.Lock()
+
+        def call() -> None:
+            try:
+                outcome = flight.do(key, fn)
+            except Exception as exc:
+                outcome = exc
+            with lock:
+                outcomes.append(outcome)
+
+        threads = [threading.Thread(target=call) for _ in range(callers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+        return outcomes
+
+    def blocking(self, result):
+        """fn that waits 200 ms (so every caller joins the flight), counting its calls."""
+        calls = []
+
+        def fn():
+            calls.append(1)
+            time.sleep(0.2)
+            if isinstance(result, Exception):
+                raise result
+            return result
+
+        return fn, calls
+
+    def test_concurrent_callers_share_one_call(self) -> None:
+        fn, calls = self.blocking({"Title": "Heat"})
+        outcomes = self.run_concurrently(SingleFlight(), "t:heat", fn)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(outcomes, [{"Title": "Heat"}] * 5)
+
+    def test_waiting_callers_get_the_same_exception(self) -> None:
+        error = OmdbCircuitOpen("down")
+        fn, calls = self.blocking(error)
+        outcomes = self.run_concurrently(SingleFlight(), "t:heat", fn)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(outcomes, [error] * 5)
+
+    def test_keys_are_independent_and_nothing_is_kept(self) -> None:
+        flight = SingleFlight()
+        calls = []
+        for key in ("t:heat", "t:alien", "t:heat"):
+            self.assertEqual(flight.do(key, lambda: calls.append(key) or key), key)
+        self.assertEqual(calls, ["t:heat", "t:alien", "t:heat"])
+        self.assertEqual(flight._flights, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+"""
+PosterMirror against a local image server: content-addressed names,
+deduplication, thumbnails, failed and truncated downloads; the
+website's mirror_posters() bookkeeping in the database.
+"""
+
+import hashlib
+import io
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import movie_storage_sql as storage  # noqa: E402
+import poster_cache  # noqa: E402
+import website  # noqa: E402
+from poster_cache import PosterError, PosterMirror  # noqa: E402
+
+
+def jpeg_bytes(width: int = 600, height: int = 900) -> bytes:
+    buf = io.BytesIO()
+    poster_cache.Image.new("RGB", (width, height), (200, 30, 30)).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+class FakeImageServer:
+    """
+    Threaded HTTP server serving routes: path -> (status, content type,
+    body). With truncate set, a route announces its full length but
+    closes the connection after half the body.
+    """
+
+    def __init__(self) -> None:
+        self.routes: dict = {}
+        self.truncate = False
+        self.requests = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                with fake._lock:
+                    fake.requests += 1
+                status, content_type, body = fake.routes.get(
+                    self.path, (404, "text/plain", b"not found")
+                )
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body[: len(body) // 2] if fake.truncate else body)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_port}"
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+        )
+        self._thread.start()
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class PosterMirrorTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        self.server = FakeImageServer()
+        self.addCleanup(self.server.close)
+        self.mirror = PosterMirror(self.tmp / "posters", workers=4, timeout=2)
+
+    def files(self) -> list:
+        root = self.tmp / "posters"
+        return sorted(p.relative_to(root).as_posix() for p in root.rglob("*") if p.is_file())
+
+
+@unittest.skipIf(poster_cache.Image is None, "Pillow is not installed")
+class PosterMirrorTests(PosterMirrorTestCase):
+    def test_identical_posters_are_stored_once(self) -> None:
+        data = jpeg_bytes()
+        self.server.routes["/a.jpg"] = (200, "image/jpeg", data)
+        self.server.routes["/b"] = (200, "application/octet-stream", data)
+        results = self.mirror.fetch_many(
+            [f"{self.server.url}/a.jpg", f"{self.server.url}/b", f"{self.server.url}/a.jpg"]
+        )
+        digest = hashlib.sha256(data).hexdigest()
+        name = f"{digest[:2]}/{digest}.jpg"
+        self.assertEqual(set(results.values()), {(name, None)})
+        self.assertEqual(self.server.requests, 2)
+        self.assertEqual((self.tmp / "posters" / name).read_bytes(), data)
+
+    def test_thumbnails_are_scaled_to_the_grid(self) -> None:
+        self.server.routes["/a.jpg"] = (200, "image/jpeg", jpeg_bytes())
+        name = self.mirror.fetch(f"{self.server.url}/a.jpg")
+        thumbs = self.mirror.thumbnails(name)
+        self.assertEqual(set(thumbs), {"webp", "jpeg"})
+        for thumb in thumbs.values():
+            with poster_cache.Image.open(self.tmp / "posters" / thumb) as img:
+                self.assertEqual(img.size, (256, 384))
+        self.assertEqual(len(self.files()), 3)
+
+    def test_failed_downloads_are_reported_per_url(self) -> None:
+        self.server.routes["/page"] = (200, "text/html", b"<html></html>")
+        results = self.mirror.fetch_many(
+            [f"{self.server.url}/missing.jpg", f"{self.server.url}/page", "ftp://x/y.jpg"]
+        )
+        errors = [error for _, error in results.values()]
+        self.assertEqual([name for name, _ in results.values()], [None] * 3)
+        self.assertIn("HTTP 404", errors[0])
+        self.assertIn("Not an image", errors[1])
+        self.assertIn("Unsupported poster URL", errors[2])
+        self.assertEqual(self.files(), [])
+
+    def test_truncated_download_is_not_stored(self) -> None:
+        self.server.routes["/a.jpg"] = (200, "image/jpeg", jpeg_bytes())
+        self.server.truncate = True
+        with self.assertRaises(PosterError) as caught:
+            self.mirror.fetch(f"{self.server.url}/a.jpg")
+        self.assertIn("IncompleteRead", str(caught.exception))
+        self.assertEqual(self.files(), [])
+
+
+@unittest.skipIf(poster_cache.Image is None, "Pillow is not installed")
+class MirrorPostersTests(PosterMirrorTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        engine = storage.init_storage(f"sqlite:///{self.tmp}/movies.db")
+        self.addCleanup(engine.dispose)
+
+    def mirror_posters(self, *paths: str) -> dict:
+        local, _downloaded, _failed = website.mirror_posters(
+            self.mirror, [self.server.url + p for p in paths]
+        )
+        return local
+
+    def test_mirrored_posters_are_not_downloaded_again(self) -> None:
+        self.server.routes["/a.jpg"] = (200, "image/jpeg", jpeg_bytes())
+        first = self.mirror_posters("/a.jpg", "/gone.jpg")
+        self.assertEqual(list(first), [f"{self.server.url}/a.jpg"])
+        self.assertEqual(self.server.requests, 2)
+        # Fehlschläge erst nach POSTER_RETRY_SEC erneut versuchen
+        self.assertEqual(self.mirror_posters("/a.jpg", "/gone.jpg"), first)
+        self.assertEqual(self.server.requests, 2)
+
+    def test_deleted_files_are_downloaded_again(self) -> None:
+        self.server.routes["/a.jpg"] = (200, "image/jpeg", jpeg_bytes())
+        name = self.mirror_posters("/a.jpg")[f"{self.server.url}/a.jpg"]
+        (self.tmp / "posters" / name).unlink()
+        self.assertEqual(self.mirror_posters("/a.jpg"), {f"{self.server.url}/a.jpg": name})
+        self.assertEqual(self.server.requests, 2)
+
+    def test_sync_posters_stops_at_a_broken_url_stream(self) -> None:
+        self.server.routes["/a.jpg"] = (200, "image/jpeg", jpeg_bytes())
+
+        def urls():
+            yield f"{self.server.url}/a.jpg"
+            raise OperationalError("SELECT", {}, Exception("disk I/O error"))
+
+        with mock.patch.object(storage, "BULK_CHUNK_SIZE", 1):
+            self.assertEqual(website.sync_posters(self.mirror, urls()), (1, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,726 @@
+"""
+Storage API against a temporary database opened with init_storage().
+"""
+
+import os
+import random
+import re
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import unittest
+from collections import Counter
+from pathlib import Path
+from unittest import mock
+
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import movie_storage_sql as storage  # noqa: E402
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class StorageTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        engine = storage.init_storage(f"sqlite:///{self.tmp}/movies.db")
+        self.addCleanup(engine.dispose)
+
+    def add_user(self, name: str) -> int:
+        return storage.get_or_create_user(name)[0]
+
+    def query_plans(self, action) -> list:
+        """EXPLAIN QUERY PLAN details of every statement action() runs."""
+        statements = []
+        engine = storage.get_engine()
+        listener = lambda conn, cur, stmt, params, *args: statements.append((stmt, params))  # noqa: E731
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            action()
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        with engine.connect() as connection:
+            return [
+                " ".join(
+                    row[-1]
+                    for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {stmt}", params)
+                )
+                for stmt, params in statements
+            ]
+
+
+class EngineLifecycleTests(StorageTestCase):
+    def test_import_opens_no_database(self) -> None:
+        before = sorted(self.tmp.iterdir())
+        # frischer Interpreter, damit der Import wirklich der erste ist
+        subprocess.run(
+            [sys.executable, "-c", "import movie_storage_sql"],
+            cwd=self.tmp,
+            env={**os.environ, "PYTHONPATH": str(ROOT)},
+            check=True,
+        )
+        self.assertEqual(sorted(self.tmp.iterdir()), before)
+
+    def test_get_engine_honors_the_environment_url(self) -> None:
+        url = f"sqlite:///{self.tmp}/other.db"
+        with mock.patch.dict(os.environ, {storage.DB_URL_ENV: url}), \
+                mock.patch.object(storage, "_engine", None):
+            engine = storage.get_engine()
+            self.addCleanup(engine.dispose)
+            self.assertIs(storage.get_engine(), engine)
+            self.assertEqual(engine.url.database, f"{self.tmp}/other.db")
+        self.assertTrue((self.tmp / "other.db").exists())
+
+    def test_init_storage_switches_the_database(self) -> None:
+        self.add_user("alice")
+        engine = storage.init_storage(f"sqlite:///{self.tmp}/other.db")
+        self.addCleanup(engine.dispose)
+        self.assertIs(storage.get_engine(), engine)
+        self.assertEqual([name for _, name in storage.list_users()], ["Default"])
+
+
+
+class PragmaProfileTests(StorageTestCase):
+    def pragmas(self, connection, *names) -> dict:
+        return {
+            name: connection.exec_driver_sql(f"PRAGMA {name}").scalar() for name in names
+        }
+
+    def test_profile_is_applied_to_every_connection(self) -> None:
+        engine = storage.init_storage(f"sqlite:///{self.tmp}/durable.db", profile="durable")
+        self.addCleanup(engine.dispose)
+        # zwei gleichzeitig offene Verbindungen: beide frisch aus dem Pool
+        with engine.connect() as first, engine.connect() as second:
+            for connection in (first, second):
+                self.assertEqual(
+                    self.pragmas(connection, "journal_mode", "synchronous", "busy_timeout"),
+                    {"journal_mode": "wal", "synchronous": 2, "busy_timeout": 5000},
+                )
+
+    def test_profile_comes_from_the_environment(self) -> None:
+        with mock.patch.dict(os.environ, {storage.PRAGMA_PROFILE_ENV: "durable"}):
+            engine = storage.init_storage(f"sqlite:///{self.tmp}/env.db")
+        self.addCleanup(engine.dispose)
+        with engine.connect() as connection:
+            self.assertEqual(self.pragmas(connection, "synchronous"), {"synchronous": 2})
+
+    def test_custom_mapping_and_invalid_names(self) -> None:
+        engine = storage.init_storage(
+            f"sqlite:///{self.tmp}/custom.db", profile={"cache_size": -2000}
+        )
+        self.addCleanup(engine.dispose)
+        with engine.connect() as connection:
+            self.assertEqual(self.pragmas(connection, "cache_size"), {"cache_size": -2000})
+        with self.assertRaises(ValueError):
+            storage.init_storage(profile="turbo")
+        with self.assertRaises(ValueError):
+            storage.init_storage(profile={"cache_size = 1; DROP TABLE users": 1})
+
+    def test_readonly_profile_rejects_writes(self) -> None:
+        self.add_user("alice")
+        engine = storage.init_storage(f"sqlite:///{self.tmp}/movies.db", profile="readonly")
+        self.addCleanup(engine.dispose)
+        self.assertEqual(len(storage.list_users()), 2)
+        with self.assertRaises(OperationalError):
+            storage.get_or_create_user("bob")
+
+    def test_readonly_profile_refuses_an_outdated_schema(self) -> None:
+        sqlite3.connect(self.tmp / "old.db").close()
+        with self.assertRaises(RuntimeError):
+            storage.init_storage(f"sqlite:///{self.tmp}/old.db", profile="readonly")
+
+
+class MovieCrudTests(StorageTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.alice = self.add_user("alice")
+        storage.add_movie("Heat", 1995, 8.3, None, self.alice, "tt0113277")
+
+    def test_title_is_unique_per_user_ignoring_case(self) -> None:
+        with self.assertRaises(ValueError):
+            storage.add_movie("HEAT", 1995, 8.3, None, self.alice)
+        bob = self.add_user("bob")
+        storage.add_movie("heat", 1995, 8.3, None, bob)
+        self.assertEqual(list(storage.list_movies(bob)), ["heat"])
+
+    def test_update_and_delete_match_the_title_ignoring_case(self) -> None:
+        storage.update_movie("heat", self.alice, note="Pacino")
+        self.assertEqual(storage.list_movies(self.alice)["Heat"]["note"], "Pacino")
+        storage.delete_movie("HEAT", self.alice)
+        self.assertEqual(storage.list_movies(self.alice), {})
+
+
+
+class QueryMoviesTests(StorageTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.alice = self.add_user("alice")
+        # je vier Filme pro Jahr und Rating: viele gleiche Sortierschlüssel
+        storage.add_movies_bulk(
+            self.alice,
+            [
+                {"title": f"Movie {n:02d}", "year": 1990 + n % 3, "rating": 5.0 + n % 4}
+                for n in range(12)
+            ],
+        )
+        # anderer User mit gleichen Schlüsseln darf nicht durchrutschen
+        storage.add_movies_bulk(
+            self.add_user("bob"), [{"title": "Movie 00", "year": 1990, "rating": 5.0}]
+        )
+
+    def expected(self, order_by: str, descending: bool = False) -> list:
+        movies = storage.list_movies(self.alice)
+        key = (lambda t: t.lower()) if order_by == "title" else (
+            lambda t: (movies[t][order_by], t.lower())
+        )
+        return sorted(movies, key=key, reverse=descending)
+
+    def test_cursor_continues_across_equal_sort_keys(self) -> None:
+        for order_by in ("title", "year", "rating"):
+            for descending in (False, True):
+                seen, after = [], None
+                while True:
+                    page = storage.query_movies(
+                        self.alice, order_by=order_by, descending=descending,
+                        limit=5, after=after,
+                    )
+                    seen.extend(page)
+                    if len(page) < 5:
+                        break
+                    title = list(page)[-1]
+                    after = storage.movie_cursor(title, page[title], order_by)
+                self.assertEqual(seen, self.expected(order_by, descending), (order_by, descending))
+
+    def test_filters_apply_to_every_page(self) -> None:
+        titles = [
+            title
+            for title, _ in storage.iter_movies(
+                self.alice, page_size=2, order_by="rating", min_rating=6.0,
+                year_range=(1991, None),
+            )
+        ]
+        movies = storage.list_movies(self.alice)
+        self.assertEqual(
+            titles,
+            [
+                t for t in self.expected("rating")
+                if movies[t]["rating"] >= 6.0 and movies[t]["year"] >= 1991
+            ],
+        )
+
+    def test_iter_movies_yields_every_movie_once(self) -> None:
+        for page_size in (1, 4, 12, 50):
+            titles = [t for t, _ in storage.iter_movies(self.alice, page_size=page_size)]
+            self.assertEqual(titles, self.expected("title"), page_size)
+        self.assertEqual(list(storage.iter_movies(self.add_user("carol"))), [])
+
+    def test_iter_movie_rows_matches_iter_movies(self) -> None:
+        for order_by in ("title", "year", "rating"):
+            rows = list(
+                storage.iter_movie_rows(
+                    self.alice, page_size=5, order_by=order_by, descending=True
+                )
+            )
+            self.assertEqual(
+                [(r.title, storage._movie_props(r)) for r in rows],
+                list(
+                    storage.iter_movies(self.alice, order_by=order_by, descending=True)
+                ),
+                order_by,
+            )
+        row = next(storage.iter_movie_rows(self.alice))
+        self.assertEqual(
+            (row.title, row.year, row.rating, row.poster_url, row.note, row.imdb_id),
+            ("Movie 00", 1990, 5.0, None, None, None),
+        )
+
+    def test_pages_are_read_from_the_sort_index(self) -> None:
+        def pages() -> None:
+            for order_by in ("title", "year", "rating"):
+                # erste Seite: ohne Zwang nähme SQLite den Jahres-Index
+                storage.query_movies(
+                    self.alice, order_by=order_by, year_range=(1990, 1991), limit=2
+                )
+                storage.query_movies(
+                    self.alice, order_by=order_by, descending=True, min_rating=6.0,
+                    year_range=(1990, 1991), limit=2,
+                    after=storage.movie_cursor("Movie 05", {"year": 1992, "rating": 6.0}, order_by),
+                )
+
+        plans = self.query_plans(pages)
+        self.assertEqual(len(plans), 6)
+        for plan in plans:
+            # Sortierschlüssel liegen in user_movies, titles nur per Primärschlüssel
+            self.assertIn("SEARCH um USING INDEX", plan)
+            self.assertIn("SEARCH t USING INTEGER PRIMARY KEY", plan)
+            self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_unknown_sort_column(self) -> None:
+        with self.assertRaises(ValueError):
+            storage.query_movies(self.alice, order_by="note")
+
+
+class MovieStatsTests(StorageTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.alice = self.add_user("alice")
+
+    def add(self, *ratings: float) -> None:
+        storage.add_movies_bulk(
+            self.alice,
+            [
+                {"title": f"Movie {n}", "year": 2000, "rating": rating}
+                for n, rating in enumerate(ratings)
+            ],
+        )
+
+    def test_odd_count_median_is_the_middle_rating(self) -> None:
+        self.add(9.0, 2.0, 7.0, 4.0, 8.0)
+        stats = storage.movie_stats(self.alice)
+        self.assertEqual(stats["count"], 5)
+        self.assertEqual(stats["median"], 7.0)
+        self.assertAlmostEqual(stats["avg"], 6.0)
+        self.assertEqual((stats["min"], stats["max"]), (2.0, 9.0))
+
+    def test_even_count_median_averages_the_middle_ratings(self) -> None:
+        self.add(9.0, 2.0, 7.0, 4.0)
+        self.assertEqual(storage.movie_stats(self.alice)["median"], 5.5)
+
+    def test_best_and_worst_list_every_tied_title(self) -> None:
+        self.add(9.0, 2.0, 9.0, 2.0, 5.0)
+        stats = storage.movie_stats(self.alice)
+        self.assertEqual(stats["best"], ["Movie 0", "Movie 2"])
+        self.assertEqual(stats["worst"], ["Movie 1", "Movie 3"])
+
+    def test_empty_collection(self) -> None:
+        storage.add_movies_bulk(
+            self.add_user("bob"), [{"title": "Heat", "year": 1995, "rating": 8.3}]
+        )
+        self.assertIsNone(storage.movie_stats(self.alice))
+
+    def test_stats_are_read_from_the_rating_index(self) -> None:
+        self.add(9.0, 2.0, 7.0, 4.0)
+        plans = self.query_plans(lambda: storage.movie_stats(self.alice))
+        self.assertEqual(len(plans), 4)
+        for plan in plans:
+            self.assertIn("USING COVERING INDEX ix_user_movies_rating", plan)
+            self.assertNotIn("TEMP B-TREE", plan)
+
+
+class RandomMovieTests(StorageTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.alice = self.add_user("alice")
+        random.seed(9)
+
+    def add(self, **ratings: float) -> None:
+        storage.add_movies_bulk(
+            self.alice,
+            [{"title": t, "year": 2000, "rating": r} for t, r in ratings.items()],
+        )
+
+    def draw(self, times: int, **kwargs) -> Counter:
+        return Counter(
+            title for _ in range(times) for title in storage.random_movie(self.alice, **kwargs)
+        )
+
+    def test_uniform_picks_are_evenly_spread(self) -> None:
+        self.add(A=1.0, B=9.0, C=5.0, D=2.0)
+        storage.delete_movie("B", self.alice)  # Lücke in seq wird geschlossen
+        counts = self.draw(3000)
+        self.assertEqual(set(counts), {"A", "C", "D"})
+        for title in counts:
+            self.assertAlmostEqual(counts[title] / 3000, 1 / 3, delta=0.04)
+
+    def test_weighted_picks_follow_the_rating(self) -> None:
+        self.add(A=1.0, B=3.0, C=0.0)
+        counts = self.draw(4000, weighted_by="rating")
+        self.assertNotIn("C", counts)
+        self.assertAlmostEqual(counts["B"] / 4000, 0.75, delta=0.04)
+
+    def test_picks_are_distinct(self) -> None:
+        self.add(A=1.0, B=3.0, C=8.0)
+        for weighted_by in (None, "rating"):
+            picked = storage.random_movie(self.alice, n=5, weighted_by=weighted_by)
+            self.assertCountEqual(picked, ["A", "B", "C"])
+            picked = storage.random_movie(self.alice, n=2, weighted_by=weighted_by)
+            self.assertEqual(len(picked), 2)
+
+    def test_skewed_weights_still_yield_distinct_picks(self) -> None:
+        self.add(A=10.0, B=0.001, C=0.001)
+        picked = storage.random_movie(self.alice, n=3, weighted_by="rating")
+        self.assertCountEqual(picked, ["A", "B", "C"])
+
+    def test_empty_collection(self) -> None:
+        self.assertEqual(storage.random_movie(self.alice), {})
+        self.assertEqual(storage.random_movie(self.alice, weighted_by="rating"), {})
+        self.add(A=0.0)
+        self.assertEqual(storage.random_movie(self.alice, weighted_by="rating"), {})
+        with self.assertRaises(ValueError):
+            storage.random_movie(self.alice, weighted_by="year")
+
+    def test_alias_table_is_rebuilt_only_after_changes(self) -> None:
+        self.add(A=1.0, B=3.0)
+        with mock.patch.object(storage, "_AliasTable", wraps=storage._AliasTable) as build:
+            self.draw(5, weighted_by="rating")
+            self.assertEqual(build.call_count, 1)
+            storage.update_movie("A", self.alice, note="seen")  # Gewicht unverändert
+            self.draw(5, weighted_by="rating")
+            self.assertEqual(build.call_count, 1)
+            storage.update_movie("A", self.alice, rating=0.0)
+            self.assertEqual(self.draw(20, weighted_by="rating"), Counter(B=20))
+            self.assertEqual(build.call_count, 2)
+
+    def test_uniform_pick_is_an_index_seek(self) -> None:
+        self.add(A=1.0, B=3.0)
+        plans = self.query_plans(lambda: storage.random_movie(self.alice))
+        self.assertEqual(len(plans), 2)
+        for plan in plans:
+            self.assertRegex(plan, r"SEARCH (user_movies|um) USING (COVERING )?INDEX ux_user_movies_seq")
+
+
+class SearchMoviesTests(StorageTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.alice, self.bob = self.add_user("alice"), self.add_user("bob")
+        storage.add_movie("Heat", 1995, 8.3, None, self.alice)
+        storage.update_movie("Heat", self.alice, note="the thing about heists")
+        storage.add_movie("The Thing", 1982, 8.2, None, self.alice)
+        storage.add_movie("Thing", 2011, 6.2, None, self.bob)
+
+    def test_title_hits_come_before_note_hits(self) -> None:
+        self.assertEqual(list(storage.search_movies(self.alice, "thin")), ["The Thing", "Heat"])
+
+    def test_every_word_must_match_as_a_prefix(self) -> None:
+        self.assertEqual(list(storage.search_movies(self.alice, "the heis")), ["Heat"])
+        self.assertEqual(storage.search_movies(self.alice, "hing"), {})
+        self.assertEqual(storage.search_movies(self.alice, " ?! "), {})
+
+    def test_only_own_movies_are_found(self) -> None:
+        self.assertEqual(list(storage.search_movies(self.bob, "thing")), ["Thing"])
+        storage.delete_movie("The Thing", self.alice)
+        self.assertEqual(list(storage.search_movies(self.alice, "thing")), ["Heat"])
+
+    def test_updated_notes_are_reindexed(self) -> None:
+        storage.update_movie("Heat", self.alice, note="Pacino and De Niro")
+        self.assertEqual(list(storage.search_movies(self.alice, "thing")), ["The Thing"])
+        self.assertEqual(list(storage.search_movies(self.alice, "pacino")), ["Heat"])
+
+    def test_match_reads_only_the_users_rowid_range(self) -> None:
+        plans = self.query_plans(lambda: storage.search_movies(self.alice, "thing"))
+        fts_plans = [p for p in plans if "movies_fts" in p]
+        self.assertEqual(len(fts_plans), 1)
+        # idxStr von FTS5: M = MATCH, > / < = rowid-Grenzen an den Index
+        # übergeben (Haupt- und Titelabfrage)
+        scans = re.findall(r"SCAN movies_fts VIRTUAL TABLE INDEX \d+:M\d*><", fts_plans[0])
+        self.assertEqual(len(scans), 2)
+
+
+class SuggestTitlesTests(StorageTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.alice, self.bob = self.add_user("alice"), self.add_user("bob")
+        for title in ("Aliens", "Alien", "Up", "The Matrix", "Heat"):
+            storage.add_movie(title, 2000, 7.0, None, self.alice)
+        storage.add_movies_bulk(self.bob, [{"title": "Alien Nation", "year": 1988, "rating": 6.0}])
+
+    def test_typos_suggest_close_titles_best_first(self) -> None:
+        self.assertEqual(list(storage.suggest_titles(self.alice, "alein"))[:2], ["Alien", "Aliens"])
+        self.assertIn("The Matrix", storage.suggest_titles(self.alice, "teh matirx"))
+
+    def test_short_keywords_still_get_grams(self) -> None:
+        self.assertEqual(list(storage.suggest_titles(self.alice, "uo")), ["Up"])
+
+    def test_only_own_titles_are_suggested(self) -> None:
+        self.assertEqual(list(storage.suggest_titles(self.bob, "alien")), ["Alien Nation"])
+        self.assertEqual(storage.suggest_titles(self.bob, "matrix"), {})
+
+    def test_deleted_movies_are_not_suggested(self) -> None:
+        storage.delete_movie("Heat", self.alice)
+        self.assertEqual(storage.suggest_titles(self.alice, "heta"), {})
+        storage.add_movie("Heat", 1995, 8.3, None, self.alice)
+        self.assertEqual(list(storage.suggest_titles(self.alice, "heta")), ["Heat"])
+
+    def test_common_grams_are_skipped_beyond_the_budget(self) -> None:
+        storage.add_movies_bulk(
+            self.alice,
+            ({"title": f"The Film {n}", "year": 2000, "rating": 5.0} for n in range(50)),
+        )
+        with mock.patch.object(storage, "SUGGEST_POSTINGS_BUDGET", 10):
+            # " th", "the" ... stehen in 51 Titeln: nur die seltenen zählen
+            self.assertEqual(list(storage.suggest_titles(self.alice, "the matirx"))[:1], ["The Matrix"])
+
+
+class BulkAddTests(StorageTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.alice = self.add_user("alice")
+        storage.add_movie("Heat", 1995, 8.3, None, self.alice)
+
+    def test_statuses_are_reported_in_input_order(self) -> None:
+        results = storage.add_movies_bulk(
+            self.alice,
+            [
+                {"title": "Alien", "year": 1979, "rating": 8.5},
+                {"title": "HEAT", "year": 1995, "rating": 8.3},  # schon gespeichert
+                {"title": "alien", "year": 1979, "rating": 8.5},  # im Batch doppelt
+                {"title": "  ", "year": 2000, "rating": 5.0},
+                {"title": "Brazil", "year": "unknown", "rating": 8.0},
+                {"title": "Ran", "rating": 8.2},
+                {"title": " Solaris ", "year": "1972", "rating": "8.1", "imdb_id": "tt0069293"},
+            ],
+        )
+        self.assertEqual(
+            results,
+            [
+                ("Alien", "inserted"),
+                ("HEAT", "duplicate"),
+                ("alien", "duplicate"),
+                ("  ", "invalid"),
+                ("Brazil", "invalid"),
+                ("Ran", "invalid"),
+                ("Solaris", "inserted"),
+            ],
+        )
+        movies = storage.list_movies(self.alice)
+        self.assertCountEqual(movies, ["Heat", "Alien", "Solaris"])
+        self.assertEqual(movies["Solaris"]["year"], 1972)
+        self.assertEqual(movies["Solaris"]["imdb_id"], "tt0069293")
+
+    def test_duplicates_across_chunks(self) -> None:
+        records = ({"title": f"Movie {n % 5}", "year": 2000, "rating": 7.0} for n in range(12))
+        results = storage.add_movies_bulk(self.alice, records, chunk_size=3)
+        self.assertEqual([status for _, status in results].count("inserted"), 5)
+        self.assertEqual(len(storage.list_movies(self.alice)), 6)
+
+    def test_invalid_chunk_size(self) -> None:
+        with self.assertRaises(ValueError):
+            storage.add_movies_bulk(self.alice, [], chunk_size=0)
+
+
+class TitleCatalogTests(StorageTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.alice, self.bob = self.add_user("alice"), self.add_user("bob")
+        for uid in (self.alice, self.bob):
+            storage.add_movie("Heat", 1995, 8.3, "http://img/heat.jpg", uid, "tt0113277")
+
+    def catalog(self) -> list:
+        with storage.get_engine().connect() as connection:
+            return connection.exec_driver_sql(
+                "SELECT imdb_id, title, year, rating FROM titles ORDER BY id"
+            ).fetchall()
+
+    def test_users_share_one_catalog_row(self) -> None:
+        self.assertEqual(self.catalog(), [("tt0113277", "Heat", 1995, 8.3)])
+        storage.delete_movie("Heat", self.alice)
+        self.assertEqual(len(self.catalog()), 1)
+        storage.delete_movie("Heat", self.bob)
+        self.assertEqual(self.catalog(), [])
+
+    def test_catalog_updates_reach_every_users_sort_keys(self) -> None:
+        storage.add_movie("Alien", 1979, 8.5, None, self.bob, "tt0078748")
+        storage.update_movie("Heat", self.alice, rating=6.0)
+        with storage.get_engine().begin() as connection:
+            connection.exec_driver_sql(
+                "UPDATE titles SET year = 1996, rating = 9.0 WHERE imdb_id = 'tt0113277'"
+            )
+        bob = storage.query_movies(self.bob, order_by="rating", descending=True)
+        self.assertEqual(list(bob), ["Heat", "Alien"])
+        self.assertEqual((bob["Heat"]["year"], bob["Heat"]["rating"]), (1996, 9.0))
+        # die eigene Bewertung bleibt
+        alice = storage.query_movies(self.alice, year_range=(1996, 1996))
+        self.assertEqual((alice["Heat"]["rating"], alice["Heat"]["personal_rating"]), (6.0, 6.0))
+        self.assertEqual(storage.movie_stats(self.bob)["median"], 8.75)
+
+    def test_bulk_writes_the_catalog_with_one_executemany(self) -> None:
+        records = [
+            {"title": f"Movie {n}", "year": 2000, "rating": 7.0, "imdb_id": f"tt{n:07d}"}
+            for n in range(20)
+        ]
+        for record in records[::2]:
+            record["imdb_id"] = None
+        records.append({"title": "Heat 2", "year": 1995, "rating": 8.3, "imdb_id": "tt0113277"})
+
+        statements = []
+        engine = storage.get_engine()
+        listener = lambda conn, cur, stmt, params, ctx, many: statements.append(  # noqa: E731
+            (stmt, many)
+        )
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            results = storage.add_movies_bulk(self.alice, records)
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+
+        self.assertEqual(results[-1], ("Heat", "duplicate"))
+        inserts = [many for stmt, many in statements if "INSERT INTO titles" in stmt]
+        self.assertEqual(inserts, [True])
+        movies = storage.list_movies(self.alice)
+        self.assertEqual(len(movies), 21)
+        self.assertEqual(movies["Movie 3"]["imdb_id"], "tt0000003")
+        self.assertIsNone(movies["Movie 4"]["imdb_id"])
+
+    def test_reserved_ids_are_not_reused(self) -> None:
+        def last_id() -> int:
+            with storage.get_engine().connect() as connection:
+                return connection.exec_driver_sql("SELECT MAX(id) FROM titles").scalar()
+
+        storage.add_movie("Alien", 1979, 8.5, None, self.alice)
+        deleted = last_id()
+        storage.delete_movie("Alien", self.alice)
+        storage.add_movie("Alien", 1979, 8.5, None, self.alice)
+        self.assertGreater(last_id(), deleted)
+
+
+class UpdateMovieTests(StorageTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.alice, self.bob = self.add_user("alice"), self.add_user("bob")
+        for uid in (self.alice, self.bob):
+            storage.add_movie("Heat", 1995, 8.3, "http://img/heat.jpg", uid, "tt0113277")
+
+    def test_rating_is_personal(self) -> None:
+        storage.update_movie("Heat", self.alice, rating=9.5)
+        self.assertEqual(storage.list_movies(self.alice)["Heat"]["rating"], 9.5)
+        self.assertEqual(storage.list_movies(self.bob)["Heat"]["rating"], 8.3)
+
+    def test_catalog_fields_are_copied_on_write(self) -> None:
+        storage.update_movie("Heat", self.alice, year=1996, poster_url="http://img/mine.jpg")
+        alice_heat = storage.list_movies(self.alice)["Heat"]
+        bob_heat = storage.list_movies(self.bob)["Heat"]
+        self.assertEqual(alice_heat["year"], 1996)
+        self.assertEqual(alice_heat["poster_url"], "http://img/mine.jpg")
+        # die private Kopie behält den IMDb-Link
+        self.assertEqual(alice_heat["imdb_id"], "tt0113277")
+        self.assertEqual(bob_heat["year"], 1995)
+        self.assertEqual(bob_heat["poster_url"], "http://img/heat.jpg")
+        self.assertEqual(storage.query_movies(self.alice, year_range=(1996, None)).keys(), {"Heat"})
+
+    def test_imdb_id_of_another_title_is_rejected(self) -> None:
+        storage.add_movie("Alien", 1979, 8.5, None, self.alice, "tt0078748")
+        with self.assertRaises(ValueError):
+            storage.update_movie("Heat", self.alice, imdb_id="tt0078748")
+
+    def test_missing_movie(self) -> None:
+        with self.assertRaises(KeyError):
+            storage.update_movie("Alien", self.alice, note="x")
+        with self.assertRaises(KeyError):
+            storage.update_movie("Alien", self.alice, year=1979)
+
+
+class CatalogTitleTests(StorageTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.alice, self.bob = self.add_user("alice"), self.add_user("bob")
+        storage.add_movie("Alien", 1979, 8.5, None, self.alice, "tt0078748")
+        storage.add_movie("alien", 1979, 7.0, None, self.bob)
+
+    def test_add_movie_returns_the_catalog_title(self) -> None:
+        title = storage.add_movie("Heat (Der Film)", 1995, 8.3, None, self.bob, "tt0113277")
+        self.assertEqual(title, "Heat (Der Film)")
+        title = storage.add_movie("Heat", 1995, 8.3, None, self.alice, "tt0113277")
+        self.assertEqual(title, "Heat (Der Film)")
+        self.assertIn("Heat (Der Film)", storage.list_movies(self.alice))
+
+    def test_add_movie_checks_the_catalog_title(self) -> None:
+        with self.assertRaises(ValueError):
+            storage.add_movie("Alien DC", 1979, 8.5, None, self.bob, "tt0078748")
+        with self.assertRaises(ValueError):
+            storage.add_movie("Alien DC", 1979, 8.5, None, self.alice, "tt0078748")
+
+    def test_bulk_reports_a_catalog_title_collision_as_duplicate(self) -> None:
+        results = storage.add_movies_bulk(
+            self.bob,
+            [
+                {"title": "Alien DC", "year": 1979, "rating": 8.5, "imdb_id": "tt0078748"},
+                {"title": "Heat", "year": 1995, "rating": 8.3},
+            ],
+        )
+        self.assertEqual(results, [("Alien", "duplicate"), ("Heat", "inserted")])
+        self.assertCountEqual(storage.list_movies(self.bob), ["alien", "Heat"])
+
+
+class OmdbCacheTests(StorageTestCase):
+    HEAT = {"Title": "Heat", "Year": "1995", "imdbID": "tt0113277"}
+
+    def test_entries_are_stored_under_every_key(self) -> None:
+        with mock.patch.object(storage.time, "time", return_value=100.0):
+            storage.omdb_cache_put(["t:heat", "i:tt0113277"], self.HEAT)
+        self.assertEqual(storage.omdb_cache_get("t:heat"), (self.HEAT, None, 100.0))
+        self.assertEqual(storage.omdb_cache_get("i:tt0113277")[0], self.HEAT)
+        self.assertIsNone(storage.omdb_cache_get("t:heat 2"))
+
+    def test_negative_entries_keep_the_error_until_overwritten(self) -> None:
+        storage.omdb_cache_put(["t:heat"], None, error="Movie not found!")
+        payload, error, _ = storage.omdb_cache_get("t:heat")
+        self.assertIsNone(payload)
+        self.assertEqual(error, "Movie not found!")
+        storage.omdb_cache_put(["t:heat"], self.HEAT)
+        self.assertEqual(storage.omdb_cache_get("t:heat")[:2], (self.HEAT, None))
+
+    def test_least_recently_used_entries_are_evicted(self) -> None:
+        for now, key in enumerate(("t:a", "t:b", "t:c")):
+            with mock.patch.object(storage.time, "time", return_value=float(now)):
+                storage.omdb_cache_put([key], self.HEAT, max_entries=3)
+        with mock.patch.object(storage.time, "time", return_value=10.0):
+            storage.omdb_cache_get("t:a")  # zuletzt benutzt: bleibt
+        with mock.patch.object(storage.time, "time", return_value=11.0):
+            storage.omdb_cache_put(["t:d"], self.HEAT, max_entries=3)
+        self.assertIsNone(storage.omdb_cache_get("t:b"))
+        for key in ("t:a", "t:c", "t:d"):
+            self.assertIsNotNone(storage.omdb_cache_get(key), key)
+
+
+class QueryMetricsTests(StorageTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.alice = self.add_user("alice")
+        storage.add_movies_bulk(
+            self.alice, [{"title": f"Movie {n}", "year": 2000, "rating": 7.0} for n in range(12)]
+        )
+        storage.query_metrics.reset()
+        storage.enable_query_metrics()
+        self.addCleanup(storage.disable_query_metrics)
+        self.addCleanup(storage.query_metrics.reset)
+
+    def test_selects_report_fetched_rows(self) -> None:
+        storage.list_movies(self.alice)
+        storage.update_movie("Movie 3", self.alice, note="seen")
+        metrics = storage.query_metrics.to_dict()
+        self.assertEqual(metrics["list_movies"]["rows"], 12)
+        self.assertEqual(metrics["update_movie"]["rows"], 1)
+
+    def test_statements_are_attributed_to_the_public_function(self) -> None:
+        engine = storage.init_storage(f"sqlite:///{self.tmp}/other.db")
+        self.addCleanup(engine.dispose)
+        # migrate und die _migrate_*-Schritte zählen zum äußeren Aufruf
+        self.assertEqual(list(storage.query_metrics.to_dict()), ["init_storage"])
+
+    def test_failed_statement_leaves_no_start_time_behind(self) -> None:
+        with storage.get_engine().connect() as connection:
+            with self.assertRaises(Exception):
+                connection.execute(storage.text("SELECT * FROM no_such_table"))
+            self.assertEqual(connection.info.get("query_start"), [])
+
+    def test_unknown_row_counts_are_left_out(self) -> None:
+        with storage.get_engine().connect() as connection:
+            connection.exec_driver_sql("CREATE TEMP TABLE scratch (id INTEGER)")
+        text = storage.dump_query_metrics("prometheus")
+        self.assertIn('movies_db_query_ms_count{call_site="<external>"} 1', text)
+        self.assertNotIn("rows_total", text)
+
+    def test_disabled_metrics_record_nothing(self) -> None:
+        storage.disable_query_metrics()
+        storage.list_movies(self.alice)
+        self.assertEqual(storage.query_metrics.to_dict(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+templating: placeholder splitting, render()/stream() output and the
+mtime-keyed template cache.
+"""
+
+import io
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from templating import CompiledTemplate, TemplateError, load_template  # noqa: E402
+
+
+class CompiledTemplateTests(unittest.TestCase):
+    def test_render_keeps_braces_in_literals(self) -> None:
+        template = CompiledTemplate("<style>a { color: red; }</style><h1>__TITLE__</h1>{x}")
+        self.assertEqual(template.names, ("TITLE",))
+        self.assertEqual(
+            template.render({"TITLE": "Movies"}),
+            "<style>a { color: red; }</style><h1>Movies</h1>{x}",
+        )
+
+    def test_values_are_inserted_verbatim(self) -> None:
+        # Ein Durchgang: Werte werden weder escaped noch erneut ersetzt
+        template = CompiledTemplate("__A__|__B__")
+        self.assertEqual(template.render({"A": "__B__ {0}", "B": "<b>"}), "__B__ {0}|<b>")
+        out = io.StringIO()
+        template.stream(out.write, {"A": "__B__", "B": "<b>"})
+        self.assertEqual(out.getvalue(), "__B__|<b>")
+
+    def test_render_requires_every_value(self) -> None:
+        with self.assertRaisesRegex(TemplateError, "'YEAR'"):
+            CompiledTemplate("__TITLE__ (__YEAR__)").render({"TITLE": "Heat"})
+
+    def test_stream_writes_chunks_and_keeps_unknown_placeholders(self) -> None:
+        template = CompiledTemplate("<ul>__GRID__</ul>__FOOTER__ __lower__")
+        out = io.StringIO()
+        template.stream(out.write, {"GRID": (f"<li>{i}</li>" for i in range(3))})
+        self.assertEqual(
+            out.getvalue(), "<ul><li>0</li><li>1</li><li>2</li></ul>__FOOTER__ __lower__"
+        )
+
+
+class LoadTemplateTests(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / "index_template.html"
+        self.path.write_text("<h1>__TITLE__</h1>", encoding="utf-8")
+
+    def test_unchanged_file_is_compiled_once(self) -> None:
+        self.assertIs(load_template(self.path), load_template(self.path))
+
+    def test_changed_file_is_compiled_again(self) -> None:
+        first = load_template(self.path)
+        stat = self.path.stat()
+        # Gleiche Größe, nur die mtime ändert sich
+        self.path.write_text("<h2>__TITLE__</h2>", encoding="utf-8")
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        second = load_template(self.path)
+        self.assertIsNot(second, first)
+        self.assertEqual(second.render({"TITLE": "x"}), "<h2>x</h2>")
+
+
+if __name__ == "__main__":
+    unittest.main()
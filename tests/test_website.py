@@ -0,0 +1,329 @@
+"""
+website.py: incremental per-user pages, and rendering all users on the
+process pool.
+"""
+
+import io
+import json
+import shutil
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Optional
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import movie_storage_sql as storage  # noqa: E402
+import website  # noqa: E402
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+
+class WebsiteTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.project = Path(tmp.name)
+        shutil.copytree(REPO_DIR / website.STATIC_DIR_NAME, self.project / website.STATIC_DIR_NAME)
+        engine = storage.init_storage(f"sqlite:///{self.project}/movies.db")
+        self.addCleanup(engine.dispose)
+
+    def add_user(self, name: str, *titles: str) -> int:
+        user_id = storage.get_or_create_user(name)[0]
+        storage.add_movies_bulk(
+            user_id, ({"title": t, "year": 2000, "rating": 7.0} for t in titles)
+        )
+        return user_id
+
+    def pages(self, name: str) -> dict:
+        """page file name -> (mtime, text) for the user's pages."""
+        return {
+            path.name: (path.stat().st_mtime_ns, path.read_text(encoding="utf-8"))
+            for path in (self.project / name).glob("page-*.html")
+        }
+
+
+class RenderUserSiteTests(WebsiteTestCase):
+    def render(self, user_id: int, name: str, **kwargs) -> website.RenderResult:
+        return website.render_user_site(
+            user_id, name, self.project, download_posters=False, **kwargs
+        )
+
+    def test_unchanged_inputs_keep_every_file(self) -> None:
+        user_id = self.add_user("alice", "Heat", "Alien")
+        first = self.render(user_id, "alice")
+        self.assertTrue(first.written)
+        self.assertEqual((first.movies, first.pages, first.pages_written), (2, 1, 1))
+        [(_mtime, page)] = self.pages("alice").values()
+        self.assertIn("Heat", page)
+        self.assertIn('<base href="../" />', page)
+        files = sorted(self.project.rglob("*.html")) + [self.project / "alice.html.hash"]
+        mtimes = [f.stat().st_mtime_ns for f in files]
+
+        second = self.render(user_id, "alice")
+        self.assertFalse(second.written)
+        self.assertEqual(second.pages_written, 0)
+        self.assertEqual([f.stat().st_mtime_ns for f in files], mtimes)
+
+    def test_changed_note_rebuilds_the_page(self) -> None:
+        user_id = self.add_user("alice", "Heat")
+        self.render(user_id, "alice")
+        storage.update_movie("Heat", user_id, note="<b>with De Niro</b>")
+        result = self.render(user_id, "alice")
+        self.assertEqual(result.pages_written, 1)
+        [(_mtime, page)] = self.pages("alice").values()
+        self.assertIn("&lt;b&gt;with De Niro&lt;/b&gt;", page)
+
+    def test_grid_is_written_in_chunks(self) -> None:
+        titles = [f"Movie {n}" for n in range(5)]
+        user_id = self.add_user("alice", *titles)
+        with mock.patch.object(website, "GRID_CHUNK_ITEMS", 2):
+            chunks = list(website._grid_chunks(storage.iter_movie_rows(user_id), {}))
+            self.render(user_id, "alice")
+        self.assertEqual(len(chunks), 3)
+        items = [
+            website.movie_item_html(title, props, {})
+            for title, props in storage.iter_movies(user_id)
+        ]
+        self.assertEqual("".join(chunks), "\n".join(items))
+        [(_mtime, page)] = self.pages("alice").values()
+        self.assertIn("\n".join(items), page)
+
+    def test_missing_template_raises_site_error(self) -> None:
+        user_id = self.add_user("alice", "Heat")
+        (self.project / website.STATIC_DIR_NAME / website.TEMPLATE_NAME).unlink()
+        with self.assertRaises(website.SiteError):
+            self.render(user_id, "alice")
+
+
+class PaginationTests(WebsiteTestCase):
+    PAGE_SIZE = 10
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.alice = self.add_user("alice", *(f"Movie {n:03d}" for n in range(300)))
+
+    def render_alice(self, project: Optional[Path] = None) -> website.RenderResult:
+        return website.render_user_site(
+            self.alice, "alice", project or self.project,
+            download_posters=False, page_size=self.PAGE_SIZE,
+        )
+
+    def manifest(self, project: Optional[Path] = None) -> dict:
+        path = (project or self.project) / "alice" / website.MANIFEST_NAME
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def test_pages_cover_every_movie_in_order(self) -> None:
+        result = self.render_alice()
+        pages = self.manifest()["pages"]
+        self.assertEqual(result.pages, len(pages))
+        self.assertEqual(sum(p["count"] for p in pages), 300)
+        self.assertTrue(all(p["count"] <= 4 * self.PAGE_SIZE for p in pages))
+        self.assertEqual(pages[0]["first"], "Movie 000")
+        self.assertEqual(pages[-1]["last"], "Movie 299")
+        files = [p["file"] for p in pages]
+        self.assertEqual(sorted(self.pages("alice")), sorted(files))
+        for prev, page, following in zip([None] + files, files, files[1:] + [None]):
+            text = self.pages("alice")[page][1]
+            if prev:
+                self.assertIn(f'class="prev" href="alice/{prev}"', text)
+            if following:
+                self.assertIn(f'class="next" href="alice/{following}"', text)
+        index = result.output.read_text(encoding="utf-8")
+        self.assertTrue(all(f'href="alice/{f}"' in index for f in files))
+
+    def test_inserts_and_deletes_rewrite_about_one_page(self) -> None:
+        self.render_alice()
+        written = []
+        for n in range(0, 300, 15):
+            with redirect_stdout(io.StringIO()):
+                storage.add_movie(f"Movie {n:03d}b", 2001, 6.0, None, self.alice)
+            written.append(self.render_alice().pages_written)
+            with redirect_stdout(io.StringIO()):
+                storage.delete_movie(f"Movie {n + 7:03d}", self.alice)
+            written.append(self.render_alice().pages_written)
+        # 1 = nur die betroffene Seite; 3 = eine neue Grenze teilt sie und
+        # der Nachfolger verlinkt auf die neue Hälfte
+        self.assertTrue(all(1 <= w <= 3 for w in written), written)
+        self.assertGreater(written.count(1), len(written) // 2, written)
+        self.assertEqual(
+            sorted(self.pages("alice")), sorted(p["file"] for p in self.manifest()["pages"])
+        )
+
+    def test_emptied_collection_removes_every_page(self) -> None:
+        self.render_alice()
+        with redirect_stdout(io.StringIO()):
+            for n in range(300):
+                storage.delete_movie(f"Movie {n:03d}", self.alice)
+        result = self.render_alice()
+        self.assertEqual((result.pages, result.movies), (0, 0))
+        self.assertEqual(self.pages("alice"), {})
+        self.assertIn(website.EMPTY_GRID_HTML, result.output.read_text(encoding="utf-8"))
+
+    def test_hashes_are_idempotent(self) -> None:
+        self.render_alice()
+        manifest_bytes = (self.project / "alice" / website.MANIFEST_NAME).read_bytes()
+        again = self.render_alice()
+        self.assertEqual((again.written, again.pages_written), (False, 0))
+        self.assertEqual(
+            (self.project / "alice" / website.MANIFEST_NAME).read_bytes(), manifest_bytes
+        )
+
+        # Gleiche Eingaben in einem anderen Verzeichnis: gleiche Namen und Hashes
+        other = self.project / "copy"
+        shutil.copytree(self.project / website.STATIC_DIR_NAME, other / website.STATIC_DIR_NAME)
+        self.render_alice(other)
+        self.assertEqual(self.manifest(other), self.manifest())
+
+        # und in einem Worker-Prozess (eigener Hash-Seed, Standard-Seitengröße):
+        # nichts neu zu schreiben
+        website.render_user_site(self.alice, "alice", self.project, download_posters=False)
+        [result] = website.render_all_sites([(self.alice, "alice")], self.project, workers=1)
+        self.assertIsNone(result.error)
+        self.assertEqual((result.written, result.pages_written), (False, 0))
+
+    def test_changed_page_size_rebuilds_every_page(self) -> None:
+        first = self.render_alice()
+        result = website.render_user_site(
+            self.alice, "alice", self.project, download_posters=False, page_size=20
+        )
+        self.assertEqual(result.pages_written, result.pages)
+        self.assertLess(result.pages, first.pages)
+        self.assertEqual(
+            sorted(self.pages("alice")), sorted(p["file"] for p in self.manifest()["pages"])
+        )
+
+
+class ClientModeTests(WebsiteTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.alice = self.add_user("alice", "Heat", 'Tom & "Jerry"', "Alien")
+
+    def render(self, mode: str) -> website.RenderResult:
+        return website.render_site(
+            self.alice, "alice", self.project, mode=mode, download_posters=False
+        )
+
+    def files(self) -> dict:
+        """Every output file of alice -> mtime."""
+        found = {}
+        for path in [*self.project.glob("alice*"), *self.project.glob("alice/*")]:
+            if path.is_file():
+                found[path.relative_to(self.project).as_posix()] = path.stat().st_mtime_ns
+        return found
+
+    def test_data_file_and_script_hold_the_same_movies(self) -> None:
+        result = self.render("client")
+        self.assertEqual((result.movies, result.pages, result.pages_written), (3, 3, 3))
+        data = json.loads((self.project / "alice.movies.json").read_text(encoding="utf-8"))
+        self.assertEqual(data["fields"], list(storage.JSON_EXPORT_FIELDS))
+        self.assertEqual(
+            data["movies"],
+            [[t, 2000, 7.0, None, None, None] for t in ("Alien", "Heat", 'Tom & "Jerry"')],
+        )
+        script = (self.project / "alice.movies.js").read_text(encoding="utf-8")
+        prefix = f"window.{website.DATA_GLOBAL} = "
+        self.assertTrue(script.startswith(prefix))
+        self.assertEqual(json.loads(script[len(prefix):].rstrip().rstrip(";")), data)
+        shell = result.output.read_text(encoding="utf-8")
+        self.assertIn('<script src="alice.movies.js"></script>', shell)
+        self.assertIn(f'<script src="{website.SCRIPT_NAME}"></script>', shell)
+
+    def test_unchanged_data_keeps_every_file(self) -> None:
+        self.render("client")
+        before = self.files()
+        again = self.render("client")
+        self.assertEqual((again.written, again.pages_written), (False, 0))
+        self.assertEqual(self.files(), before)
+
+        storage.update_movie("Heat", self.alice, note="with De Niro")
+        changed = self.render("client")
+        # Shell bleibt, JSON und Skript werden neu geschrieben
+        self.assertEqual(changed.pages_written, 2)
+        self.assertIn(
+            "with De Niro", (self.project / "alice.movies.json").read_text(encoding="utf-8")
+        )
+
+    def test_switching_modes_removes_the_other_modes_files(self) -> None:
+        self.render("pages")
+        self.assertTrue((self.project / "alice" / website.MANIFEST_NAME).exists())
+        (self.project / "alice" / "notes.txt").write_text("mine", encoding="utf-8")
+
+        self.render("client")
+        self.assertEqual(
+            sorted(self.files()),
+            [
+                "alice.html", "alice.html.hash", "alice.movies.js",
+                "alice.movies.json", "alice.movies.json.hash", "alice/notes.txt",
+            ],
+        )
+
+        (self.project / "alice" / "notes.txt").unlink()
+        result = self.render("pages")
+        self.assertEqual(result.pages_written, result.pages)
+        files = sorted(self.files())
+        self.assertEqual(files[:2], ["alice.html", "alice.html.hash"])
+        self.assertEqual(len([f for f in files if f.startswith("alice/page-")]), result.pages)
+        self.assertIn(f"alice/{website.MANIFEST_NAME}", files)
+        page = next(f for f in files if f.startswith("alice/page-"))
+        self.assertIn("Heat", (self.project / page).read_text(encoding="utf-8"))
+
+        self.render("client")
+        self.assertFalse((self.project / "alice").exists())
+
+    def test_unknown_mode(self) -> None:
+        with self.assertRaises(ValueError):
+            self.render("spa")
+
+
+class MovieItemTests(unittest.TestCase):
+    def test_user_values_are_escaped(self) -> None:
+        item = website.movie_item_html(
+            'Tom & "Jerry" <3',
+            {
+                "year": 1940,
+                "rating": 7,
+                "note": '" onmouseover="alert(1)',
+                "imdb_id": 'tt1"><script>',
+                "poster_url": "https://img/x.jpg?a=1&b=2",
+            },
+            {},
+        )
+        self.assertIn('<div class="title">Tom &amp; &quot;Jerry&quot; &lt;3</div>', item)
+        self.assertIn('data-note="&quot; onmouseover=&quot;alert(1)"', item)
+        self.assertIn('href="https://www.imdb.com/title/tt1&quot;&gt;&lt;script&gt;/"', item)
+        self.assertIn('src="https://img/x.jpg?a=1&amp;b=2"', item)
+        self.assertIn('<span class="rating-badge">7.0</span>', item)
+        self.assertNotIn("<script>", item)
+
+    def test_missing_values_have_placeholders(self) -> None:
+        item = website.movie_item_html("Heat", {}, {})
+        self.assertIn('<div class="year">N/A</div>', item)
+        self.assertIn('href="#"', item)
+        self.assertIn('<span class="rating-badge">–</span>', item)
+        self.assertIn('data-note=""', item)
+
+
+class RenderAllSitesTests(WebsiteTestCase):
+    def test_every_user_is_rendered_by_the_pool(self) -> None:
+        users = [
+            (self.add_user("alice", "Heat"), "alice"),
+            (self.add_user("bob", "Alien", "Brazil"), "bob"),
+            (self.add_user("carol"), "carol"),
+        ]
+        results = {
+            r.username: r for r in website.render_all_sites(users, self.project, workers=2)
+        }
+        self.assertEqual(set(results), {"alice", "bob", "carol"})
+        self.assertEqual([results[n].error for n in ("alice", "bob", "carol")], [None] * 3)
+        self.assertEqual(results["bob"].movies, 2)
+        self.assertIn(
+            website.EMPTY_GRID_HTML, (self.project / "carol.html").read_text(encoding="utf-8")
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
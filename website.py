@@ -0,0 +1,792 @@
+from __future__ import annotations
+
+"""
+Static website rendering. Two modes per user:
+  pages  – index page <username>.html plus pages
+           <username>/page-<hash>.html and a JSON manifest
+  client – <username>.movies.json (and the same data as the script
+           <username>.movies.js) plus a shell <username>.html whose script
+           (_static/grid.js) renders a virtualized grid
+
+Movie rows are streamed from storage, posters come from the local mirror
+and pages whose inputs did not change are left alone. Holds no CLI state
+and prints nothing, so it also runs in worker processes; callers report
+the returned RenderResult.
+"""
+
+import hashlib
+import html
+import json
+import multiprocessing
+import os
+import re
+import time
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy.engine import Row
+
+import movie_storage_sql as storage
+from atomic_files import atomic_writer, write_atomic
+from poster_cache import PosterMirror
+from templating import CompiledTemplate, load_template
+
+PAGE_TITLE = "My Movie App"
+SITE_FORMAT_VERSION = 1  # bump when the generated markup changes
+PROJECT_DIR = Path(__file__).parent
+STATIC_DIR_NAME = "_static"
+TEMPLATE_NAME = "index_template.html"
+CSS_NAME = "style.css"
+SCRIPT_NAME = "grid.js"  # client mode only
+# Global that <username>.movies.js assigns; a <script src> loads it from
+# file:// too, where browsers block fetch()
+DATA_GLOBAL = "MOVIE_GRID_DATA"
+
+SITE_MODES = ("pages", "client")
+DEFAULT_SITE_MODE = "pages"
+SITE_MODE_ENV = "MOVIES_SITE_MODE"
+
+# Local poster mirror (content-addressed, shared by all users)
+POSTER_DIR_NAME = "posters"
+POSTER_WORKERS = 8
+POSTER_RETRY_SEC = 24 * 3600  # failed downloads are retried after a day
+
+GRID_CHUNK_ITEMS = 256  # grid items joined per write
+SITE_PAGE_SIZE = 100  # average movies per <username>/page-<hash>.html
+MANIFEST_NAME = "manifest.json"
+
+EMPTY_GRID_HTML = (
+    '<li class="movie empty">No movies yet. Add some and regenerate the site.</li>'
+)
+
+# Grid item: NOTE via data-note, rating badge, poster links to IMDb.
+# <a class="poster"> keeps the tooltip styles and makes it clickable.
+ITEM_TEMPLATE = CompiledTemplate(
+    '<li class="movie">\n'
+    '  <a class="poster" data-note="__NOTE__" href="__IMDB_URL__" '
+    'target="_blank" rel="noopener noreferrer">\n'
+    '    <span class="rating-badge">__RATING__</span>\n'
+    "    __POSTER__\n"
+    "  </a>\n"
+    '  <div class="title">__TITLE__</div>\n'
+    '  <div class="year">__YEAR__</div>\n'
+    "</li>"
+)
+
+# Index page entry: one per page file
+INDEX_ITEM_TEMPLATE = CompiledTemplate(
+    '<li class="movie page-link">\n'
+    '  <a class="page" href="__HREF__">Page __PAGE__</a>\n'
+    '  <div class="title">__FIRST__ – __LAST__</div>\n'
+    '  <div class="year">__COUNT__ movies</div>\n'
+    "</li>"
+)
+
+# url -> (file name in the mirror, {"webp": ..., "jpeg": ...} thumbnails)
+PosterMap = Dict[str, Tuple[str, Dict[str, str]]]
+
+
+class SiteError(Exception):
+    """Template missing or unreadable, or output not writable."""
+
+
+class RenderResult(NamedTuple):
+    username: str
+    output: Path
+    written: bool  # False: inputs unchanged, existing page kept
+    movies: int
+    seconds: float
+    posters_downloaded: int = 0
+    posters_failed: int = 0
+    error: Optional[str] = None
+    pages: int = 0  # client mode: 3 (JSON, data script, shell page)
+    pages_written: int = 0
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Files
+# ──────────────────────────────────────────────────────────────────────────────
+def load_assets(project_dir: Path = PROJECT_DIR) -> Tuple[CompiledTemplate, bytes]:
+    """(compiled page template, stylesheet bytes) from _static/; CSS may be empty."""
+    static_dir = project_dir / STATIC_DIR_NAME
+    template_path = static_dir / TEMPLATE_NAME
+    css_path = static_dir / CSS_NAME
+    if not template_path.exists():
+        raise SiteError(f"Template not found: {template_path}")
+    try:
+        template = load_template(template_path)
+    except OSError as exc:
+        raise SiteError(f"Failed to read template: {exc}") from exc
+    try:
+        css = css_path.read_bytes() if css_path.exists() else b""
+    except OSError as exc:
+        raise SiteError(f"Failed to read {CSS_NAME}: {exc}") from exc
+    return template, css
+
+
+def sync_static(project_dir: Path = PROJECT_DIR) -> int:
+    """
+    Publish style.css and grid.js from _static/ next to the pages, each
+    only when the published copy differs. Returns the number written.
+    """
+    written = 0
+    for name in (CSS_NAME, SCRIPT_NAME):
+        src = project_dir / STATIC_DIR_NAME / name
+        dst = project_dir / name
+        try:
+            if not src.exists():
+                continue
+            data = src.read_bytes()
+            if dst.exists() and dst.read_bytes() == data:
+                continue
+            write_atomic(dst, data)
+        except OSError as exc:
+            raise SiteError(f"Could not copy {name}: {exc}") from exc
+        written += 1
+    return written
+
+
+def site_mode(mode: Optional[str] = None) -> str:
+    """mode, else $MOVIES_SITE_MODE, else "pages"; ValueError if unknown."""
+    mode = mode or os.environ.get(SITE_MODE_ENV) or DEFAULT_SITE_MODE
+    if mode not in SITE_MODES:
+        raise ValueError(f"Unknown site mode '{mode}' (use {' or '.join(SITE_MODES)}).")
+    return mode
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Posters
+# ──────────────────────────────────────────────────────────────────────────────
+def poster_mirror(project_dir: Path = PROJECT_DIR) -> PosterMirror:
+    return PosterMirror(project_dir / POSTER_DIR_NAME, workers=POSTER_WORKERS)
+
+
+def _mirror_chunks(
+    mirror: PosterMirror, urls: Iterable[str], download: bool
+) -> Iterator[Tuple[Dict[str, str], int, int]]:
+    """
+    Mirror urls storage.BULK_CHUNK_SIZE at a time, yielding (url -> file
+    name of the chunk's local posters, downloaded, failed) per chunk.
+    Database errors (also from a streaming urls cursor) end the mirroring
+    early; posters not mirrored then link to their originals.
+    """
+    urls = (u for u in urls if u)
+    while True:
+        try:
+            chunk = list(dict.fromkeys(islice(urls, storage.BULK_CHUNK_SIZE)))
+        except Exception:
+            return
+        if not chunk:
+            return
+        try:
+            known = storage.poster_files_get(chunk)
+        except Exception:
+            known = {}
+
+        local: Dict[str, str] = {}
+        missing: list[str] = []
+        now = time.time()
+        for url in chunk:
+            file, _error, fetched_at = known.get(url, (None, None, 0.0))
+            if file and mirror.exists(file):
+                local[url] = file
+            elif file or now - fetched_at > POSTER_RETRY_SEC:
+                missing.append(url)
+
+        if not missing or not download:
+            yield local, 0, 0
+            continue
+
+        results = mirror.fetch_many(missing)
+        local.update({url: file for url, (file, _err) in results.items() if file})
+        try:
+            storage.poster_files_put(results)
+        except Exception:
+            pass  # Spiegel bleibt gültig, beim nächsten Lauf wird neu geladen
+        failed = sum(1 for file, _err in results.values() if file is None)
+        yield local, len(results) - failed, failed
+
+
+def mirror_posters(
+    mirror: PosterMirror, urls: Iterable[str], *, download: bool = True
+) -> Tuple[Dict[str, str], int, int]:
+    """
+    Download posters missing from the mirror (concurrently) and return
+    (url -> file name for every local poster, downloaded, failed).
+    With download=False only already mirrored posters are resolved.
+    """
+    local: Dict[str, str] = {}
+    downloaded = failed = 0
+    for chunk_local, chunk_downloaded, chunk_failed in _mirror_chunks(mirror, urls, download):
+        local.update(chunk_local)
+        downloaded += chunk_downloaded
+        failed += chunk_failed
+    return local, downloaded, failed
+
+
+def sync_posters(mirror: PosterMirror, urls: Iterable[str]) -> Tuple[int, int]:
+    """
+    Like mirror_posters, but keeps nothing per URL: for streaming all
+    catalog posters (storage.poster_urls()). Returns (downloaded, failed).
+    """
+    downloaded = failed = 0
+    for _local, chunk_downloaded, chunk_failed in _mirror_chunks(mirror, urls, True):
+        downloaded += chunk_downloaded
+        failed += chunk_failed
+    return downloaded, failed
+
+
+def _poster_html(poster_url: str, alt: str, posters: PosterMap) -> str:
+    """<img>/<picture> for a poster, preferring local thumbnails."""
+    if poster_url not in posters:
+        src = html.escape(poster_url) if poster_url else ""
+        return f'<img src="{src}" alt="{alt}" loading="lazy" />'
+
+    name, thumbs = posters[poster_url]
+    prefix = f"{POSTER_DIR_NAME}/"
+    img = (
+        f'<img src="{html.escape(prefix + thumbs.get("jpeg", name))}" '
+        f'alt="{alt}" loading="lazy" />'
+    )
+    if "webp" not in thumbs:
+        return img
+    return (
+        "<picture>"
+        f'<source srcset="{html.escape(prefix + thumbs["webp"])}" type="image/webp" />'
+        f"{img}</picture>"
+    )
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Rendering
+# ──────────────────────────────────────────────────────────────────────────────
+def _item_html(
+    title: str,
+    year: object,
+    rating: object,
+    poster_url: Optional[str],
+    note: Optional[str],
+    imdb_id: Optional[str],
+    posters: PosterMap,
+) -> str:
+    safe_title = html.escape(str(title))
+    return ITEM_TEMPLATE.render(
+        {
+            "TITLE": safe_title,
+            "YEAR": html.escape(str(year)) if year is not None else "N/A",
+            "NOTE": html.escape(str(note)) if note else "",
+            "RATING": f"{float(rating):.1f}" if isinstance(rating, (int, float)) else "–",
+            "IMDB_URL": (
+                f"https://www.imdb.com/title/{html.escape(str(imdb_id))}/" if imdb_id else "#"
+            ),
+            "POSTER": _poster_html(poster_url or "", f"{safe_title} poster", posters),
+        }
+    )
+
+
+def movie_item_html(title: str, props: Dict[str, object], posters: PosterMap) -> str:
+    """One grid <li> rendered through ITEM_TEMPLATE."""
+    return _item_html(
+        title,
+        props.get("year"),
+        props.get("rating"),
+        props.get("poster_url"),  # type: ignore[arg-type]
+        props.get("note"),  # type: ignore[arg-type]
+        props.get("imdb_id"),  # type: ignore[arg-type]
+        posters,
+    )
+
+
+def _grid_chunks(rows: Iterable[Row], posters: PosterMap) -> Iterator[str]:
+    """
+    Grid HTML for cursor rows, GRID_CHUNK_ITEMS items per yielded chunk:
+    memory stays bounded however many rows there are.
+    """
+    batch: list[str] = []
+    separator = ""
+    for row in rows:
+        batch.append(
+            _item_html(
+                row.title, row.year, row.rating, row.poster_url,
+                row.note, row.imdb_id, posters,
+            )
+        )
+        if len(batch) >= GRID_CHUNK_ITEMS:
+            yield separator + "\n".join(batch)
+            batch.clear()
+            separator = "\n"
+    if batch:
+        yield separator + "\n".join(batch)
+
+
+def _page_end(title: str, rows_in_page: int, page_size: int) -> bool:
+    """
+    Whether a page ends after the row with this title. Boundaries come
+    from the title's hash (about one per page_size rows, at least
+    page_size // 4 and at most 4 * page_size rows per page), so they
+    stay where they are when rows are added or removed elsewhere.
+    """
+    if rows_in_page >= 4 * page_size:
+        return True
+    min_rows = max(1, page_size // 4)
+    if rows_in_page < min_rows:
+        return False
+    # Nach min_rows endet die Seite mit Wahrscheinlichkeit 1/(page_size - min_rows + 1)
+    key = int.from_bytes(hashlib.sha256(title.encode("utf-8")).digest()[:8], "big")
+    return key % (page_size - min_rows + 1) == 0
+
+
+def _pages(rows: Iterable[Row], page_size: int) -> Iterator[Tuple[str, List[Row]]]:
+    """(anchor, rows) per page; the anchor is the title ending the previous page."""
+    page: List[Row] = []
+    anchor = ""
+    for row in rows:
+        page.append(row)
+        if _page_end(row.title, len(page), page_size):
+            yield anchor, page
+            anchor, page = row.title, []
+    if page:
+        yield anchor, page
+
+
+def _paged(
+    rows: Iterable[Row], page_size: int
+) -> Iterator[Tuple[str, List[Row], Optional[str], Optional[str]]]:
+    """
+    (file name, rows, previous file, next file) over content-anchored
+    pages; holds at most two pages. A page is named after its anchor, so
+    an insert or delete rewrites the page it lands on and keeps the
+    names (and links) of all others.
+    """
+    pages = _pages(rows, page_size)
+    current = next(pages, None)
+    previous = None
+    while current is not None:
+        following = next(pages, None)
+        anchor, page = current
+        file = page_file_name(anchor)
+        yield file, page, previous, (
+            page_file_name(following[0]) if following is not None else None
+        )
+        previous, current = file, following
+
+
+def page_file_name(anchor: str) -> str:
+    """page-<hash>.html for the page following the row titled anchor ("" = first)."""
+    return f"page-{hashlib.sha256(anchor.encode('utf-8')).hexdigest()[:12]}.html"
+
+
+def _nav_html(user_url: str, previous: Optional[str], following: Optional[str]) -> str:
+    """Prev / index / next links; relative to the site root (<base href="../">)."""
+    links = []
+    if previous is not None:
+        links.append(f'<a class="prev" href="{user_url}/{previous}">&larr; Previous</a>')
+    links.append(f'<a class="index" href="{user_url}.html">All pages</a>')
+    if following is not None:
+        links.append(f'<a class="next" href="{user_url}/{following}">Next &rarr;</a>')
+    return '<nav class="pagination">\n  ' + "\n  ".join(links) + "\n</nav>"
+
+
+def _with_base_placeholder(template: CompiledTemplate) -> CompiledTemplate:
+    """Page template with __TEMPLATE_BASE__ (custom templates may lack it)."""
+    if "TEMPLATE_BASE" in template.placeholders:
+        return template
+    source = re.sub(
+        r"(<head[^>]*>)", r"\1__TEMPLATE_BASE__", template.source, count=1, flags=re.I
+    )
+    return CompiledTemplate(source)
+
+
+def _read_manifest(path: Path) -> Dict[str, object]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _is_current(output_path: Path, hash_path: Path, site_hash: str) -> bool:
+    try:
+        return (
+            output_path.exists()
+            and hash_path.read_text(encoding="utf-8").strip() == site_hash
+        )
+    except OSError:
+        return False
+
+
+def render_user_site(
+    user_id: int,
+    username: str,
+    project_dir: Path = PROJECT_DIR,
+    *,
+    download_posters: bool = True,
+    page_size: int = SITE_PAGE_SIZE,
+) -> RenderResult:
+    """
+    Write the user's site: <username>/page-<hash>.html with about
+    page_size movies each, <username>/manifest.json and the index page
+    <username>.html.
+
+    Rows are streamed from the cursor one page at a time. Page boundaries
+    are anchored on titles (see _page_end), not on positions. Every page
+    is hashed over its rows, posters, neighbours and the template/CSS;
+    pages whose hash matches the manifest are left alone, so adding or
+    removing a movie rewrites about one page plus the index. Data files
+    of an earlier client-mode run are removed.
+    """
+    start = time.perf_counter()
+    template, css = load_assets(project_dir)
+    page_template = _with_base_placeholder(template)
+    output_path = project_dir / f"{username}.html"
+    hash_path = output_path.with_name(output_path.name + ".hash")
+    pages_dir = project_dir / username
+    manifest_path = pages_dir / MANIFEST_NAME
+    user_url = html.escape(urllib.parse.quote(username))
+    try:
+        pages_dir.mkdir(exist_ok=True)
+    except OSError as exc:
+        raise SiteError(f"Cannot create {pages_dir}: {exc}") from exc
+
+    base = hashlib.sha256()
+    base.update(f"v{SITE_FORMAT_VERSION}\0{PAGE_TITLE}\0".encode("utf-8"))
+    base.update(template.source.encode("utf-8") + b"\0")
+    base.update(css + b"\0")
+
+    old_manifest = _read_manifest(manifest_path)
+    old_hashes = {}
+    if old_manifest.get("page_size") == page_size:
+        old_hashes = {p["file"]: p["hash"] for p in old_manifest.get("pages", [])}  # type: ignore[union-attr]
+
+    mirror = poster_mirror(project_dir)
+    pages: List[Dict[str, object]] = []
+    count = written = downloaded = failed = 0
+    try:
+        pages_iter = _paged(storage.iter_movie_rows(user_id), page_size)
+        for number, (file, rows, previous, following) in enumerate(pages_iter, 1):
+            count += len(rows)
+            local, got, lost = mirror_posters(
+                mirror, (row.poster_url for row in rows), download=download_posters
+            )
+            downloaded += got
+            failed += lost
+            posters = {url: (name, mirror.thumbnails(name)) for url, name in local.items()}
+
+            digest = base.copy()
+            digest.update(json.dumps([username, file, previous, following]).encode("utf-8"))
+            for row in rows:
+                digest.update(json.dumps(tuple(row)).encode("utf-8"))
+            digest.update(json.dumps(posters, sort_keys=True).encode("utf-8"))
+            page_hash = digest.hexdigest()
+
+            if old_hashes.get(file) != page_hash or not (pages_dir / file).exists():
+                with atomic_writer(pages_dir / file) as fh:
+                    page_template.stream(
+                        fh.write,
+                        {
+                            "TEMPLATE_TITLE": (
+                                f"{PAGE_TITLE}: {html.escape(rows[0].title)} – "
+                                f"{html.escape(rows[-1].title)}"
+                            ),
+                            "TEMPLATE_BASE": '<base href="../" />',
+                            "TEMPLATE_MOVIE_GRID": _grid_chunks(rows, posters),
+                            "TEMPLATE_PAGINATION": _nav_html(user_url, previous, following),
+                        },
+                    )
+                written += 1
+            pages.append(
+                {
+                    "page": number,
+                    "file": file,
+                    "count": len(rows),
+                    "first": rows[0].title,
+                    "last": rows[-1].title,
+                    "hash": page_hash,
+                }
+            )
+
+        # Seiten, die es nach Löschungen nicht mehr gibt
+        current = {p["file"] for p in pages}
+        for stale in pages_dir.glob("page-*.html"):
+            if stale.name not in current:
+                stale.unlink()
+
+        index_digest = base.copy()
+        index_digest.update(
+            json.dumps(
+                [username] + [[p["file"], p["first"], p["last"], p["count"]] for p in pages]
+            ).encode("utf-8")
+        )
+        index_hash = index_digest.hexdigest()
+        index_written = not _is_current(output_path, hash_path, index_hash)
+        if index_written:
+            # Erst die Seite, dann der Hash: bricht es dazwischen ab, wird neu gebaut
+            with atomic_writer(output_path) as fh:
+                template.stream(
+                    fh.write,
+                    {
+                        "TEMPLATE_TITLE": PAGE_TITLE,
+                        "TEMPLATE_BASE": "",
+                        "TEMPLATE_MOVIE_GRID": _index_grid(user_url, pages),
+                        "TEMPLATE_PAGINATION": "",
+                    },
+                )
+            write_atomic(hash_path, (index_hash + "\n").encode("utf-8"))
+
+        manifest = {
+            "format": SITE_FORMAT_VERSION,
+            "user": username,
+            "page_size": page_size,
+            "movies": count,
+            "pages": pages,
+        }
+        if manifest != old_manifest:
+            write_atomic(manifest_path, json.dumps(manifest, indent=2).encode("utf-8"))
+        _remove_client_files(project_dir, username)
+    except OSError as exc:
+        raise SiteError(f"Failed to write output HTML: {exc}") from exc
+
+    return RenderResult(
+        username, output_path, bool(written or index_written), count,
+        time.perf_counter() - start, downloaded, failed,
+        pages=len(pages), pages_written=written,
+    )
+
+
+def _index_grid(user_url: str, pages: List[Dict[str, object]]) -> str:
+    if not pages:
+        return EMPTY_GRID_HTML
+    return "\n".join(
+        INDEX_ITEM_TEMPLATE.render(
+            {
+                "HREF": f"{user_url}/{p['file']}",
+                "PAGE": str(p["page"]),
+                "FIRST": html.escape(str(p["first"])),
+                "LAST": html.escape(str(p["last"])),
+                "COUNT": str(p["count"]),
+            }
+        )
+        for p in pages
+    )
+
+
+def _client_files(project_dir: Path, username: str) -> Tuple[Path, Path, Path]:
+    """(<username>.movies.json, its .hash, <username>.movies.js) of client mode."""
+    data_path = project_dir / f"{username}.movies.json"
+    return (
+        data_path,
+        data_path.with_name(data_path.name + ".hash"),
+        project_dir / f"{username}.movies.js",
+    )
+
+
+def _remove_client_files(project_dir: Path, username: str) -> None:
+    """Pages mode: drop the data files a previous client-mode run left behind."""
+    for path in _client_files(project_dir, username):
+        path.unlink(missing_ok=True)
+
+
+def _remove_page_files(project_dir: Path, username: str) -> None:
+    """
+    Client mode: drop the pages and manifest a previous pages-mode run
+    left behind; the directory only if nothing else is in it.
+    """
+    pages_dir = project_dir / username
+    if not pages_dir.is_dir():
+        return
+    for path in pages_dir.glob("page-*.html"):
+        path.unlink()
+    (pages_dir / MANIFEST_NAME).unlink(missing_ok=True)
+    if not any(pages_dir.iterdir()):
+        pages_dir.rmdir()
+
+
+class _Unchanged(Exception):
+    """Raised inside atomic_writer to drop a temp file identical to the output."""
+
+
+def render_user_data_site(
+    user_id: int,
+    username: str,
+    project_dir: Path = PROJECT_DIR,
+    *,
+    download_posters: bool = True,
+) -> RenderResult:
+    """
+    Client mode: dump the user's movies to <username>.movies.json and
+    write a shell <username>.html that loads them via grid.js.
+
+    The JSON is {"format", "user", "fields", "posters", "movies"}: movies
+    are arrays in `fields` order serialized by SQLite and streamed to the
+    file; posters maps remote URLs to [local image, local WebP or null].
+    The same pass writes <username>.movies.js, which assigns that object
+    to window.MOVIE_GRID_DATA: the shell loads it with a plain <script>,
+    so the page also works when opened from disk. Each file is only
+    replaced when its content changed; pages of an earlier pages-mode
+    run are removed.
+    """
+    start = time.perf_counter()
+    template, css = load_assets(project_dir)
+    output_path = project_dir / f"{username}.html"
+    hash_path = output_path.with_name(output_path.name + ".hash")
+    data_path, data_hash_path, script_path = _client_files(project_dir, username)
+    script_name = script_path.name
+
+    mirror = poster_mirror(project_dir)
+    local, downloaded, failed = mirror_posters(
+        mirror, storage.poster_urls(user_id), download=download_posters
+    )
+    posters = {}
+    for url, name in sorted(local.items()):
+        thumbs = mirror.thumbnails(name)
+        posters[url] = [
+            f"{POSTER_DIR_NAME}/{thumbs.get('jpeg', name)}",
+            f"{POSTER_DIR_NAME}/{thumbs['webp']}" if "webp" in thumbs else None,
+        ]
+
+    count = 0
+    files_written = 0
+    digest = hashlib.sha256()
+    try:
+        try:
+            with atomic_writer(data_path) as fh, atomic_writer(script_path) as js:
+                header = json.dumps(
+                    {
+                        "format": SITE_FORMAT_VERSION,
+                        "user": username,
+                        "fields": list(storage.JSON_EXPORT_FIELDS),
+                        "posters": posters,
+                    },
+                    ensure_ascii=False,
+                    separators=(",", ":"),
+                )
+                js.write(f"window.{DATA_GLOBAL} = ")
+
+                def write(chunk: str) -> None:
+                    fh.write(chunk)
+                    js.write(chunk)
+                    digest.update(chunk.encode("utf-8"))
+
+                write(header[:-1] + ',"movies":[\n')
+                separator = ""
+                for movie in storage.iter_movie_json(user_id):
+                    write(separator + movie)
+                    separator = ",\n"
+                    count += 1
+                write("\n]}")
+                fh.write("\n")
+                js.write(";\n")
+                if script_path.exists() and _is_current(
+                    data_path, data_hash_path, digest.hexdigest()
+                ):
+                    raise _Unchanged
+            write_atomic(data_hash_path, (digest.hexdigest() + "\n").encode("utf-8"))
+            files_written += 2
+        except _Unchanged:
+            pass
+
+        shell_digest = hashlib.sha256()
+        shell_digest.update(f"client\0v{SITE_FORMAT_VERSION}\0{PAGE_TITLE}\0".encode("utf-8"))
+        shell_digest.update(template.source.encode("utf-8") + b"\0" + css + b"\0")
+        shell_digest.update(script_name.encode("utf-8"))
+        shell_hash = shell_digest.hexdigest()
+        if not _is_current(output_path, hash_path, shell_hash):
+            script = (
+                f'<script src="{html.escape(urllib.parse.quote(script_name))}"></script>\n'
+                f'<script src="{SCRIPT_NAME}"></script>'
+            )
+            with atomic_writer(output_path) as fh:
+                template.stream(
+                    fh.write,
+                    {
+                        "TEMPLATE_TITLE": PAGE_TITLE,
+                        "TEMPLATE_BASE": "",
+                        "TEMPLATE_MOVIE_GRID": "",
+                        "TEMPLATE_PAGINATION": script,
+                    },
+                )
+            write_atomic(hash_path, (shell_hash + "\n").encode("utf-8"))
+            files_written += 1
+        _remove_page_files(project_dir, username)
+    except OSError as exc:
+        raise SiteError(f"Failed to write output: {exc}") from exc
+
+    return RenderResult(
+        username, output_path, files_written > 0, count,
+        time.perf_counter() - start, downloaded, failed,
+        pages=3, pages_written=files_written,
+    )
+
+
+def render_site(
+    user_id: int,
+    username: str,
+    project_dir: Path = PROJECT_DIR,
+    *,
+    mode: Optional[str] = None,
+    download_posters: bool = True,
+) -> RenderResult:
+    """Render one user's site in the given (or configured) site mode."""
+    if site_mode(mode) == "client":
+        return render_user_data_site(
+            user_id, username, project_dir, download_posters=download_posters
+        )
+    return render_user_site(
+        user_id, username, project_dir, download_posters=download_posters
+    )
+
+
+# ──────────────────────────────────────────────────────────────────────────────
+# All users (process pool)
+# ──────────────────────────────────────────────────────────────────────────────
+def _init_worker(db_url: str) -> None:
+    storage.init_storage(db_url)
+
+
+def _render_job(
+    user_id: int, username: str, project_dir: Path, mode: str
+) -> RenderResult:
+    start = time.perf_counter()
+    try:
+        return render_site(
+            user_id, username, project_dir, mode=mode, download_posters=False
+        )
+    except Exception as exc:
+        return RenderResult(
+            username, project_dir / f"{username}.html", False, 0,
+            time.perf_counter() - start, error=str(exc) or type(exc).__name__,
+        )
+
+
+def render_all_sites(
+    users: Sequence[Tuple[int, str]],
+    project_dir: Path = PROJECT_DIR,
+    *,
+    workers: Optional[int] = None,
+    mode: Optional[str] = None,
+) -> Iterator[RenderResult]:
+    """
+    Render every (user_id, username) page on a process pool, yielding
+    results as they finish. Posters must already be mirrored (see
+    sync_posters with storage.poster_urls()); workers only resolve them.
+    """
+    if not users:
+        return
+    mode = site_mode(mode)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(users)))
+    # spawn: keine geerbten SQLite-Verbindungen im Kindprozess
+    db_url = storage.get_engine().url.render_as_string(hide_password=False)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(db_url,),
+    ) as pool:
+        futures = [
+            pool.submit(_render_job, user_id, username, project_dir, mode)
+            for user_id, username in users
+        ]
+        for future in as_completed(futures):
+            yield future.result()